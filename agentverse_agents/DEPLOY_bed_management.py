@@ -8,7 +8,9 @@ from uagents_core.contrib.protocols.chat import (
 from datetime import datetime
 from uuid import uuid4
 import os
-import httpx
+from hospital_state import get_hospital_state
+from protocol_matcher import detect_protocol, is_protocol_broadcast
+from bed_reservation import BedReservationEngine, PROTOCOL_BED_EQUIPMENT
 from anthropic import AsyncAnthropic
 
 AGENT_SEED = "bed_management_phrase_001"
@@ -19,53 +21,36 @@ ANTHROPIC_KEY = ""
 agent = Agent(name="bed_management", seed=AGENT_SEED, port=8005)
 protocol = Protocol(spec=chat_protocol_spec)
 claude_client = AsyncAnthropic(api_key=ANTHROPIC_KEY) if ANTHROPIC_KEY else None
+hospital_state = get_hospital_state(JSONBIN_ID, JSONBIN_KEY)
+reservations = BedReservationEngine(hospital_state)
 
 async def get_hospital_data():
-    """Tool: Fetch hospital data from JSONBin"""
+    """Tool: Fetch the full hospital state document"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}/latest",
-                headers={"X-Master-Key": JSONBIN_KEY}
-            )
-            return response.json()["record"]
-    except Exception as e:
-        return {"error": str(e)}
-
-async def update_hospital_data(data):
-    """Tool: Update hospital data in JSONBin"""
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.put(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}",
-                json=data,
-                headers={"X-Master-Key": JSONBIN_KEY, "Content-Type": "application/json"}
-            )
-            return response.json()
+        return await hospital_state.get_snapshot()
     except Exception as e:
         return {"error": str(e)}
 
 async def get_available_beds(bed_type="icu"):
     """Tool: Get available beds of specific type"""
-    data = await get_hospital_data()
-    if "error" in data:
+    try:
+        return await hospital_state.get_beds(bed_type, status="available")
+    except Exception:
         return []
-    beds = data.get("beds", {}).get(bed_type, [])
-    return [bed for bed in beds if bed.get("status") == "available"]
 
 async def reserve_bed(bed_id, bed_type="icu"):
-    """Tool: Reserve a specific bed"""
-    data = await get_hospital_data()
-    if "error" in data:
+    """Tool: Reserve a specific bed (version-checked, retried on conflict)"""
+    try:
+        return await reservations.reserve(bed_id, bed_type) is not None
+    except Exception:
         return False
-    
-    for bed in data["beds"][bed_type]:
-        if bed["id"] == bed_id:
-            bed["status"] = "reserved"
-            bed["reserved_at"] = datetime.utcnow().isoformat()
-            await update_hospital_data(data)
-            return True
-    return False
+
+async def reserve_best_beds(count, bed_type="icu", equipment=None):
+    """Tool: Reserve up to `count` best-fit available beds carrying `equipment`"""
+    try:
+        return await reservations.reserve_best(count, bed_type, equipment)
+    except Exception:
+        return []
 
 @agent.on_event("startup")
 async def initialize(ctx: Context):
@@ -90,7 +75,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
     queries = ctx.storage.get("queries_processed") + 1
     ctx.storage.set("queries_processed", queries)
     
-    if "ambulance" in text.lower() or "protocol" in text.lower():
+    if is_protocol_broadcast(text):
         ctx.logger.info("🚑 AMBULANCE REPORT DETECTED - Using Claude AI + Tools")
         
         ctx.logger.info(f"📍 Will respond back to ED Coordinator: {sender[:16]}...")
@@ -102,14 +87,21 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         
         ctx.logger.info(f"📊 Tool Result: {len(available_beds)}/{total_icu} ICU beds available")
         
+        # Reserve atomically; a bed taken by a concurrent report is skipped.
+        # Prefer the best-fitting bed with the protocol's equipment, else any ICU bed
+        required_equipment = PROTOCOL_BED_EQUIPMENT.get(detect_protocol(text), ())
+        ctx.logger.info(f"🔧 Tool Call: Reserving best available ICU bed (equipment: {', '.join(required_equipment) or 'any'})...")
+        reserved_beds = []
         if available_beds:
-            bed = available_beds[0]
+            reserved_beds = await reserve_best_beds(1, "icu", required_equipment)
+            if not reserved_beds and required_equipment:
+                reserved_beds = await reserve_best_beds(1, "icu")
+        ctx.logger.info(f"✅ Tool Result: Bed reserved = {bool(reserved_beds)}")
+        
+        if reserved_beds:
+            bed = reserved_beds[0]
             bed_list = ", ".join([b['id'] for b in available_beds[:3]])
             
-            ctx.logger.info(f"🔧 Tool Call: Reserving bed {bed['id']}...")
-            reserved = await reserve_bed(bed["id"], "icu")
-            ctx.logger.info(f"✅ Tool Result: Bed reserved = {reserved}")
-            
             response_text = f"""🛏️ BED MANAGEMENT AGENT REPORT
 
 📊 DATA FETCHED FROM HOSPITAL DATABASE:
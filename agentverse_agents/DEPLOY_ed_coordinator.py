@@ -7,57 +7,64 @@ from uagents_core.contrib.protocols.chat import (
 )
 from datetime import datetime
 from uuid import uuid4
+import asyncio
 import os
-import httpx
+from hospital_state import get_hospital_state
+from protocol_matcher import is_emergency_report
+from response_aggregator import ResponseAggregator, new_incident_id
 from anthropic import AsyncAnthropic
 
 AGENT_SEED = "ed_coordinator_phrase_001"
 JSONBIN_ID = "68fd4c71ae596e708f2c8fb0"
 JSONBIN_KEY = "$2a$10$rwAXxHjp0m8RC1pL5BIW5.bc0orN3f3PivMK6lNPLOw1Gmh333uSa"
 ANTHROPIC_KEY = ""
+AGENT_COMM_TIMEOUT_SECONDS = float(os.getenv("AGENT_COMM_TIMEOUT_SECONDS", "1"))
 
 agent = Agent(name="ed_coordinator", seed=AGENT_SEED, port=8000)
 protocol = Protocol(spec=chat_protocol_spec)
 claude_client = AsyncAnthropic(api_key=ANTHROPIC_KEY) if ANTHROPIC_KEY else None
+hospital_state = get_hospital_state(JSONBIN_ID, JSONBIN_KEY)
 
 async def get_hospital_data():
-    """Tool: Fetch hospital data from JSONBin"""
+    """Tool: Fetch the full hospital state document"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}/latest",
-                headers={"X-Master-Key": JSONBIN_KEY}
-            )
-            return response.json()["record"]
-    except Exception as e:
-        return {"error": str(e)}
-
-async def update_hospital_data(data):
-    """Tool: Update hospital data in JSONBin"""
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.put(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}",
-                json=data,
-                headers={"X-Master-Key": JSONBIN_KEY, "Content-Type": "application/json"}
-            )
-            return response.json()
+        return await hospital_state.get_snapshot()
     except Exception as e:
         return {"error": str(e)}
 
 async def activate_protocol(protocol_name):
     """Tool: Activate emergency protocol and update stats"""
-    data = await get_hospital_data()
-    if "error" in data:
+    try:
+        return await hospital_state.record_protocol_activation(protocol_name.lower())
+    except Exception:
         return False
+
+async def broadcast_to_agents(ctx: Context, recipients, text, timeout=AGENT_COMM_TIMEOUT_SECONDS):
+    """Tool: Send one message to all agents concurrently, each with its own timeout
     
-    protocol_key = protocol_name.lower()
-    if protocol_key in data.get("protocols", {}):
-        data["protocols"][protocol_key]["active_cases"] += 1
-        data["protocols"][protocol_key]["last_activation"] = datetime.utcnow().isoformat()
-        await update_hospital_data(data)
-        return True
-    return False
+    Returns {agent_name: {"delivered": bool, "error": str | None}}
+    """
+    async def deliver(address):
+        try:
+            await asyncio.wait_for(
+                ctx.send(
+                    address,
+                    ChatMessage(
+                        timestamp=datetime.utcnow(),
+                        msg_id=uuid4(),
+                        content=[TextContent(type="text", text=text)]
+                    )
+                ),
+                timeout
+            )
+            return {"delivered": True, "error": None}
+        except asyncio.TimeoutError:
+            return {"delivered": False, "error": f"timed out after {timeout}s"}
+        except Exception as e:
+            return {"delivered": False, "error": str(e)}
+    
+    results = await asyncio.gather(*(deliver(address) for address in recipients.values()))
+    return dict(zip(recipients, results))
 
 @agent.on_event("startup")
 async def initialize(ctx: Context):
@@ -95,20 +102,21 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
     if agent_addresses and sender in agent_addresses.values():
         ctx.logger.info(f"📥 Agent response received - storing for aggregation")
         
-        # Store the response
-        agent_responses = ctx.storage.get("agent_responses") or {}
+        # Attach to its incident; the last expected response completes it immediately
         agent_name = [name for name, addr in agent_addresses.items() if addr == sender][0]
-        agent_responses[agent_name] = {
-            "text": text,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        ctx.storage.set("agent_responses", agent_responses)
-        ctx.logger.info(f"✅ Stored response from {agent_name} ({len(agent_responses)}/5 collected)")
+        incident = await aggregator.record(ctx, agent_name, text)
+        if incident:
+            ctx.logger.info(
+                f"✅ Stored response from {agent_name} for {incident.incident_id} "
+                f"({len(incident.responses)}/{len(incident.expected)} collected)"
+            )
+        else:
+            ctx.logger.warning(f"⚠️ Response from {agent_name} matches no open incident")
         return
     
     ctx.logger.info(f"📝 Query: {text[:150]}...")
     
-    if "ambulance" in text.lower() or any(word in text.lower() for word in ["chest pain", "stroke", "trauma", "critical", "emergency"]):
+    if is_emergency_report(text):
         ctx.logger.info("🚑 AMBULANCE REPORT DETECTED - Initiating AI analysis and broadcast")
         
         ctx.logger.info("🔧 Tool Call: Fetching hospital status from JSONBin...")
@@ -162,14 +170,10 @@ ANALYSIS: [brief analysis]"""
             ctx.logger.info(f"✅ Protocol activation: {activated}")
             
             agent_addresses = ctx.storage.get("agent_addresses")
-            
-            # Store original sender and initialize response collection
-            ctx.storage.set("original_sender", sender)
-            ctx.storage.set("agent_responses", {})
-            ctx.storage.set("waiting_for_responses", True)
-            ctx.storage.set("broadcast_timestamp", datetime.utcnow().isoformat())
+            incident_id = new_incident_id()
             
             broadcast_message = f"""🚑 AMBULANCE REPORT - {protocol_name.upper()} PROTOCOL
+Incident: {incident_id}
 
 {text}
 
@@ -187,34 +191,50 @@ RESPOND TO ORIGINAL SENDER with your detailed preparation report showing:
             
             ctx.logger.info("📡 Broadcasting to all 5 agents...")
             agents_to_notify = [
-                ("Resource Manager", agent_addresses.get("resource_manager")),
-                ("Specialist Coordinator", agent_addresses.get("specialist_coordinator")),
-                ("Lab Service", agent_addresses.get("lab_service")),
-                ("Pharmacy", agent_addresses.get("pharmacy")),
-                ("Bed Management", agent_addresses.get("bed_management")),
-                ("WhatsApp Notification", agent_addresses.get("whatsapp_notification"))
+                ("Resource Manager", "resource_manager"),
+                ("Specialist Coordinator", "specialist_coordinator"),
+                ("Lab Service", "lab_service"),
+                ("Pharmacy", "pharmacy"),
+                ("Bed Management", "bed_management"),
+                ("WhatsApp Notification", "whatsapp_notification")
             ]
             
-            broadcast_count = 0
-            for agent_name, agent_address in agents_to_notify:
+            recipients = {}
+            agent_keys = {}
+            for agent_name, agent_key in agents_to_notify:
+                agent_address = agent_addresses.get(agent_key)
                 if agent_address and agent_address != "agent1q...":
-                    try:
-                        await ctx.send(
-                            agent_address,
-                            ChatMessage(
-                                timestamp=datetime.utcnow(),
-                                msg_id=uuid4(),
-                                content=[TextContent(type="text", text=broadcast_message)]
-                            )
-                        )
-                        ctx.logger.info(f"✅ Broadcast sent to {agent_name}")
-                        broadcast_count += 1
-                    except Exception as e:
-                        ctx.logger.error(f"❌ Failed to send to {agent_name}: {e}")
+                    recipients[agent_name] = agent_address
+                    agent_keys[agent_name] = agent_key
                 else:
                     ctx.logger.warning(f"⚠️  {agent_name} address not configured")
             
-            ctx.logger.info(f"📡 Broadcast complete: {broadcast_count}/5 agents notified")
+            # Open the incident before sending so fast replies are not missed
+            aggregator.open(
+                ctx, sender, agent_keys.values(),
+                incident_id=incident_id,
+                context={"protocol": protocol_name}
+            )
+            
+            # One concurrent fan-out: bounded by the slowest agent, not the sum
+            delivery = await broadcast_to_agents(ctx, recipients, broadcast_message)
+            for agent_name, result in delivery.items():
+                if result["delivered"]:
+                    ctx.logger.info(f"✅ Broadcast sent to {agent_name}")
+                else:
+                    ctx.logger.error(f"❌ Failed to send to {agent_name}: {result['error']}")
+            broadcast_count = sum(1 for result in delivery.values() if result["delivered"])
+            
+            # Only wait for agents the broadcast actually reached
+            await aggregator.expect(incident_id, [
+                agent_keys[agent_name] for agent_name, result in delivery.items() if result["delivered"]
+            ])
+            
+            ctx.logger.info(f"📡 Broadcast complete: {broadcast_count}/{len(agents_to_notify)} agents notified")
+            coordination_status = "\n".join(
+                f"• {agent_name}: {'Notified ✅' if delivery.get(agent_name, {}).get('delivered') else 'Not reached ❌'}"
+                for agent_name, _ in agents_to_notify
+            )
             
             protocols_activated = ctx.storage.get("protocols_activated") + 1
             ctx.storage.set("protocols_activated", protocols_activated)
@@ -234,16 +254,11 @@ RESPOND TO ORIGINAL SENDER with your detailed preparation report showing:
 🔧 ACTIONS TAKEN:
 • Protocol activated: {protocol_name} in hospital database
 • Updated protocol stats: Active cases incremented
-• Broadcast sent to {broadcast_count}/5 specialized agents
+• Broadcast sent to {broadcast_count}/{len(agents_to_notify)} specialized agents
 • Timestamp: {datetime.utcnow().isoformat()}
 
 ✅ COORDINATION STATUS:
-• Resource Manager: Notified ✅
-• Bed Management: Notified ✅
-• Lab Service: Notified ✅
-• Pharmacy: Notified ✅
-• Specialist Coordinator: Notified ✅
-• WhatsApp Notification: Notified ✅
+{coordination_status}
 
 ⏱️ Protocol activation time: <5 seconds
 🎯 All 6 agents are now preparing - check their individual responses below"""
@@ -313,53 +328,33 @@ How can I help you coordinate the ED?"""
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
     ctx.logger.debug(f"✓ Ack received: {msg.acknowledged_msg_id}")
 
-@agent.on_interval(period=3.0)
-async def check_and_aggregate_responses(ctx: Context):
-    """Check if all agent responses collected and send aggregated response"""
-    if not ctx.storage.get("waiting_for_responses"):
-        return
-    
-    agent_responses = ctx.storage.get("agent_responses") or {}
-    broadcast_time = ctx.storage.get("broadcast_timestamp")
-    
-    if not broadcast_time:
-        return
-    
-    elapsed = (datetime.utcnow() - datetime.fromisoformat(broadcast_time)).total_seconds()
-    ctx.logger.info(f"⏱️ Checking responses: {len(agent_responses)}/5 collected, {elapsed:.1f}s elapsed")
+async def send_aggregated_response(ctx: Context, incident):
+    """Send the combined report for an incident once it completes or hits its deadline"""
+    ctx.logger.info(
+        f"📦 AGGREGATING RESPONSES for {incident.incident_id}: "
+        f"{len(incident.responses)}/{len(incident.expected)} collected after {incident.elapsed:.1f}s "
+        f"({incident.completed_reason})"
+    )
     
-    # Send aggregated response if we have all 5 OR timeout after 10 seconds
-    if len(agent_responses) >= 6 or elapsed > 10:
-        ctx.logger.info(f"📦 AGGREGATING RESPONSES: {len(agent_responses)}/6 collected after {elapsed:.1f}s")
-        
-        original_sender = ctx.storage.get("original_sender")
-        if not original_sender:
-            ctx.logger.error("❌ No original sender stored!")
-            ctx.storage.set("waiting_for_responses", False)
-            return
+    try:
+        # Build aggregated response
+        ctx.logger.info("🔨 Building aggregated response...")
+        aggregated = await build_aggregated_response(ctx, incident.responses, incident.elapsed)
         
-        try:
-            # Build aggregated response
-            ctx.logger.info("🔨 Building aggregated response...")
-            aggregated = await build_aggregated_response(ctx, agent_responses)
-            
-            ctx.logger.info(f"📤 Sending aggregated response to {original_sender[:16]}...")
-            await ctx.send(original_sender, ChatMessage(
-                timestamp=datetime.utcnow(),
-                msg_id=uuid4(),
-                content=[TextContent(type="text", text=aggregated)]
-            ))
-            
-            ctx.logger.info(f"✅ Aggregated response sent successfully!")
-        except Exception as e:
-            ctx.logger.error(f"❌ Error sending aggregated response: {e}")
+        ctx.logger.info(f"📤 Sending aggregated response to {incident.reply_to[:16]}...")
+        await ctx.send(incident.reply_to, ChatMessage(
+            timestamp=datetime.utcnow(),
+            msg_id=uuid4(),
+            content=[TextContent(type="text", text=aggregated)]
+        ))
         
-        # Reset
-        ctx.storage.set("waiting_for_responses", False)
-        ctx.storage.set("agent_responses", {})
-        ctx.logger.info("🔄 Reset complete, ready for next query")
+        ctx.logger.info(f"✅ Aggregated response sent successfully!")
+    except Exception as e:
+        ctx.logger.error(f"❌ Error sending aggregated response: {e}")
+
+aggregator = ResponseAggregator(send_aggregated_response)
 
-async def build_aggregated_response(ctx: Context, agent_responses: dict) -> str:
+async def build_aggregated_response(ctx: Context, agent_responses: dict, elapsed: float) -> str:
     """Build comprehensive response with ambulance instructions + agent details"""
     
     # Get protocol info
@@ -400,7 +395,7 @@ Team will meet you at ambulance entrance.
             instructions += f"\n{agent_responses[agent_name]['text']}\n\n---\n"
     
     instructions += f"\n🎯 COORDINATION COMPLETE: {len(agent_responses)}/6 agents responded"
-    instructions += f"\n⏱️ Total coordination time: <10 seconds"
+    instructions += f"\n⏱️ Total coordination time: {elapsed:.1f} seconds"
     instructions += f"\n✅ All systems ready for patient arrival"
     
     return instructions
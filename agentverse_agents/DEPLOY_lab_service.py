@@ -8,7 +8,8 @@ from uagents_core.contrib.protocols.chat import (
 from datetime import datetime
 from uuid import uuid4
 import os
-import httpx
+from hospital_state import get_hospital_state
+from protocol_matcher import detect_protocol, is_protocol_broadcast
 from anthropic import AsyncAnthropic
 
 AGENT_SEED = "lab_service_phrase_001"
@@ -19,16 +20,12 @@ ANTHROPIC_KEY = ""
 agent = Agent(name="lab_service", seed=AGENT_SEED, port=8002)
 protocol = Protocol(spec=chat_protocol_spec)
 claude_client = AsyncAnthropic(api_key=ANTHROPIC_KEY) if ANTHROPIC_KEY else None
+hospital_state = get_hospital_state(JSONBIN_ID, JSONBIN_KEY)
 
 async def get_hospital_data():
-    """Tool: Fetch hospital data from JSONBin"""
+    """Tool: Fetch the full hospital state document"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}/latest",
-                headers={"X-Master-Key": JSONBIN_KEY}
-            )
-            return response.json()["record"]
+        return await hospital_state.get_snapshot()
     except Exception as e:
         return {"error": str(e)}
 
@@ -73,7 +70,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
     text = ''.join(item.text for item in msg.content if isinstance(item, TextContent))
     ctx.logger.info(f"📝 Query: {text[:100]}...")
     
-    if "ambulance" in text.lower() or "protocol" in text.lower():
+    if is_protocol_broadcast(text):
         ctx.logger.info("🚑 AMBULANCE REPORT DETECTED - Using Claude AI + Tools")
         
         ctx.logger.info(f"📍 Will respond back to ED Coordinator: {sender[:16]}...")
@@ -90,7 +87,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         ctx.logger.info(f"📊 Tool Result: {len(diagnostic_equipment)} equipment types, {len(lab_tests)} test types")
         
         # Determine protocol
-        protocol = "STEMI" if "STEMI" in text or "chest pain" in text.lower() else "Stroke" if "stroke" in text.lower() else "Trauma" if "trauma" in text.lower() else "General"
+        protocol = detect_protocol(text)
         
         response_text = f"""🧪 LAB SERVICE AGENT REPORT
 
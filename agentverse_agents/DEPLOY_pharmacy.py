@@ -8,7 +8,8 @@ from uagents_core.contrib.protocols.chat import (
 from datetime import datetime
 from uuid import uuid4
 import os
-import httpx
+from hospital_state import get_hospital_state
+from protocol_matcher import detect_protocol, is_protocol_broadcast
 from anthropic import AsyncAnthropic
 
 AGENT_SEED = "pharmacy_phrase_001"
@@ -19,60 +20,34 @@ ANTHROPIC_KEY = ""
 agent = Agent(name="pharmacy", seed=AGENT_SEED, port=8003)
 protocol = Protocol(spec=chat_protocol_spec)
 claude_client = AsyncAnthropic(api_key=ANTHROPIC_KEY) if ANTHROPIC_KEY else None
+hospital_state = get_hospital_state(JSONBIN_ID, JSONBIN_KEY)
 
 async def get_hospital_data():
-    """Tool: Fetch hospital data from JSONBin"""
+    """Tool: Fetch the full hospital state document"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}/latest",
-                headers={"X-Master-Key": JSONBIN_KEY}
-            )
-            return response.json()["record"]
-    except Exception as e:
-        return {"error": str(e)}
-
-async def update_hospital_data(data):
-    """Tool: Update hospital data in JSONBin"""
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.put(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}",
-                json=data,
-                headers={"X-Master-Key": JSONBIN_KEY, "Content-Type": "application/json"}
-            )
-            return response.json()
+        return await hospital_state.get_snapshot()
     except Exception as e:
         return {"error": str(e)}
 
 async def check_medication_availability(med_name):
     """Tool: Check if medication is available"""
-    data = await get_hospital_data()
-    if "error" in data:
+    try:
+        return await hospital_state.find_stock("medications", med_name)
+    except Exception:
         return None
-    
-    for category in data.get("medications", {}).values():
-        if isinstance(category, dict):
-            for med_key, med_data in category.items():
-                if med_name.lower() in med_data.get("name", "").lower():
-                    return med_data
-    return None
 
 async def dispense_medication(med_name, quantity=1):
-    """Tool: Dispense medication and update inventory"""
-    data = await get_hospital_data()
-    if "error" in data:
+    """Tool: Dispense medication and atomically decrement inventory"""
+    med_data = await check_medication_availability(med_name)
+    if not med_data:
+        return False
+    try:
+        remaining = await hospital_state.adjust_stock(
+            "medications", med_data["category"], med_data["key"], -quantity
+        )
+        return remaining is not None
+    except Exception:
         return False
-    
-    for category in data.get("medications", {}).values():
-        if isinstance(category, dict):
-            for med_key, med_data in category.items():
-                if med_name.lower() in med_data.get("name", "").lower():
-                    if med_data.get("available", 0) >= quantity:
-                        med_data["available"] -= quantity
-                        await update_hospital_data(data)
-                        return True
-    return False
 
 @agent.on_event("startup")
 async def initialize(ctx: Context):
@@ -94,7 +69,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
     text = ''.join(item.text for item in msg.content if isinstance(item, TextContent))
     ctx.logger.info(f"📝 Query: {text[:100]}...")
     
-    if "ambulance" in text.lower() or "protocol" in text.lower():
+    if is_protocol_broadcast(text):
         ctx.logger.info("🚑 AMBULANCE REPORT DETECTED - Using Claude AI + Tools")
         
         ctx.logger.info(f"📍 Will respond back to ED Coordinator: {sender[:16]}...")
@@ -108,7 +83,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         ctx.logger.info(f"📊 Tool Result: {len(emergency_meds)} emergency medications available")
         
         # Determine protocol
-        protocol = "STEMI" if "STEMI" in text or "chest pain" in text.lower() else "Stroke" if "stroke" in text.lower() else "Trauma" if "trauma" in text.lower() else "General"
+        protocol = detect_protocol(text)
         
         response_text = f"""💊 PHARMACY AGENT REPORT
 
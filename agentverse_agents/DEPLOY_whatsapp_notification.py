@@ -8,7 +8,9 @@ from uagents_core.contrib.protocols.chat import (
 from datetime import datetime
 from uuid import uuid4
 import os
-import httpx
+from hospital_client import get_http_client
+from hospital_state import get_hospital_state
+from protocol_matcher import detect_protocol, is_protocol_broadcast
 from anthropic import AsyncAnthropic
 import base64
 
@@ -24,6 +26,7 @@ TWILIO_WHATSAPP_NUMBER = "+14155238886"
 agent = Agent(name="whatsapp_notification", seed=AGENT_SEED, port=8006)
 protocol = Protocol(spec=chat_protocol_spec)
 claude_client = AsyncAnthropic(api_key=ANTHROPIC_KEY) if ANTHROPIC_KEY else None
+hospital_state = get_hospital_state(JSONBIN_ID, JSONBIN_KEY)
 
 MEDICAL_STAFF_CONTACTS = {
     "cardiologist": "+14082109942",
@@ -35,14 +38,9 @@ MEDICAL_STAFF_CONTACTS = {
 }
 
 async def get_hospital_data():
-    """Tool: Fetch hospital data from JSONBin"""
+    """Tool: Fetch the full hospital state document"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.jsonbin.io/v3/b/{JSONBIN_ID}/latest",
-                headers={"X-Master-Key": JSONBIN_KEY}
-            )
-            return response.json()["record"]
+        return await hospital_state.get_snapshot()
     except Exception as e:
         return {"error": str(e)}
 
@@ -60,37 +58,36 @@ async def send_whatsapp_notification(phone: str, message: str, ctx: Context):
         url = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
         
         # Send WhatsApp message via Twilio REST API
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                headers={
-                    "Authorization": f"Basic {auth_b64}",
-                    "Content-Type": "application/x-www-form-urlencoded"
-                },
-                data={
-                    "From": f"whatsapp:{TWILIO_WHATSAPP_NUMBER}",
-                    "To": f"whatsapp:{phone}",
-                    "Body": message
-                }
-            )
-            
-            if response.status_code == 201:
-                result = response.json()
-                ctx.logger.info(f"✅ WhatsApp sent successfully! SID: {result.get('sid', 'unknown')}")
-                return {
-                    "status": "sent",
-                    "phone": phone,
-                    "sid": result.get('sid'),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            else:
-                ctx.logger.error(f"❌ Twilio API error: {response.status_code} - {response.text}")
-                return {
-                    "status": "failed",
-                    "phone": phone,
-                    "error": f"HTTP {response.status_code}",
-                    "timestamp": datetime.utcnow().isoformat()
-                }
+        response = await get_http_client().post(
+            url,
+            headers={
+                "Authorization": f"Basic {auth_b64}",
+                "Content-Type": "application/x-www-form-urlencoded"
+            },
+            data={
+                "From": f"whatsapp:{TWILIO_WHATSAPP_NUMBER}",
+                "To": f"whatsapp:{phone}",
+                "Body": message
+            }
+        )
+        
+        if response.status_code == 201:
+            result = response.json()
+            ctx.logger.info(f"✅ WhatsApp sent successfully! SID: {result.get('sid', 'unknown')}")
+            return {
+                "status": "sent",
+                "phone": phone,
+                "sid": result.get('sid'),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        else:
+            ctx.logger.error(f"❌ Twilio API error: {response.status_code} - {response.text}")
+            return {
+                "status": "failed",
+                "phone": phone,
+                "error": f"HTTP {response.status_code}",
+                "timestamp": datetime.utcnow().isoformat()
+            }
                 
     except Exception as e:
         ctx.logger.error(f"❌ WhatsApp send failed: {str(e)}")
@@ -122,7 +119,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
     text = ''.join(item.text for item in msg.content if isinstance(item, TextContent))
     ctx.logger.info(f"📝 Query: {text[:100]}...")
     
-    if "ambulance" in text.lower() or "protocol" in text.lower():
+    if is_protocol_broadcast(text):
         ctx.logger.info("🚑 AMBULANCE REPORT DETECTED - Sending WhatsApp notifications")
         
         ctx.logger.info(f"📍 Will respond back to ED Coordinator: {sender[:16]}...")
@@ -134,7 +131,7 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         ctx.logger.info(f"📊 Tool Result: {len(specialists)} specialist categories in database")
         
         # Determine protocol
-        protocol = "STEMI" if "STEMI" in text or "chest pain" in text.lower() else "Stroke" if "stroke" in text.lower() else "Trauma" if "trauma" in text.lower() else "General"
+        protocol = detect_protocol(text)
         
         # Send notifications based on protocol
         notifications_sent = []
@@ -0,0 +1,150 @@
+"""
+Conflict-free bed reservation on top of a HospitalStateStore
+
+Every reservation is a compare-and-swap on the bed's version: read the bed,
+then update it only if nobody changed it in between. A lost race is retried
+against fresh state with exponential backoff and full jitter, so concurrent
+reports (or agents) never reserve the same bed twice and never overwrite
+each other's changes.
+"""
+
+import asyncio
+import os
+import random
+from datetime import datetime
+
+RESERVE_MAX_ATTEMPTS = int(os.getenv("BED_RESERVE_MAX_ATTEMPTS", "5"))
+RESERVE_BACKOFF_BASE = float(os.getenv("BED_RESERVE_BACKOFF_BASE", "0.02"))
+RESERVE_BACKOFF_CAP = float(os.getenv("BED_RESERVE_BACKOFF_CAP", "0.5"))
+
+# Equipment a protocol's bed must carry (as protocol_matcher.detect_protocol names them;
+# mirrors BED_PROFILES in src/bed_allocator.py)
+PROTOCOL_BED_EQUIPMENT = {
+    "STEMI": ("cardiac_monitor", "defibrillator"),
+    "Stroke": ("neuro_monitor",),
+    "Trauma": ("trauma_cart",),
+}
+
+
+class BedReservationEngine:
+    """Optimistic-concurrency bed reservations"""
+
+    def __init__(
+        self,
+        state,
+        max_attempts=RESERVE_MAX_ATTEMPTS,
+        backoff_base=RESERVE_BACKOFF_BASE,
+        backoff_cap=RESERVE_BACKOFF_CAP,
+    ):
+        self.state = state
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.reserved = 0
+        self.conflicts = 0
+
+    async def reserve(self, bed_id, bed_type=None, patient_id=None):
+        """
+        Reserve one specific bed
+
+        Returns:
+            The reserved bed, or None if it is not available
+        """
+        for attempt in range(self.max_attempts):
+            beds = await self.state.get_beds(bed_type)
+            bed = next((b for b in beds if b["id"] == bed_id), None)
+            if bed is None or bed.get("status") != "available":
+                return None
+            reserved = await self._try_reserve(bed, patient_id)
+            if reserved is not None:
+                return reserved
+            await self._backoff(attempt)
+        return None
+
+    async def reserve_best(self, n, bed_type, equipment=None, patient_id=None):
+        """
+        Reserve up to n available beds of a type that carry the required equipment
+
+        Candidates are ranked best-fit first (fewest extra devices, so richly
+        equipped beds stay free for patients who need them), then by their
+        order in the inventory. A bed lost to a concurrent reservation is
+        skipped; if candidates run out before n beds are held, the list is
+        re-read after a backoff.
+
+        Args:
+            n: Number of beds wanted
+            bed_type: Bed category ("icu", "regular", "trauma_bays")
+            equipment: Iterable of required equipment names
+            patient_id: Optional patient to record on the beds
+
+        Returns:
+            List of reserved beds (shorter than n if not enough are free)
+        """
+        required = set(equipment or ())
+        reserved = []
+        for attempt in range(self.max_attempts):
+            candidates = rank_beds(
+                await self.state.get_beds(bed_type, status="available"), required
+            )
+            if not candidates:
+                break
+            lost_race = False
+            for bed in candidates:
+                if len(reserved) >= n:
+                    break
+                bed_reserved = await self._try_reserve(bed, patient_id)
+                if bed_reserved is not None:
+                    reserved.append(bed_reserved)
+                else:
+                    lost_race = True
+            if len(reserved) >= n or not lost_race:
+                break
+            await self._backoff(attempt)
+        return reserved
+
+    async def reserve_any(self, bed_type, equipment=None, patient_id=None):
+        """Reserve the best available bed of a type, or None"""
+        beds = await self.reserve_best(1, bed_type, equipment, patient_id)
+        return beds[0] if beds else None
+
+    async def release(self, bed_id, status="available"):
+        """Return a reserved/occupied bed to ``status`` (e.g. "cleaning")"""
+        for attempt in range(self.max_attempts):
+            beds = await self.state.get_beds()
+            bed = next((b for b in beds if b["id"] == bed_id), None)
+            if bed is None:
+                return None
+            released = await self.state.update_bed(
+                bed_id,
+                expected_version=bed["version"],
+                status=status,
+                patient_id=None,
+                reserved_at=None,
+            )
+            if released is not None:
+                return released
+            self.conflicts += 1
+            await self._backoff(attempt)
+        return None
+
+    async def _try_reserve(self, bed, patient_id):
+        fields = {"status": "reserved", "reserved_at": datetime.utcnow().isoformat()}
+        if patient_id:
+            fields["patient_id"] = patient_id
+        reserved = await self.state.update_bed(bed["id"], expected_version=bed["version"], **fields)
+        if reserved is None:
+            self.conflicts += 1
+        else:
+            self.reserved += 1
+        return reserved
+
+    async def _backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        await asyncio.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+
+
+def rank_beds(beds, required):
+    """Beds carrying all required equipment, best fit first (stable otherwise)"""
+    matching = [b for b in beds if required.issubset(b.get("equipment") or ())]
+    return sorted(matching, key=lambda b: len(set(b.get("equipment") or ()) - required))
@@ -8,6 +8,7 @@ from uagents_core.contrib.protocols.chat import (
 from datetime import datetime
 from uuid import uuid4
 import os
+from protocol_matcher import detect_protocol, is_incoming_patient
 
 AGENT_SEED = os.getenv("ED_COORDINATOR_SEED", "ed_coordinator_phrase_001")
 
@@ -93,16 +94,10 @@ async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
     ctx.logger.debug(f"Ack received: {msg.acknowledged_msg_id}")
 
 async def process_query(ctx: Context, query: str) -> str:
-    if any(word in query for word in ["ambulance", "patient arriving", "ems", "incoming patient", "chest pain", "stroke", "trauma", "critical"]):
+    if is_incoming_patient(query):
         ctx.logger.info("🚑 AMBULANCE REPORT DETECTED - Initiating broadcast to all agents")
         
-        protocol_type = "general"
-        if any(word in query for word in ["chest pain", "stemi", "heart attack", "mi"]):
-            protocol_type = "STEMI"
-        elif any(word in query for word in ["stroke", "cva", "weakness", "slurred"]):
-            protocol_type = "Stroke"
-        elif any(word in query for word in ["trauma", "accident", "injury", "bleeding"]):
-            protocol_type = "Trauma"
+        protocol_type = detect_protocol(query, default="general")
         
         await broadcast_to_all_agents(ctx, query, protocol_type)
         
@@ -0,0 +1,138 @@
+"""
+Shared HTTP client and hospital-state cache for the DEPLOY_* agents
+
+Every agent used to open a new httpx.AsyncClient and GET the full JSONBin
+record for each tool call. This module keeps one pooled client per process
+and a short-lived in-process copy of the hospital record:
+
+- reads within HOSPITAL_CACHE_TTL seconds are served from memory
+- after the TTL the record is revalidated with If-None-Match when JSONBin
+  returned an ETag (a 304 just refreshes the timestamp)
+- concurrent readers share a single in-flight fetch
+- writes go through the same client and replace the cached copy
+"""
+
+import asyncio
+import copy
+import os
+import time
+
+import httpx
+
+JSONBIN_URL = "https://api.jsonbin.io/v3/b"
+HOSPITAL_CACHE_TTL = float(os.getenv("HOSPITAL_CACHE_TTL", "5.0"))
+HTTP_TIMEOUT = float(os.getenv("HOSPITAL_HTTP_TIMEOUT", "30.0"))
+
+_http_client = None
+_hospital_caches = {}
+
+
+def get_http_client():
+    """Long-lived pooled AsyncClient shared by every tool in this process"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared client (agent shutdown)"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+class HospitalDataCache:
+    """TTL/ETag-validated, request-coalescing cache of one JSONBin record"""
+
+    def __init__(self, bin_id, api_key, ttl=HOSPITAL_CACHE_TTL):
+        self.bin_id = bin_id
+        self.api_key = api_key
+        self.ttl = ttl
+
+        self._record = None
+        self._etag = None
+        self._fetched_at = 0.0
+        self._inflight = None
+
+        self.fetches = 0
+        self.hits = 0
+
+    async def get(self, max_age=None):
+        """
+        Current hospital record
+
+        Returns a deep copy, so callers may modify it before passing it to
+        ``put`` without affecting other handlers.
+
+        Args:
+            max_age: Override the TTL for this read (0 forces revalidation)
+        """
+        ttl = self.ttl if max_age is None else max_age
+        if self._record is not None and time.monotonic() - self._fetched_at < ttl:
+            self.hits += 1
+            return copy.deepcopy(self._record)
+
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        # shield: a cancelled reader must not cancel the fetch other readers await
+        record = await asyncio.shield(self._inflight)
+        return copy.deepcopy(record)
+
+    async def put(self, data):
+        """Write the full record and make it the cached copy"""
+        response = await get_http_client().put(
+            f"{JSONBIN_URL}/{self.bin_id}",
+            json=data,
+            headers={"X-Master-Key": self.api_key, "Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        self._store(copy.deepcopy(data), response.headers.get("ETag"))
+        return response.json()
+
+    def invalidate(self):
+        """Drop the cached record so the next read goes to JSONBin"""
+        self._fetched_at = 0.0
+
+    async def _fetch(self):
+        headers = {"X-Master-Key": self.api_key}
+        if self._etag and self._record is not None:
+            headers["If-None-Match"] = self._etag
+
+        self.fetches += 1
+        response = await get_http_client().get(
+            f"{JSONBIN_URL}/{self.bin_id}/latest", headers=headers
+        )
+        if response.status_code == 304 and self._record is not None:
+            self._fetched_at = time.monotonic()
+            return self._record
+
+        response.raise_for_status()
+        self._store(response.json()["record"], response.headers.get("ETag"))
+        return self._record
+
+    def _store(self, record, etag):
+        self._record = record
+        self._etag = etag
+        self._fetched_at = time.monotonic()
+
+    def _clear_inflight(self, future):
+        if self._inflight is future:
+            self._inflight = None
+        # Retrieve the exception so a failed fetch nobody awaited is not logged
+        if not future.cancelled():
+            future.exception()
+
+
+def get_hospital_cache(bin_id, api_key):
+    """Process-wide cache for a JSONBin record"""
+    cache = _hospital_caches.get(bin_id)
+    if cache is None:
+        cache = HospitalDataCache(bin_id, api_key)
+        _hospital_caches[bin_id] = cache
+    return cache
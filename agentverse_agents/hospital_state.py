@@ -0,0 +1,451 @@
+"""
+Hospital state stores for the DEPLOY_* agents
+
+HospitalStateStore is the interface the agent tools use instead of reading
+and PUTting the whole hospital_data.json-shaped document themselves:
+
+- JsonBinStateStore keeps the original JSONBin document (read-modify-write
+  through the shared cache in hospital_client)
+- SQLiteStateStore keeps one row per bed, medication, lab test/device and
+  protocol in a local SQLite file, seeded from hospital_data.json, and turns
+  "reserve ICU-3" or "decrement alteplase by 1" into a single UPDATE
+
+Select the backend with HOSPITAL_STATE_BACKEND=sqlite|jsonbin (default
+sqlite). Agents running on one host share the SQLite file (WAL mode), so
+their writes no longer overwrite each other and a bed update is a local
+UPDATE instead of a JSONBin GET + PUT. The SQLite file is per host: agents
+on other hosts do not see its reservations or stock changes, so deployments
+spreading the agents over several hosts must set HOSPITAL_STATE_BACKEND=jsonbin.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from hospital_client import get_hospital_cache
+
+logger = logging.getLogger(__name__)
+
+HOSPITAL_STATE_BACKEND = os.getenv("HOSPITAL_STATE_BACKEND", "sqlite").lower()
+HOSPITAL_STATE_DB = os.getenv(
+    "HOSPITAL_STATE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "hospital_state.db"),
+)
+HOSPITAL_DATA_SEED = os.getenv(
+    "HOSPITAL_DATA_SEED",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hospital_data.json"),
+)
+
+# Inventory sections stored as (category, key) rows with an integer count
+STOCK_SECTIONS = ("medications", "lab_equipment")
+
+
+class HospitalStateStore(ABC):
+    """Interface for hospital state used by the agent tools"""
+
+    @abstractmethod
+    async def get_snapshot(self):
+        """Full hospital_data.json-shaped document"""
+
+    @abstractmethod
+    async def get_beds(self, bed_type=None, status=None):
+        """Beds (each with its ``version``), optionally filtered by category and status"""
+
+    @abstractmethod
+    async def update_bed(self, bed_id, expected_version=None, **fields):
+        """
+        Update one bed atomically
+
+        Args:
+            bed_id: Bed to update (e.g. "ICU-3")
+            expected_version: Only apply if the bed is still at this version
+            **fields: Fields to set (status, patient_id, reserved_at, ...)
+
+        Returns:
+            The updated bed, or None if it does not exist or the version moved
+        """
+
+    @abstractmethod
+    async def adjust_stock(self, section, category, key, delta):
+        """
+        Add delta to an inventory count ("medications" or "lab_equipment")
+
+        Returns:
+            New count, or None if the item is missing or would go negative
+        """
+
+    @abstractmethod
+    async def record_protocol_activation(self, protocol_key):
+        """Increment a protocol's active cases and stamp last_activation"""
+
+    async def find_stock(self, section, name):
+        """
+        First inventory item whose name contains ``name`` (case-insensitive)
+
+        Returns:
+            Item dict with its ``category`` and ``key``, or None
+        """
+        snapshot = await self.get_snapshot()
+        for category, items in snapshot.get(section, {}).items():
+            if not isinstance(items, dict):
+                continue
+            for key, item in items.items():
+                if name.lower() in item.get("name", "").lower():
+                    return {**item, "category": category, "key": key}
+        return None
+
+    async def close(self):
+        pass
+
+
+# ============================================================================
+# JSONBIN BACKEND
+# ============================================================================
+
+class JsonBinStateStore(HospitalStateStore):
+    """
+    Original JSONBin document as the store
+
+    Partial updates still read-modify-write the whole record (with a fresh
+    read first), serialized within this process by a lock. Bed versions are
+    kept in the document, but JSONBin cannot enforce them across processes.
+    """
+
+    def __init__(self, bin_id, api_key):
+        self.cache = get_hospital_cache(bin_id, api_key)
+        self._write_lock = asyncio.Lock()
+
+    async def get_snapshot(self):
+        return await self.cache.get()
+
+    async def get_beds(self, bed_type=None, status=None):
+        data = await self.cache.get()
+        beds = []
+        for category, bed_list in data.get("beds", {}).items():
+            if bed_type and category != bed_type:
+                continue
+            beds.extend(
+                {**bed, "category": category, "version": bed.get("version", 0)}
+                for bed in bed_list
+                if status is None or bed.get("status") == status
+            )
+        return beds
+
+    async def update_bed(self, bed_id, expected_version=None, **fields):
+        async with self._write_lock:
+            data = await self.cache.get(max_age=0)
+            for category, bed_list in data.get("beds", {}).items():
+                for bed in bed_list:
+                    if bed["id"] != bed_id:
+                        continue
+                    version = bed.get("version", 0)
+                    if expected_version is not None and version != expected_version:
+                        return None
+                    bed.update(fields)
+                    bed["version"] = version + 1
+                    await self.cache.put(data)
+                    return {**bed, "category": category}
+        return None
+
+    async def adjust_stock(self, section, category, key, delta):
+        async with self._write_lock:
+            data = await self.cache.get(max_age=0)
+            item = data.get(section, {}).get(category, {}).get(key)
+            if item is None or item.get("available", 0) + delta < 0:
+                return None
+            item["available"] = item.get("available", 0) + delta
+            await self.cache.put(data)
+            return item["available"]
+
+    async def record_protocol_activation(self, protocol_key):
+        async with self._write_lock:
+            data = await self.cache.get(max_age=0)
+            protocol = data.get("protocols", {}).get(protocol_key)
+            if protocol is None:
+                return False
+            protocol["active_cases"] = protocol.get("active_cases", 0) + 1
+            protocol["last_activation"] = datetime.utcnow().isoformat()
+            await self.cache.put(data)
+            return True
+
+
+# ============================================================================
+# SQLITE BACKEND
+# ============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS beds (
+    id TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS beds_by_category_status ON beds (category, status);
+CREATE TABLE IF NOT EXISTS medications (
+    category TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    available INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (category, key)
+);
+CREATE TABLE IF NOT EXISTS lab_equipment (
+    category TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    available INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (category, key)
+);
+CREATE TABLE IF NOT EXISTS protocols (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    active_cases INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStateStore(HospitalStateStore):
+    """
+    Local per-entity store
+
+    Every partial update is one statement (or one short transaction), so it
+    is atomic across agent processes sharing the file. Queries run on a
+    worker thread (asyncio.to_thread): another process holding the write
+    lock can make one wait up to the busy timeout, and that wait must not
+    stall the agent's event loop.
+    """
+
+    def __init__(self, path=HOSPITAL_STATE_DB, seed_path=HOSPITAL_DATA_SEED):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        if seed_path and self._is_empty():
+            if os.path.exists(seed_path):
+                with open(seed_path, encoding="utf-8") as f:
+                    self.seed(json.load(f))
+            else:
+                logger.warning(
+                    f"Hospital seed file {seed_path} not found; starting with an empty state store "
+                    f"(set HOSPITAL_DATA_SEED or call seed())"
+                )
+
+    def _is_empty(self):
+        return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 0
+
+    def seed(self, document):
+        """Replace all state with a hospital_data.json-shaped document"""
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("beds", "medications", "lab_equipment", "protocols", "documents"):
+                    conn.execute(f"DELETE FROM {table}")
+
+                for category, bed_list in document.get("beds", {}).items():
+                    for position, bed in enumerate(bed_list):
+                        bed = dict(bed)
+                        version = bed.pop("version", 0)
+                        conn.execute(
+                            "INSERT INTO beds (id, category, position, status, version, data) VALUES (?, ?, ?, ?, ?, ?)",
+                            (bed["id"], category, position, bed.get("status", "available"), version, json.dumps(bed)),
+                        )
+
+                for section in STOCK_SECTIONS:
+                    position = 0
+                    for category, items in document.get(section, {}).items():
+                        for key, item in items.items():
+                            conn.execute(
+                                f"INSERT INTO {section} (category, key, position, available, data) VALUES (?, ?, ?, ?, ?)",
+                                (category, key, position, int(item.get("available", 0)), json.dumps(item)),
+                            )
+                            position += 1
+
+                for position, (key, protocol) in enumerate(document.get("protocols", {}).items()):
+                    conn.execute(
+                        "INSERT INTO protocols (key, position, active_cases, data) VALUES (?, ?, ?, ?)",
+                        (key, position, int(protocol.get("active_cases", 0)), json.dumps(protocol)),
+                    )
+
+                # Remaining sections as whole documents; entity sections get a
+                # placeholder row so snapshots keep the original key order
+                entity_sections = {"beds", "protocols", *STOCK_SECTIONS}
+                for position, (key, value) in enumerate(document.items()):
+                    conn.execute(
+                        "INSERT INTO documents (key, position, data) VALUES (?, ?, ?)",
+                        (key, position, "null" if key in entity_sections else json.dumps(value)),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    async def get_snapshot(self):
+        return await asyncio.to_thread(self._get_snapshot)
+
+    def _get_snapshot(self):
+        with self._lock:
+            conn = self._conn
+            document = {
+                row["key"]: json.loads(row["data"])
+                for row in conn.execute("SELECT key, data FROM documents ORDER BY position")
+            }
+
+            beds = {}
+            for row in conn.execute("SELECT * FROM beds ORDER BY category, position"):
+                beds.setdefault(row["category"], []).append(self._bed(row))
+            document["beds"] = beds
+
+            for section in STOCK_SECTIONS:
+                items = {}
+                for row in conn.execute(f"SELECT * FROM {section} ORDER BY position"):
+                    item = json.loads(row["data"])
+                    item["available"] = row["available"]
+                    items.setdefault(row["category"], {})[row["key"]] = item
+                document[section] = items
+
+            protocols = {}
+            for row in conn.execute("SELECT * FROM protocols ORDER BY position"):
+                protocol = json.loads(row["data"])
+                protocol["active_cases"] = row["active_cases"]
+                protocols[row["key"]] = protocol
+            document["protocols"] = protocols
+        return document
+
+    async def get_beds(self, bed_type=None, status=None):
+        return await asyncio.to_thread(self._get_beds, bed_type, status)
+
+    def _get_beds(self, bed_type, status):
+        query = "SELECT * FROM beds"
+        clauses, params = [], []
+        if bed_type:
+            clauses.append("category = ?")
+            params.append(bed_type)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY category, position"
+        with self._lock:
+            return [
+                {**self._bed(row), "category": row["category"]}
+                for row in self._conn.execute(query, params)
+            ]
+
+    # ------------------------------------------------------------------
+    # Atomic partial updates
+    # ------------------------------------------------------------------
+
+    async def update_bed(self, bed_id, expected_version=None, **fields):
+        return await asyncio.to_thread(self._update_bed, bed_id, expected_version, fields)
+
+    def _update_bed(self, bed_id, expected_version, fields):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT * FROM beds WHERE id = ?", (bed_id,)).fetchone()
+                if row is None or (expected_version is not None and row["version"] != expected_version):
+                    conn.execute("ROLLBACK")
+                    return None
+                data = json.loads(row["data"])
+                data.update(fields)
+                status = data.get("status", row["status"])
+                conn.execute(
+                    "UPDATE beds SET status = ?, version = version + 1, data = ? WHERE id = ?",
+                    (status, json.dumps(data), bed_id),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return {**data, "status": status, "version": row["version"] + 1, "category": row["category"]}
+
+    async def adjust_stock(self, section, category, key, delta):
+        if section not in STOCK_SECTIONS:
+            raise ValueError(f"Unknown inventory section: {section}")
+        return await asyncio.to_thread(self._adjust_stock, section, category, key, delta)
+
+    def _adjust_stock(self, section, category, key, delta):
+        with self._lock:
+            row = self._conn.execute(
+                f"UPDATE {section} SET available = available + ? "
+                f"WHERE category = ? AND key = ? AND available + ? >= 0 RETURNING available",
+                (delta, category, key, delta),
+            ).fetchone()
+        return row["available"] if row else None
+
+    async def record_protocol_activation(self, protocol_key):
+        return await asyncio.to_thread(self._record_protocol_activation, protocol_key)
+
+    def _record_protocol_activation(self, protocol_key):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM protocols WHERE key = ?", (protocol_key,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return False
+                data = json.loads(row["data"])
+                data["last_activation"] = datetime.utcnow().isoformat()
+                conn.execute(
+                    "UPDATE protocols SET active_cases = active_cases + 1, data = ? WHERE key = ?",
+                    (json.dumps(data), protocol_key),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+    def _close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _bed(row):
+        bed = json.loads(row["data"])
+        bed["status"] = row["status"]
+        bed["version"] = row["version"]
+        return bed
+
+
+_state_store = None
+
+
+def get_hospital_state(bin_id=None, api_key=None):
+    """Process-wide HospitalStateStore selected by HOSPITAL_STATE_BACKEND"""
+    global _state_store
+    if _state_store is None:
+        if HOSPITAL_STATE_BACKEND == "jsonbin":
+            _state_store = JsonBinStateStore(bin_id, api_key)
+        else:
+            _state_store = SQLiteStateStore()
+    return _state_store
@@ -0,0 +1,79 @@
+"""
+Protocol keyword matching for the DEPLOY_* agents
+
+All keyword lists are compiled into one case-insensitive regex with word
+boundaries, so each message is scanned once and "mi" no longer matches
+"admission" or "family". Mirrors src/triage.py, which the standalone agents
+cannot import.
+"""
+
+import re
+
+# Protocols in precedence order (first match wins when several are mentioned)
+PROTOCOL_TERMS = {
+    "STEMI": ("stemi", "chest pain", "mi", "heart attack"),
+    "Stroke": ("stroke", "cva", "weakness", "slurred"),
+    "Trauma": ("trauma", "accident", "injury", "bleeding"),
+}
+
+# Other vocabulary matched in the same pass
+SIGNAL_TERMS = {
+    "ambulance": ("ambulance", "ems", "patient arriving", "incoming patient"),
+    "protocol": ("protocol",),
+    "emergency": ("critical", "emergency"),
+}
+
+# Keywords each check reacts to, as the agents used them before the shared matcher
+BROADCAST_TERMS = frozenset({"ambulance", "protocol"})
+EMERGENCY_REPORT_TERMS = frozenset({"ambulance", "chest pain", "stroke", "trauma", "critical", "emergency"})
+INCOMING_PATIENT_TERMS = frozenset({
+    "ambulance", "patient arriving", "ems", "incoming patient", "chest pain", "stroke", "trauma", "critical",
+})
+
+_CATEGORY_OF = {}
+for _category, _terms in list(PROTOCOL_TERMS.items()) + list(SIGNAL_TERMS.items()):
+    for _term in _terms:
+        _CATEGORY_OF.setdefault(_term, _category)
+
+_PATTERN = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in sorted(_CATEGORY_OF, key=len, reverse=True))
+    + r")s?\b",
+    re.IGNORECASE,
+)
+
+
+def match_terms(text):
+    """Matched terms (in order, de-duplicated) and the set of their categories"""
+    terms = {}
+    for found in _PATTERN.findall(text or ""):
+        term = " ".join(found.lower().split())
+        if term not in _CATEGORY_OF:
+            term = term[:-1]
+        terms[term] = None
+    return list(terms), {_CATEGORY_OF[term] for term in terms}
+
+
+def detect_protocol(text, default="General"):
+    """STEMI / Stroke / Trauma, or ``default`` when no protocol keyword is present"""
+    _, categories = match_terms(text)
+    return next((p for p in PROTOCOL_TERMS if p in categories), default)
+
+
+def _mentions(text, terms):
+    return not terms.isdisjoint(match_terms(text)[0])
+
+
+def is_protocol_broadcast(text):
+    """Ambulance report or protocol activation forwarded by the ED coordinator"""
+    return _mentions(text, BROADCAST_TERMS)
+
+
+def is_emergency_report(text):
+    """Message that should trigger an emergency broadcast (ambulance, critical / emergency or a key complaint)"""
+    return _mentions(text, EMERGENCY_REPORT_TERMS)
+
+
+def is_incoming_patient(text):
+    """ASI:One query announcing an incoming patient (ambulance / EMS report or a key complaint)"""
+    return _mentions(text, INCOMING_PATIENT_TERMS)
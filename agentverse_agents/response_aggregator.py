@@ -0,0 +1,122 @@
+"""
+Event-driven aggregation of agent responses for the ED coordinator
+
+Each ambulance broadcast opens an incident keyed by a correlation ID. Agent
+replies are matched to an incident, and the incident completes the moment
+its last expected reply arrives or when its deadline passes, whichever
+comes first. Several incidents can be open at once.
+
+Replies are matched by the "Incident: <id>" tag when an agent echoes it.
+Otherwise they go to the oldest open incident still waiting on that agent,
+since each agent answers broadcasts in the order it receives them.
+"""
+
+import asyncio
+import os
+import re
+import time
+from uuid import uuid4
+
+RESPONSE_DEADLINE_SECONDS = float(os.getenv("RESPONSE_DEADLINE_SECONDS", "10"))
+
+INCIDENT_TAG = re.compile(r"Incident:\s*(INC-[0-9a-f]+)")
+
+
+def new_incident_id():
+    return f"INC-{uuid4().hex[:12]}"
+
+
+class Incident:
+    """One broadcast awaiting responses"""
+
+    def __init__(self, incident_id, ctx, reply_to, expected, context=None):
+        self.incident_id = incident_id
+        self.ctx = ctx
+        self.reply_to = reply_to
+        self.expected = set(expected)
+        self.context = context or {}
+        self.responses = {}
+        self.opened_at = time.monotonic()
+        self.deadline_task = None
+        self.completed_reason = None
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.opened_at
+
+    @property
+    def complete(self):
+        return self.expected.issubset(self.responses)
+
+
+class ResponseAggregator:
+    """
+    Correlates agent responses with open incidents
+
+    Args:
+        on_complete: ``async on_complete(ctx, incident)`` called exactly once
+            per incident, with reason in ``incident.completed_reason``
+            ("complete" or "deadline")
+        deadline: Seconds to wait for stragglers
+    """
+
+    def __init__(self, on_complete, deadline=RESPONSE_DEADLINE_SECONDS):
+        self.on_complete = on_complete
+        self.deadline = deadline
+        self.incidents = {}
+
+    def open(self, ctx, reply_to, expected, incident_id=None, context=None):
+        """Start collecting responses for a broadcast"""
+        incident = Incident(incident_id or new_incident_id(), ctx, reply_to, expected, context)
+        self.incidents[incident.incident_id] = incident
+        incident.deadline_task = asyncio.ensure_future(self._expire(incident))
+        return incident
+
+    async def expect(self, incident_id, expected):
+        """Narrow the expected responders (e.g. to agents the broadcast reached)"""
+        incident = self.incidents.get(incident_id)
+        if incident is None:
+            return
+        incident.expected &= set(expected)
+        if incident.complete:
+            await self._finish(incident, incident.ctx, "complete")
+
+    async def record(self, ctx, agent_name, text):
+        """
+        Attach a response to its incident
+
+        Returns:
+            The incident it was matched to, or None if nothing is waiting on it
+        """
+        incident = self._match(agent_name, text)
+        if incident is None:
+            return None
+        incident.responses[agent_name] = {"text": text, "elapsed": incident.elapsed}
+        if incident.complete:
+            await self._finish(incident, ctx, "complete")
+        return incident
+
+    def _match(self, agent_name, text):
+        tagged = INCIDENT_TAG.search(text)
+        if tagged:
+            incident = self.incidents.get(tagged.group(1))
+            if incident is not None and agent_name not in incident.responses:
+                return incident
+        # dicts keep insertion order, so this walks incidents oldest first
+        for incident in self.incidents.values():
+            if agent_name in incident.expected and agent_name not in incident.responses:
+                return incident
+        return None
+
+    async def _expire(self, incident):
+        await asyncio.sleep(self.deadline)
+        await self._finish(incident, incident.ctx, "deadline")
+
+    async def _finish(self, incident, ctx, reason):
+        if self.incidents.pop(incident.incident_id, None) is None:
+            return
+        incident.completed_reason = reason
+        task = incident.deadline_task
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        await self.on_complete(ctx, incident)
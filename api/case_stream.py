@@ -0,0 +1,164 @@
+"""
+Versioned case-state stream
+Field-level diffs of the case views, numbered so dashboards can apply them in order and resume
+"""
+
+import asyncio
+import itertools
+import uuid
+from collections import deque, OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from .case_views import build_case_view
+from src.case_store import CaseStore, arrival_epoch
+from src.utils import get_config, get_logger
+
+logger = get_logger(__name__)
+config = get_config()
+
+
+def diff_views(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fields of ``after`` that differ from ``before``
+
+    Nested dicts (vitals) are diffed one level down and sent as partial
+    dicts to merge; fields that disappeared are sent as None.
+    """
+    changes: Dict[str, Any] = {}
+    for field, value in after.items():
+        old = before.get(field)
+        if old == value:
+            continue
+        if isinstance(old, dict) and isinstance(value, dict):
+            changes[field] = {k: v for k, v in value.items() if old.get(k) != v}
+        else:
+            changes[field] = value
+    for field in before.keys() - after.keys():
+        changes[field] = None
+    return changes
+
+
+class CaseStateStream:
+    """
+    Sequence-numbered changes to the active cases
+
+    Listens to a CaseStore and, once per event-loop tick, turns the cases
+    touched since the last tick into change records:
+
+        {"seq": 42, "op": "upsert", "case_id": "...", "changes": {field: value}}
+        {"seq": 43, "op": "remove", "case_id": "..."}
+
+    ``seq`` increases by one per record. A new case's upsert carries every
+    field; later upserts carry only the changed ones. The last
+    ``history`` records are kept, so a client that saw ``seq`` N can
+    resume with ``changes_since(N)``; if N is too old it takes a
+    ``snapshot()`` instead. ``stream_id`` changes with every server
+    process, so a client resuming against a restarted server also gets a
+    snapshot. Views exclude ``duration``; clients derive it from
+    ``timestamp``.
+    """
+
+    def __init__(
+        self,
+        store: CaseStore,
+        on_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+        history: Optional[int] = None
+    ):
+        self.store = store
+        self.on_change = on_change
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._log: deque = deque(maxlen=config.CASE_STREAM_HISTORY if history is None else history)
+        # case_id -> (view, arrival epoch) as of self.seq
+        self._views: Dict[str, Tuple[Dict[str, Any], float]] = {
+            case_id: store.projection(case_id, build_case_view) for case_id in store
+        }
+        self._dirty: "OrderedDict[str, None]" = OrderedDict()
+        self._scheduled = False
+        store.add_listener(self._on_mutation)
+
+    def close(self):
+        self.store.remove_listener(self._on_mutation)
+
+    def _on_mutation(self, op: str, case_id: str):
+        self._dirty[case_id] = None
+        if self._scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        # Coalesce all mutations of this tick into one diff per case
+        self._scheduled = True
+        loop.call_soon(self.flush)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Sequence the pending changes and hand each to on_change"""
+        self._scheduled = False
+        dirty = list(self._dirty)
+        self._dirty.clear()
+
+        changes = []
+        for case_id in dirty:
+            before = self._views.get(case_id)
+            if case_id in self.store:
+                projection = self.store.projection(case_id, build_case_view)
+                after = projection[0]
+                fields = after if before is None else diff_views(before[0], after)
+                if not fields:
+                    continue
+                self._views[case_id] = projection
+                change = {"op": "upsert", "case_id": case_id, "changes": fields}
+            elif before is not None:
+                del self._views[case_id]
+                change = {"op": "remove", "case_id": case_id}
+            else:
+                continue
+            self.seq += 1
+            change["seq"] = self.seq
+            self._log.append(change)
+            changes.append(change)
+
+        if self.on_change is not None:
+            for change in changes:
+                try:
+                    self.on_change(change)
+                except Exception as e:
+                    logger.error(f"Error publishing case change {change['seq']}: {e}")
+        return changes
+
+    def changes_since(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """Changes after ``seq`` in order, or None when they are no longer retained"""
+        if seq == self.seq:
+            return []
+        if seq < 0 or seq > self.seq or not self._log or seq < self._log[0]["seq"] - 1:
+            return None
+        start = seq - self._log[0]["seq"] + 1
+        return list(itertools.islice(self._log, start, None))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every active case view (with duration) at the current seq"""
+        self.flush()
+        now_epoch = arrival_epoch(datetime.utcnow())
+        cases = [
+            {**view, "duration": max(int((now_epoch - arrived) / 60), 1)}
+            for view, arrived in self._views.values()
+        ]
+        return {"stream_id": self.stream_id, "seq": self.seq, "cases": cases}
+
+    def resume(self, since: Optional[int], stream_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        What a (re)connecting client needs
+
+        Returns:
+            {"stream_id", "seq", "changes"} when resuming from ``since`` is
+            possible, otherwise a snapshot {"stream_id", "seq", "cases"}
+        """
+        if since is not None and stream_id == self.stream_id:
+            self.flush()
+            changes = self.changes_since(since)
+            if changes is not None:
+                return {"stream_id": self.stream_id, "seq": self.seq, "changes": changes}
+        return self.snapshot()
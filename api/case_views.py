@@ -0,0 +1,77 @@
+"""
+Case Views
+Cached PatientCase projections shared by the case and dashboard routes
+"""
+
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from .models.api_models import PatientCase, PatientVitals, CaseType, CaseStatus
+from src.case_store import CaseStore, case_priority, case_status, to_utc_naive, arrival_epoch
+
+# Case record protocol -> API case type
+CASE_TYPES = {case_type.value.lower(): case_type for case_type in CaseType}
+
+DEFAULT_VITALS = {"hr": 80, "bp_sys": 120, "bp_dia": 80, "spo2": 98, "temp": 37.0}
+
+
+def build_case_view(case_id: str, record: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """
+    Validate a case record once and serialize it for the API
+
+    Returns:
+        Tuple of (JSON-ready PatientCase dict without duration, arrival epoch)
+    """
+    vitals = {**DEFAULT_VITALS, **(record.get("vitals") or {})}
+    arrival_time = to_utc_naive(record.get("arrival_time"))
+
+    case = PatientCase(
+        id=case_id,
+        type=CASE_TYPES.get(str(record.get("protocol", "general")).lower(), CaseType.GENERAL),
+        duration=1,
+        vitals=PatientVitals(
+            hr=vitals["hr"],
+            bp_sys=vitals["bp_sys"],
+            bp_dia=vitals["bp_dia"],
+            spo2=vitals["spo2"],
+            temp=vitals["temp"]
+        ),
+        status=CaseStatus(case_status(record.get("status"))),
+        location=record.get("location") or record.get("assigned_bed") or "ED-1",
+        lab_eta=record.get("lab_eta", 10),
+        assigned_bed=record.get("assigned_bed"),
+        priority=case_priority(record),
+        timestamp=arrival_time,
+        chief_complaint=record.get("chief_complaint", ""),
+        ems_report=record.get("ems_report", "")
+    )
+
+    view = jsonable_encoder(case)
+    del view["duration"]
+    return view, arrival_epoch(arrival_time)
+
+
+def render_case(
+    store: CaseStore,
+    case_id: str,
+    now_epoch: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Serialized PatientCase for one case
+
+    Uses the store's cached projection and only computes the duration
+    (minutes since arrival, at least 1) at call time.
+    """
+    view, arrived = store.projection(case_id, build_case_view)
+    if now_epoch is None:
+        now_epoch = arrival_epoch(datetime.utcnow())
+    duration = int((now_epoch - arrived) / 60)
+    return {**view, "duration": max(duration, 1)}
+
+
+def render_cases(store: CaseStore, matching: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Serialized PatientCase list for (case_id, record) query results"""
+    now_epoch = arrival_epoch(datetime.utcnow())
+    return [render_case(store, case_id, now_epoch) for case_id, _ in matching]
@@ -19,6 +19,8 @@ from .routes import dashboard, cases, agents, simulation
 from .websocket.manager import WebSocketManager
 from .models.api_models import *
 from src.agents import create_agent
+from src.case_journal import CaseJournal
+from src.letta_integration import get_memory_agent
 from src.utils import get_config, get_logger
 
 # Setup logging
@@ -29,11 +31,12 @@ config = get_config()
 ed_coordinator = None
 all_agents = {}
 ws_manager = None
+case_journal = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global ed_coordinator, all_agents, ws_manager
+    global ed_coordinator, all_agents, ws_manager, case_journal
     
     logger.info("🚀 Starting EDFlow AI API Server...")
     
@@ -50,6 +53,20 @@ async def lifespan(app: FastAPI):
             "bed_management": create_agent("bed_management"),
         }
         
+        # Warm start: restore open cases from the last snapshot + journal tail
+        if config.CASE_JOURNAL_ENABLED:
+            case_journal = CaseJournal(
+                config.CASE_JOURNAL_DIR,
+                fsync_batch=config.CASE_JOURNAL_FSYNC_BATCH,
+                fsync_interval=config.CASE_JOURNAL_FSYNC_INTERVAL_SECONDS,
+                snapshot_every=config.CASE_JOURNAL_SNAPSHOT_EVERY
+            )
+            recovered = case_journal.attach(ed_coordinator.active_patients)
+            logger.info(f"📒 Case journal active ({recovered} open cases restored)")
+        
+        # Letta write-behind: replay memory records spilled by the previous run
+        get_memory_agent().start()
+        
         # Setup agent communication with WebSocket
         if ws_manager:
             await ws_manager.setup_agent_listeners(all_agents)
@@ -66,6 +83,11 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("🛑 Shutting down EDFlow AI API Server...")
+    if ws_manager:
+        await ws_manager.close()
+    await get_memory_agent().close()
+    if case_journal:
+        case_journal.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -0,0 +1,152 @@
+"""
+Bounded chat message history
+Fixed-capacity ring of messages, indexed by sender kind and time, each serialized once
+"""
+
+import bisect
+from collections import Counter
+from typing import Dict, Any, List, Optional, Callable
+
+from .models.api_models import ChatMessage
+from src.case_store import arrival_epoch
+from src.utils import get_config
+
+config = get_config()
+
+
+class _Entry:
+    __slots__ = ("key", "message_type", "epoch", "message", "payload")
+
+    def __init__(self, key: str, message_type: str, epoch: float, message: ChatMessage, payload: Dict[str, Any]):
+        self.key = key
+        self.message_type = message_type
+        self.epoch = epoch
+        self.message = message
+        self.payload = payload
+
+
+def _entry_epoch(entry: _Entry) -> float:
+    return entry.epoch
+
+
+class _EntryQueue:
+    """
+    FIFO of entries on a list with a moving head
+
+    Unlike a deque, indexing anywhere is O(1), so bisect and paged slices
+    stay cheap. Popped slots are released and the list is compacted once
+    the dead prefix outgrows the live part, keeping popleft amortized O(1).
+    """
+
+    __slots__ = ("_items", "_head")
+
+    def __init__(self):
+        self._items: List[Optional[_Entry]] = []
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+
+    def __getitem__(self, i: int) -> _Entry:
+        if i < 0:
+            i += len(self)
+        return self._items[self._head + i]
+
+    def append(self, entry: _Entry):
+        self._items.append(entry)
+
+    def popleft(self) -> _Entry:
+        entry = self._items[self._head]
+        self._items[self._head] = None
+        self._head += 1
+        if self._head >= 64 and self._head * 2 >= len(self._items):
+            del self._items[:self._head]
+            self._head = 0
+        return entry
+
+    def slice(self, start: int, end: int) -> List[_Entry]:
+        return self._items[self._head + start:self._head + end]
+
+
+class MessageHistory:
+    """
+    Chat history that keeps at most ``capacity`` messages
+
+    Each message is serialized once, on ``append``; reads return the cached
+    dicts, so nothing is re-serialized or re-parsed. Besides the global
+    ring, messages are indexed by agent_type (or message type for user and
+    system messages) in per-key queues that drop their oldest entry when
+    the global ring evicts it. Entries are in arrival order with
+    non-decreasing epochs and every queue is list-backed, so time bounds
+    are binary searches and a page is one slice.
+    """
+
+    def __init__(self, serializer: Callable[[ChatMessage], Dict[str, Any]], capacity: Optional[int] = None):
+        self.serializer = serializer
+        self.capacity = max(config.MESSAGE_HISTORY_CAPACITY if capacity is None else capacity, 1)
+        self._entries = _EntryQueue()
+        self._by_key: Dict[str, _EntryQueue] = {}
+        self._type_counts: Counter = Counter()
+        self._last_epoch = float("-inf")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, message: ChatMessage) -> Dict[str, Any]:
+        """Add a message; returns its serialized form"""
+        if len(self._entries) >= self.capacity:
+            evicted = self._entries.popleft()
+            bucket = self._by_key[evicted.key]
+            bucket.popleft()
+            if not bucket:
+                del self._by_key[evicted.key]
+            self._type_counts[evicted.message_type] -= 1
+
+        message_type = getattr(message.type, "value", message.type)
+        agent_type = getattr(message.agent_type, "value", message.agent_type)
+        self._last_epoch = max(self._last_epoch, arrival_epoch(message.timestamp))
+        entry = _Entry(
+            key=agent_type or message_type,
+            message_type=message_type,
+            epoch=self._last_epoch,
+            message=message,
+            payload=self.serializer(message)
+        )
+        self._entries.append(entry)
+        self._by_key.setdefault(entry.key, _EntryQueue()).append(entry)
+        self._type_counts[entry.message_type] += 1
+        return entry.payload
+
+    def query(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        agent_type: Optional[str] = None,
+        since: Optional[Any] = None,
+        until: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Serialized messages, oldest first
+
+        Args:
+            limit: Page size
+            offset: Messages to skip, counted back from the newest match
+            agent_type: Only this agent type ("user" / "system" select those message types)
+            since: Only messages at or after this time
+            until: Only messages at or before this time
+        """
+        entries = self._by_key.get(agent_type) if agent_type else self._entries
+        if entries is None:
+            return []
+        lo = bisect.bisect_left(entries, arrival_epoch(since), key=_entry_epoch) if since is not None else 0
+        hi = bisect.bisect_right(entries, arrival_epoch(until), key=_entry_epoch) if until is not None else len(entries)
+        end = max(hi - offset, lo)
+        start = max(end - limit, lo)
+        return [entry.payload for entry in entries.slice(start, end)]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self._entries[-1].payload if self._entries else None
+
+    def type_counts(self) -> Dict[str, int]:
+        """Retained messages per message type (user / agent / system)"""
+        return {message_type: count for message_type, count in self._type_counts.items() if count}
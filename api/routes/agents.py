@@ -104,7 +104,9 @@ async def get_agents_status():
 @router.get("/messages", response_model=List[ChatMessage])
 async def get_agent_messages(
     agent_type: Optional[AgentType] = Query(None, description="Filter by agent type"),
-    limit: int = Query(50, description="Maximum number of messages", ge=1, le=100)
+    limit: int = Query(50, description="Maximum number of messages", ge=1, le=100),
+    offset: int = Query(0, description="Skip this many of the newest matching messages", ge=0),
+    since: Optional[datetime] = Query(None, description="Only messages at or after this time")
 ):
     """
     Get recent agent messages
@@ -112,6 +114,8 @@ async def get_agent_messages(
     Args:
         agent_type: Optional filter by agent type
         limit: Maximum number of messages to return
+        offset: Page offset, counted back from the newest message
+        since: Optional lower time bound
         
     Returns:
         List[ChatMessage]: Recent agent messages
@@ -119,32 +123,16 @@ async def get_agent_messages(
     try:
         ws_manager = get_websocket_manager()
         
-        # Get message history from WebSocket manager
-        messages = ws_manager.get_message_history(limit)
-        
-        # Convert to ChatMessage objects
-        chat_messages = []
-        for msg_data in messages:
-            try:
-                chat_message = ChatMessage(
-                    id=msg_data['id'],
-                    content=msg_data['content'],
-                    timestamp=datetime.fromisoformat(msg_data['timestamp'].replace('Z', '+00:00')),
-                    sender=msg_data['sender'],
-                    type=msg_data['type'],
-                    agent_type=msg_data.get('agent_type')
-                )
-                chat_messages.append(chat_message)
-            except Exception as e:
-                logger.warning(f"Error parsing message: {str(e)}")
-                continue
-        
-        # Filter by agent type if specified
-        if agent_type:
-            chat_messages = [msg for msg in chat_messages if msg.agent_type == agent_type]
+        # Filtered page straight from the history index, already serialized
+        messages = ws_manager.get_message_history(
+            limit,
+            offset=offset,
+            agent_type=agent_type.value if agent_type else None,
+            since=since
+        )
         
-        logger.info(f"Retrieved {len(chat_messages)} agent messages")
-        return chat_messages
+        logger.info(f"Retrieved {len(messages)} agent messages")
+        return JSONResponse(content=messages)
         
     except Exception as e:
         logger.error(f"Error retrieving agent messages: {str(e)}")
@@ -320,12 +308,14 @@ async def get_communication_stats():
         
         # Get basic stats
         connected_clients = ws_manager.get_connected_clients_count()
-        message_history = ws_manager.get_message_history(100)
+        message_history = ws_manager.message_history
         
-        # Calculate message stats
+        # Calculate message stats (maintained incrementally by the history)
+        type_counts = message_history.type_counts()
         total_messages = len(message_history)
-        agent_messages = len([msg for msg in message_history if msg.get('type') == 'agent'])
-        user_messages = len([msg for msg in message_history if msg.get('type') == 'user'])
+        agent_messages = type_counts.get('agent', 0)
+        user_messages = type_counts.get('user', 0)
+        last_message = message_history.latest()
         
         stats_data = {
             "connected_clients": connected_clients,
@@ -333,7 +323,7 @@ async def get_communication_stats():
             "agent_messages": agent_messages,
             "user_messages": user_messages,
             "active_agents": len([agent for agent in all_agents.values() if agent is not None]),
-            "last_message_time": message_history[-1].get('timestamp') if message_history else None,
+            "last_message_time": last_message['timestamp'] if last_message else None,
             "communication_status": "active" if connected_clients > 0 else "idle"
         }
         
@@ -11,6 +11,8 @@ from fastapi.responses import JSONResponse
 from ..models.api_models import (
     PatientCase, CaseType, CaseStatus, ApiResponse, PatientVitals
 )
+from ..case_views import render_case, render_cases
+from src.case_store import CaseStore, to_utc_naive
 from src.utils import get_logger
 
 logger = get_logger(__name__)
@@ -49,54 +51,20 @@ async def get_all_cases(
         
         cases = []
         
-        # Get cases from ED Coordinator
+        # Get filtered cases from the ED Coordinator's indexed case store,
+        # already ordered by priority and timestamp
         if hasattr(ed_coordinator, 'active_patients'):
-            for patient_id, patient_data in ed_coordinator.active_patients.items():
-                # Calculate duration since arrival
-                arrival_time = patient_data.get('arrival_time', datetime.utcnow())
-                if isinstance(arrival_time, str):
-                    arrival_time = datetime.fromisoformat(arrival_time.replace('Z', '+00:00'))
-                duration = int((datetime.utcnow() - arrival_time).total_seconds() / 60)
-                
-                # Create case object
-                case = PatientCase(
-                    id=patient_id,
-                    type=patient_data.get("protocol", "General").upper(),
-                    duration=max(duration, 1),
-                    vitals=PatientVitals(
-                        hr=patient_data.get("vitals", {}).get("hr", 80),
-                        bp_sys=patient_data.get("vitals", {}).get("bp_sys", 120),
-                        bp_dia=patient_data.get("vitals", {}).get("bp_dia", 80),
-                        spo2=patient_data.get("vitals", {}).get("spo2", 98),
-                        temp=patient_data.get("vitals", {}).get("temp", 37.0)
-                    ),
-                    status=patient_data.get("status", "Pending"),
-                    location=patient_data.get("location", f"ED-{len(cases) + 1}"),
-                    lab_eta=patient_data.get("lab_eta", 10),
-                    assigned_bed=patient_data.get("assigned_bed", f"Bed-{len(cases) + 1}"),
-                    priority=1 if patient_data.get("acuity") == "1" else 3,
-                    timestamp=arrival_time,
-                    chief_complaint=patient_data.get("chief_complaint", ""),
-                    ems_report=patient_data.get("ems_report", "")
-                )
-                cases.append(case)
-        
-        # Apply filters
-        if status:
-            cases = [case for case in cases if case.status == status]
-        if case_type:
-            cases = [case for case in cases if case.type == case_type]
-        if priority:
-            cases = [case for case in cases if case.priority == priority]
-        
-        # Sort by priority and timestamp
-        cases.sort(key=lambda x: (x.priority, x.timestamp), reverse=False)
-        
-        # Apply limit
-        cases = cases[:limit]
+            matching = ed_coordinator.active_patients.query(
+                status=status,
+                protocol=case_type,
+                priority=priority,
+                limit=limit
+            )
+            # Serve cached projections; only the duration is computed per request
+            cases = render_cases(ed_coordinator.active_patients, matching)
         
         logger.info(f"Retrieved {len(cases)} cases")
-        return cases
+        return JSONResponse(content=cases)
         
     except Exception as e:
         logger.error(f"Error retrieving cases: {str(e)}")
@@ -125,36 +93,11 @@ async def get_case_details(
         if not patient_data:
             raise HTTPException(status_code=404, detail=f"Case {case_id} not found")
         
-        # Calculate duration since arrival
-        arrival_time = patient_data.get('arrival_time', datetime.utcnow())
-        if isinstance(arrival_time, str):
-            arrival_time = datetime.fromisoformat(arrival_time.replace('Z', '+00:00'))
-        duration = int((datetime.utcnow() - arrival_time).total_seconds() / 60)
-        
-        # Create detailed case object
-        case = PatientCase(
-            id=case_id,
-            type=patient_data.get("protocol", "General").upper(),
-            duration=max(duration, 1),
-            vitals=PatientVitals(
-                hr=patient_data.get("vitals", {}).get("hr", 80),
-                bp_sys=patient_data.get("vitals", {}).get("bp_sys", 120),
-                bp_dia=patient_data.get("vitals", {}).get("bp_dia", 80),
-                spo2=patient_data.get("vitals", {}).get("spo2", 98),
-                temp=patient_data.get("vitals", {}).get("temp", 37.0)
-            ),
-            status=patient_data.get("status", "Pending"),
-            location=patient_data.get("location", "ED-1"),
-            lab_eta=patient_data.get("lab_eta", 10),
-            assigned_bed=patient_data.get("assigned_bed", "Bed-1"),
-            priority=1 if patient_data.get("acuity") == "1" else 3,
-            timestamp=arrival_time,
-            chief_complaint=patient_data.get("chief_complaint", ""),
-            ems_report=patient_data.get("ems_report", "")
-        )
+        # Cached projection of the case, invalidated when it changes
+        case = render_case(ed_coordinator.active_patients, case_id)
         
         logger.info(f"Retrieved details for case {case_id}")
-        return case
+        return JSONResponse(content=case)
         
     except HTTPException:
         raise
@@ -190,10 +133,13 @@ async def update_case_status(
         if not patient_data:
             raise HTTPException(status_code=404, detail=f"Case {case_id} not found")
         
-        # Update status
+        # Update status (through the store so its indexes stay current)
         old_status = patient_data.get("status", "Unknown")
-        patient_data["status"] = new_status
-        patient_data["last_updated"] = datetime.utcnow()
+        ed_coordinator.active_patients.update(
+            case_id,
+            status=new_status,
+            last_updated=datetime.utcnow()
+        )
         
         # Broadcast case update via WebSocket
         if background_tasks and ws_manager:
@@ -297,43 +243,18 @@ async def get_case_statistics():
         ed_coordinator = get_ed_coordinator()
         
         if not hasattr(ed_coordinator, 'active_patients'):
-            ed_coordinator.active_patients = {}
-        
-        cases = ed_coordinator.active_patients
-        
-        # Calculate statistics
-        total_cases = len(cases)
-        critical_cases = len([case for case in cases.values() if case.get("acuity") == "1"])
+            ed_coordinator.active_patients = CaseStore()
         
-        # Count by protocol
-        protocol_counts = {}
-        for case in cases.values():
-            protocol = case.get("protocol", "general")
-            protocol_counts[protocol] = protocol_counts.get(protocol, 0) + 1
-        
-        # Count by status
-        status_counts = {}
-        for case in cases.values():
-            status = case.get("status", "unknown")
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Calculate average duration
-        durations = []
-        for case in cases.values():
-            arrival_time = case.get('arrival_time', datetime.utcnow())
-            if isinstance(arrival_time, str):
-                arrival_time = datetime.fromisoformat(arrival_time.replace('Z', '+00:00'))
-            duration = (datetime.utcnow() - arrival_time).total_seconds() / 60
-            durations.append(duration)
-        
-        avg_duration = sum(durations) / len(durations) if durations else 0
+        # Aggregates are maintained incrementally by the case store
+        stats = ed_coordinator.active_patients.statistics()
+        total_cases = stats["total_active_cases"]
         
         stats_data = {
             "total_active_cases": total_cases,
-            "critical_cases": critical_cases,
-            "average_duration_minutes": round(avg_duration, 1),
-            "protocol_breakdown": protocol_counts,
-            "status_breakdown": status_counts,
+            "critical_cases": stats["critical_cases"],
+            "average_duration_minutes": round(stats["average_duration_minutes"], 1),
+            "protocol_breakdown": stats["protocol_breakdown"],
+            "status_breakdown": stats["status_breakdown"],
             "last_updated": datetime.utcnow().isoformat(),
             "system_capacity": {
                 "current_load": total_cases,
@@ -382,8 +303,11 @@ async def update_case_vitals(
         
         # Update vitals
         old_vitals = patient_data.get("vitals", {})
-        patient_data["vitals"] = vitals.dict()
-        patient_data["vitals_last_updated"] = datetime.utcnow()
+        ed_coordinator.active_patients.update(
+            case_id,
+            vitals=vitals.dict(),
+            vitals_last_updated=datetime.utcnow()
+        )
         
         # Broadcast vitals update via WebSocket
         if background_tasks and ws_manager:
@@ -440,9 +364,7 @@ async def get_case_timeline(
             raise HTTPException(status_code=404, detail=f"Case {case_id} not found")
         
         # Generate timeline events (in real implementation, this would be tracked)
-        arrival_time = patient_data.get('arrival_time', datetime.utcnow())
-        if isinstance(arrival_time, str):
-            arrival_time = datetime.fromisoformat(arrival_time.replace('Z', '+00:00'))
+        arrival_time = to_utc_naive(patient_data.get('arrival_time'))
         
         timeline = [
             {
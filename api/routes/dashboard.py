@@ -12,6 +12,7 @@ from ..models.api_models import (
     DashboardMetrics, PatientCase, ActivityEntry, ApiResponse,
     FilterParams, PaginationParams
 )
+from ..case_views import render_cases
 from src.utils import get_logger
 
 logger = get_logger(__name__)
@@ -26,6 +27,10 @@ def get_all_agents():
     from api.main import get_all_agents
     return get_all_agents()
 
+def get_websocket_manager():
+    from api.main import get_websocket_manager
+    return get_websocket_manager()
+
 @router.get("/metrics", response_model=DashboardMetrics)
 async def get_dashboard_metrics():
     """
@@ -88,58 +93,55 @@ async def get_active_cases(
         
         cases = []
         
-        # Get cases from ED Coordinator
+        # Get the requested page of filtered cases from the ED Coordinator's
+        # indexed case store
         if hasattr(ed_coordinator, 'active_patients'):
-            for patient_id, patient_data in ed_coordinator.active_patients.items():
-                # Calculate duration since arrival
-                arrival_time = patient_data.get('arrival_time', datetime.utcnow())
-                if isinstance(arrival_time, str):
-                    arrival_time = datetime.fromisoformat(arrival_time.replace('Z', '+00:00'))
-                duration = int((datetime.utcnow() - arrival_time).total_seconds() / 60)
-                
-                # Create case object
-                case = PatientCase(
-                    id=patient_id,
-                    type=patient_data.get("protocol", "General").upper(),
-                    duration=max(duration, 1),  # Ensure at least 1 minute
-                    vitals={
-                        "hr": patient_data.get("vitals", {}).get("hr", 80),
-                        "bp_sys": patient_data.get("vitals", {}).get("bp_sys", 120),
-                        "bp_dia": patient_data.get("vitals", {}).get("bp_dia", 80),
-                        "spo2": patient_data.get("vitals", {}).get("spo2", 98),
-                        "temp": patient_data.get("vitals", {}).get("temp", 37.0)
-                    },
-                    status=patient_data.get("status", "Pending"),
-                    location=f"ED-{len(cases) + 1}",
-                    lab_eta=patient_data.get("lab_eta", 10),
-                    assigned_bed=patient_data.get("assigned_bed", f"Bed-{len(cases) + 1}"),
-                    priority=1 if patient_data.get("acuity") == "1" else 3,
-                    timestamp=arrival_time,
-                    chief_complaint=patient_data.get("chief_complaint", ""),
-                    ems_report=patient_data.get("ems_report", "")
-                )
-                cases.append(case)
-        
-        # Apply filters
-        if filters.case_type:
-            cases = [case for case in cases if case.type == filters.case_type]
-        if filters.status:
-            cases = [case for case in cases if case.status == filters.status]
-        if filters.priority:
-            cases = [case for case in cases if case.priority == filters.priority]
-        
-        # Apply pagination
-        start_idx = (pagination.page - 1) * pagination.limit
-        end_idx = start_idx + pagination.limit
-        cases = cases[start_idx:end_idx]
+            matching = ed_coordinator.active_patients.query(
+                status=filters.status,
+                protocol=filters.case_type,
+                priority=filters.priority,
+                offset=(pagination.page - 1) * pagination.limit,
+                limit=pagination.limit
+            )
+            # Serve cached projections; only the duration is computed per request
+            cases = render_cases(ed_coordinator.active_patients, matching)
         
         logger.info(f"Retrieved {len(cases)} active cases")
-        return cases
+        return JSONResponse(content=cases)
         
     except Exception as e:
         logger.error(f"Error retrieving active cases: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve cases: {str(e)}")
 
+@router.get("/cases/changes")
+async def get_case_changes(
+    since: Optional[int] = Query(None, ge=0, description="Last case-stream seq the client applied"),
+    stream_id: Optional[str] = Query(None, description="stream_id the seq belongs to")
+):
+    """
+    Resume the versioned case stream
+    
+    Args:
+        since: Last seq the client applied
+        stream_id: Stream the seq came from (a restarted server starts a new stream)
+        
+    Returns:
+        {"stream_id", "seq", "changes"} with the field-level changes after
+        ``since``, or a full snapshot {"stream_id", "seq", "cases"} when
+        they are no longer retained
+    """
+    try:
+        case_stream = get_websocket_manager().case_stream
+        if case_stream is None:
+            raise HTTPException(status_code=503, detail="Case stream not available")
+        return JSONResponse(content=case_stream.resume(since, stream_id))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving case changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve case changes: {str(e)}")
+
 @router.get("/activity", response_model=List[ActivityEntry])
 async def get_recent_activity(
     activity_type: Optional[str] = Query(None, description="Filter by activity type"),
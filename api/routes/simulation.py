@@ -12,6 +12,7 @@ from ..models.api_models import (
     SimulationRequest, SimulationResponse, CaseType, ApiResponse
 )
 from src.models import PatientArrivalNotification
+from src.case_store import CaseStore
 from src.utils import get_logger
 
 logger = get_logger(__name__)
@@ -67,7 +68,7 @@ async def simulate_stemi(background_tasks: BackgroundTasks):
         
         # Add to ED Coordinator's active patients
         if not hasattr(ed_coordinator, 'active_patients'):
-            ed_coordinator.active_patients = {}
+            ed_coordinator.active_patients = CaseStore()
         
         ed_coordinator.active_patients[patient_id] = {
             "acuity": "1",
@@ -161,7 +162,7 @@ async def simulate_stroke(background_tasks: BackgroundTasks):
         
         # Add to ED Coordinator's active patients
         if not hasattr(ed_coordinator, 'active_patients'):
-            ed_coordinator.active_patients = {}
+            ed_coordinator.active_patients = CaseStore()
         
         ed_coordinator.active_patients[patient_id] = {
             "acuity": "1",
@@ -255,7 +256,7 @@ async def simulate_trauma(background_tasks: BackgroundTasks):
         
         # Add to ED Coordinator's active patients
         if not hasattr(ed_coordinator, 'active_patients'):
-            ed_coordinator.active_patients = {}
+            ed_coordinator.active_patients = CaseStore()
         
         ed_coordinator.active_patients[patient_id] = {
             "acuity": "1",
@@ -350,7 +351,7 @@ async def simulate_custom_case(
         
         # Add to ED Coordinator's active patients
         if not hasattr(ed_coordinator, 'active_patients'):
-            ed_coordinator.active_patients = {}
+            ed_coordinator.active_patients = CaseStore()
         
         ed_coordinator.active_patients[patient_id] = {
             "acuity": str(patient_notification.priority),
@@ -0,0 +1,163 @@
+"""
+Streaming bridge from the EventTracker to Socket.IO
+Batches real agent events into frames and routes them to patient / protocol rooms
+"""
+
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import socketio
+
+from src.utils import get_config, get_logger
+from src.visualization.event_tracker import AgentEvent, EventTracker, get_event_tracker
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Rooms clients join via `join_room` ({"room": ...})
+ALL_EVENTS_ROOM = "agent_events"
+
+
+def patient_room(patient_id: str) -> str:
+    return f"patient:{patient_id}"
+
+
+def protocol_room(protocol: str) -> str:
+    return f"protocol:{protocol.lower()}"
+
+
+def serialize_event(event: AgentEvent) -> Dict[str, Any]:
+    """AgentEvent as a JSON-safe dict (details may hold datetimes etc.)"""
+    return {
+        "timestamp": event.timestamp.isoformat(),
+        "event_type": event.event_type.value,
+        "agent_name": event.agent_name,
+        "description": event.description,
+        "details": json.loads(json.dumps(event.details, default=str)) if event.details else {},
+        "from_agent": event.from_agent,
+        "to_agent": event.to_agent,
+        "message_type": event.message_type,
+        "latency_ms": event.latency_ms,
+        "patient_id": event.patient_id,
+        "protocol": event.protocol,
+    }
+
+
+class EventStreamBridge:
+    """
+    Subscribes to the event tracker and emits `agent_events` frames
+
+    Events are buffered and flushed every ``flush_interval_ms`` or as soon
+    as ``max_batch`` are pending, whichever comes first. Each flush
+    serializes every event once and sends one frame per room: the
+    patient's room, the protocol's room and ALL_EVENTS_ROOM. Clients only
+    receive the rooms they joined. The tracker subscription has its own
+    bounded queue, so a slow socket never holds up agent message handling.
+    If more than EVENT_SUBSCRIBER_QUEUE_SIZE events pile up between
+    flushes the oldest are dropped; ``events_dropped`` counts them and each
+    flush that follows a drop logs a warning.
+    """
+
+    def __init__(
+        self,
+        sio: socketio.AsyncServer,
+        tracker: Optional[EventTracker] = None,
+        flush_interval_ms: Optional[float] = None,
+        max_batch: Optional[int] = None
+    ):
+        self.sio = sio
+        self.tracker = tracker or get_event_tracker()
+        self.flush_interval = (config.WS_EVENT_FLUSH_MS if flush_interval_ms is None else flush_interval_ms) / 1000
+        self.max_batch = config.WS_EVENT_BATCH_SIZE if max_batch is None else max_batch
+        self._pending: deque = deque(maxlen=config.EVENT_SUBSCRIBER_QUEUE_SIZE)
+        self._has_events = asyncio.Event()
+        self._full = asyncio.Event()
+        self._subscription = None
+        self._task: Optional[asyncio.Task] = None
+        self.frames_sent = 0
+        self.events_sent = 0
+        self.events_dropped = 0
+        self._dropped_since_flush = 0
+
+    def start(self):
+        """Subscribe to the tracker and start the flush loop (call from the running loop)"""
+        if self._task is not None:
+            return
+        self._subscription = self.tracker.subscribe(self._on_event, name="websocket_bridge")
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Event stream bridge started ({self.flush_interval * 1000:.0f}ms / {self.max_batch} events per frame)"
+        )
+
+    async def stop(self):
+        if self._subscription is not None:
+            self.tracker.unsubscribe(self._subscription)
+            self._subscription = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def _on_event(self, event: AgentEvent):
+        if len(self._pending) == self._pending.maxlen:
+            self.events_dropped += 1
+            self._dropped_since_flush += 1
+        self._pending.append(event)
+        self._has_events.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            await self._has_events.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing agent events: {e}")
+
+    async def flush(self):
+        """Send everything pending as one frame per room"""
+        self._has_events.clear()
+        self._full.clear()
+        if self._dropped_since_flush:
+            logger.warning(
+                f"Event stream bridge dropped {self._dropped_since_flush} agent events "
+                f"(queue full, {self.events_dropped} total)"
+            )
+            self._dropped_since_flush = 0
+        if not self._pending:
+            return
+        events = list(self._pending)
+        self._pending.clear()
+
+        rooms: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            payload = serialize_event(event)
+            targets = [ALL_EVENTS_ROOM]
+            if event.patient_id:
+                targets.append(patient_room(event.patient_id))
+            if event.protocol:
+                targets.append(protocol_room(event.protocol))
+            for room in targets:
+                rooms.setdefault(room, []).append(payload)
+
+        timestamp = datetime.utcnow().isoformat()
+        await asyncio.gather(*(
+            self.sio.emit('agent_events', {
+                'type': 'agent_events',
+                'room': room,
+                'events': payloads,
+                'timestamp': timestamp
+            }, room=room)
+            for room, payloads in rooms.items()
+        ), return_exceptions=True)
+        self.frames_sent += len(rooms)
+        self.events_sent += len(events)
@@ -6,6 +6,7 @@ Handles real-time communication between uAgents and React frontend
 import asyncio
 import json
 import logging
+import re
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Set
 import socketio
@@ -14,6 +15,12 @@ from ..models.api_models import (
     WebSocketEvent, PatientArrivalEvent, ProtocolActivationEvent,
     CaseUpdateEvent, AgentMessageEvent, ChatMessage, MessageType
 )
+from .event_bridge import EventStreamBridge
+from ..case_stream import CaseStateStream
+from ..message_history import MessageHistory
+from .outbound import OutboundScheduler
+from src.case_store import CaseStore
+from src.triage import get_triage_engine
 from src.utils import get_logger
 
 logger = get_logger(__name__)
@@ -25,7 +32,10 @@ class WebSocketManager:
         self.sio = sio
         self.connected_clients: Set[str] = set()
         self.agent_listeners: Dict[str, Any] = {}
-        self.message_history: List[ChatMessage] = []
+        self.message_history = MessageHistory(self._serialize_message)
+        self.event_bridge = EventStreamBridge(sio)
+        self.outbound = OutboundScheduler(sio)
+        self.case_stream: Optional[CaseStateStream] = None
         self.setup_socket_handlers()
         
     def setup_socket_handlers(self):
@@ -46,9 +56,8 @@ class WebSocketManager:
             
             # Send recent message history
             if self.message_history:
-                recent_messages = self.message_history[-10:]  # Last 10 messages
                 await self.sio.emit('message_history', {
-                    'messages': [self._serialize_message(msg) for msg in recent_messages]
+                    'messages': self.message_history.query(limit=10)  # Last 10 messages
                 }, room=sid)
         
         @self.sio.event
@@ -79,11 +88,11 @@ class WebSocketManager:
                     type=MessageType.USER
                 )
                 
-                # Add to history
-                self.message_history.append(chat_message)
+                # Add to history (serialized once, reused for the broadcast)
+                payload = self.message_history.append(chat_message)
                 
                 # Broadcast to all clients
-                await self.broadcast_chat_message(chat_message)
+                await self.broadcast_chat_message(chat_message, payload)
                 
                 # Simulate agent response after a delay
                 asyncio.create_task(self._simulate_agent_response(message_content))
@@ -108,6 +117,20 @@ class WebSocketManager:
             except Exception as e:
                 logger.error(f"Error handling dashboard update request: {str(e)}")
         
+        @self.sio.event
+        async def resume_cases(sid, data=None):
+            """Send case changes since the client's last seq, or a snapshot"""
+            try:
+                if self.case_stream is None:
+                    return
+                data = data or {}
+                result = self.case_stream.resume(data.get('since'), data.get('stream_id'))
+                event = 'case_deltas' if 'changes' in result else 'case_snapshot'
+                await self.sio.emit(event, result, room=sid)
+                
+            except Exception as e:
+                logger.error(f"Error resuming case stream: {str(e)}")
+        
         @self.sio.event
         async def join_room(sid, data):
             """Handle room joining for targeted updates"""
@@ -135,27 +158,24 @@ class WebSocketManager:
         self.agent_listeners = agents
         logger.info(f"Setup listeners for {len(agents)} agents")
         
-        # In a real implementation, you would setup actual listeners
-        # to the uAgent message handlers here
-        # For now, we'll simulate this with periodic updates
-        asyncio.create_task(self._periodic_agent_updates())
+        # Stream real AgentEvents to the rooms clients joined
+        self.event_bridge.start()
+        
+        # Push field-level case changes instead of full-refresh signals
+        ed_coordinator = agents.get("ed_coordinator")
+        if ed_coordinator is not None and hasattr(ed_coordinator, 'active_patients'):
+            self.case_stream = CaseStateStream(ed_coordinator.active_patients, on_change=self._broadcast_case_change)
     
-    async def _periodic_agent_updates(self):
-        """Simulate periodic agent updates"""
-        while True:
-            try:
-                await asyncio.sleep(30)  # Update every 30 seconds
-                
-                if self.connected_clients:
-                    # Simulate agent activity
-                    await self.broadcast_agent_activity({
-                        'agent': 'system',
-                        'message': 'System health check',
-                        'timestamp': datetime.utcnow().isoformat()
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Error in periodic updates: {str(e)}")
+    def _broadcast_case_change(self, change: Dict[str, Any]):
+        """Queue one sequenced case change for every client (batched by the outbound scheduler)"""
+        self.outbound.enqueue('case_delta', change)
+    
+    async def close(self):
+        """Stop streaming agent events and flush queued broadcasts"""
+        await self.event_bridge.stop()
+        if self.case_stream is not None:
+            self.case_stream.close()
+        await self.outbound.close()
     
     async def _simulate_agent_response(self, user_message: str):
         """Simulate agent response to user messages and handle patient arrivals"""
@@ -295,11 +315,11 @@ class WebSocketManager:
                 agent_type=agent_type
             )
             
-            # Add to history
-            self.message_history.append(agent_message)
+            # Add to history (serialized once, reused for the broadcast)
+            payload = self.message_history.append(agent_message)
             
             # Broadcast to all clients
-            await self.broadcast_chat_message(agent_message)
+            await self.broadcast_chat_message(agent_message, payload)
             
         except Exception as e:
             logger.error(f"Error sending agent message: {str(e)}")
@@ -322,7 +342,7 @@ class WebSocketManager:
                 data=patient_data
             )
             
-            await self.sio.emit('patient_arrival', {
+            self.outbound.enqueue('patient_arrival', {
                 'type': 'patient_arrival',
                 'data': patient_data,
                 'timestamp': datetime.utcnow().isoformat()
@@ -340,11 +360,11 @@ class WebSocketManager:
                 data=protocol_data
             )
             
-            await self.sio.emit('protocol_activation', {
+            self.outbound.enqueue('protocol_activation', {
                 'type': 'protocol_activation',
                 'data': protocol_data,
                 'timestamp': datetime.utcnow().isoformat()
-            })
+            }, key=('protocol_activation', protocol_data.get('patient_id'), protocol_data.get('protocol')))
             
             logger.info(f"Broadcasted protocol activation: {protocol_data.get('protocol')}")
             
@@ -358,17 +378,31 @@ class WebSocketManager:
                 data=case_data
             )
             
-            await self.sio.emit('case_update', {
+            # Only a later update of the same kind (status, vitals, ...) to the
+            # same case supersedes this one; different kinds are all delivered
+            kind = self._case_update_kind(case_data)
+            self.outbound.enqueue('case_update', {
                 'type': 'case_update',
                 'data': case_data,
                 'timestamp': datetime.utcnow().isoformat()
-            })
+            }, key=('case_update', case_data.get('case_id'), kind) if kind else None)
             
             logger.info(f"Broadcasted case update: {case_data.get('case_id')}")
             
         except Exception as e:
             logger.error(f"Error broadcasting case update: {str(e)}")
     
+    @staticmethod
+    def _case_update_kind(case_data: Dict[str, Any]) -> Optional[str]:
+        """What a case_update payload describes; None if it cannot be told apart"""
+        if case_data.get('action'):
+            return f"action:{case_data['action']}"
+        if case_data.get('update_type'):
+            return f"update:{case_data['update_type']}"
+        if 'new_status' in case_data:
+            return 'update:status'
+        return None
+    
     async def broadcast_agent_message(self, message_data: Dict[str, Any]):
         """Broadcast agent communication to all connected clients"""
         try:
@@ -376,7 +410,7 @@ class WebSocketManager:
                 data=message_data
             )
             
-            await self.sio.emit('agent_message', {
+            self.outbound.enqueue('agent_message', {
                 'type': 'agent_message',
                 'data': message_data,
                 'timestamp': datetime.utcnow().isoformat()
@@ -387,10 +421,10 @@ class WebSocketManager:
         except Exception as e:
             logger.error(f"Error broadcasting agent message: {str(e)}")
     
-    async def broadcast_chat_message(self, message: ChatMessage):
+    async def broadcast_chat_message(self, message: ChatMessage, payload: Optional[Dict[str, Any]] = None):
         """Broadcast chat message to all connected clients"""
         try:
-            await self.sio.emit('chat_message', self._serialize_message(message))
+            self.outbound.enqueue('chat_message', payload or self._serialize_message(message))
             logger.info(f"Broadcasted chat message from {message.sender}")
             
         except Exception as e:
@@ -399,7 +433,7 @@ class WebSocketManager:
     async def broadcast_agent_activity(self, activity_data: Dict[str, Any]):
         """Broadcast general agent activity"""
         try:
-            await self.sio.emit('agent_activity', {
+            self.outbound.enqueue('agent_activity', {
                 'type': 'agent_activity',
                 'data': activity_data,
                 'timestamp': datetime.utcnow().isoformat()
@@ -411,21 +445,14 @@ class WebSocketManager:
     async def broadcast_dashboard_update(self, update_data: Dict[str, Any]):
         """Broadcast dashboard data updates"""
         try:
-            await self.sio.emit('dashboard_update', {
+            self.outbound.enqueue('dashboard_update', {
                 'type': 'dashboard_update',
                 'data': update_data,
                 'timestamp': datetime.utcnow().isoformat()
-            })
+            }, key='dashboard_update')
             
-            # Also emit a dashboard refresh event to trigger frontend data reload
-            await self.sio.emit('dashboard_refresh', {
-                'action': update_data.get('action', 'update'),
-                'timestamp': datetime.utcnow().isoformat(),
-                'refresh_metrics': True,
-                'refresh_cases': True
-            })
-            
-            logger.info("Broadcasted dashboard update and refresh")
+            # Case contents reach clients as case_delta changes, so no refresh signal here
+            logger.info("Broadcasted dashboard update")
             
         except Exception as e:
             logger.error(f"Error broadcasting dashboard update: {str(e)}")
@@ -434,7 +461,7 @@ class WebSocketManager:
         """Send event to specific client"""
         try:
             if client_id in self.connected_clients:
-                await self.sio.emit(event, data, room=client_id)
+                self.outbound.enqueue(event, data, room=client_id)
                 logger.info(f"Sent {event} to client {client_id}")
             else:
                 logger.warning(f"Client {client_id} not connected")
@@ -446,44 +473,38 @@ class WebSocketManager:
         """Get number of connected clients"""
         return len(self.connected_clients)
     
-    def get_message_history(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get recent message history"""
-        recent_messages = self.message_history[-limit:] if self.message_history else []
-        return [self._serialize_message(msg) for msg in recent_messages]
+    def get_message_history(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        agent_type: Optional[str] = None,
+        since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Get recent message history (serialized, oldest first)"""
+        return self.message_history.query(limit=limit, offset=offset, agent_type=agent_type, since=since)
     
     async def _parse_and_create_patient_case(self, message: str) -> Optional[Dict[str, Any]]:
         """Parse chat message for patient arrival information and create case if detected"""
         try:
             message_lower = message.lower()
+            triage = get_triage_engine().classify(message)
             
             # Check if message indicates patient arrival
-            arrival_keywords = ["arriving", "patient", "coming", "admission", "case", "emergency"]
-            if not any(keyword in message_lower for keyword in arrival_keywords):
+            if "arrival" not in triage.categories:
                 return None
             
             # Detect condition type
-            condition_type = None
-            if any(word in message_lower for word in ["stemi", "heart attack", "mi", "myocardial"]):
-                condition_type = "stemi"
-            elif any(word in message_lower for word in ["stroke", "cva", "cerebrovascular"]):
-                condition_type = "stroke"
-            elif any(word in message_lower for word in ["trauma", "accident", "injury", "mva"]):
-                condition_type = "trauma"
-            elif any(word in message_lower for word in ["pediatric", "child", "kid", "infant"]):
-                condition_type = "pediatric"
-            else:
-                condition_type = "general"
+            condition_type = triage.protocol
             
             # Extract age if mentioned
-            import re
             age_match = re.search(r'(\d+)\s*(?:year|yr|y\.o\.)', message_lower)
             age = int(age_match.group(1)) if age_match else None
             
             # Extract gender if mentioned
             gender = None
-            if any(word in message_lower for word in ["male", "man", "boy"]):
+            if re.search(r'\b(?:male|man|boy)\b', message_lower):
                 gender = "male"
-            elif any(word in message_lower for word in ["female", "woman", "girl"]):
+            elif re.search(r'\b(?:female|woman|girl)\b', message_lower):
                 gender = "female"
             
             # Create patient case using simulation logic
@@ -519,7 +540,7 @@ class WebSocketManager:
             
             # Add to ED Coordinator's active patients
             if not hasattr(ed_coordinator, 'active_patients'):
-                ed_coordinator.active_patients = {}
+                ed_coordinator.active_patients = CaseStore()
             
             patient_data = {
                 "acuity": "1" if condition_type in ["stemi", "stroke", "trauma"] else "2",
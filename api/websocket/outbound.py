@@ -0,0 +1,115 @@
+"""
+Outbound Socket.IO scheduler
+Merges events produced in the same tick into one frame per target and collapses superseded updates
+"""
+
+import asyncio
+import itertools
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Hashable, Optional, Tuple
+
+import socketio
+
+from src.utils import get_config, get_logger
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Target for events sent to every connected client
+BROADCAST = None
+
+
+class OutboundScheduler:
+    """
+    Micro-batches outgoing Socket.IO events
+
+    ``enqueue`` only records the event; a flush loop sends everything queued
+    every ``flush_interval_ms`` (0 = on the next loop iteration) as one emit
+    per target (room, sid or broadcast). A target with several pending events
+    gets a single ``batch`` frame of {"event", "data"} entries in order;
+    a lone event goes out under its own name as before. Events enqueued with
+    the same ``key`` for the same target replace each other, so only the
+    latest state of a case or dashboard is sent.
+    """
+
+    def __init__(self, sio: socketio.AsyncServer, flush_interval_ms: Optional[float] = None):
+        self.sio = sio
+        self.flush_interval = (config.WS_OUTBOUND_FLUSH_MS if flush_interval_ms is None else flush_interval_ms) / 1000
+        self._pending: Dict[Optional[str], "OrderedDict[Hashable, Tuple[str, Dict[str, Any]]]"] = {}
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.events_enqueued = 0
+        self.events_coalesced = 0
+        self.frames_sent = 0
+
+    def enqueue(
+        self,
+        event: str,
+        data: Dict[str, Any],
+        room: Optional[str] = BROADCAST,
+        key: Optional[Hashable] = None
+    ):
+        """
+        Queue an event for the next flush
+
+        Args:
+            event: Socket.IO event name
+            data: Event payload
+            room: Room or sid; BROADCAST for all clients
+            key: Coalescing key; a pending event with the same key and room is replaced
+        """
+        pending = self._pending.setdefault(room, OrderedDict())
+        if key is None:
+            key = ("seq", next(self._sequence))
+        elif key in pending:
+            # Superseded: drop the old state, send the latest in the new position
+            del pending[key]
+            self.events_coalesced += 1
+        pending[key] = (event, data)
+        self.events_enqueued += 1
+        self._ready.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing outbound events: {e}")
+
+    async def flush(self):
+        """Send everything queued: one emit per target"""
+        self._ready.clear()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        sends = []
+        for room, events in pending.items():
+            if len(events) == 1:
+                event, data = next(iter(events.values()))
+            else:
+                event, data = 'batch', {
+                    'type': 'batch',
+                    'events': [{'event': name, 'data': payload} for name, payload in events.values()],
+                    'timestamp': datetime.utcnow().isoformat()
+                }
+            sends.append(self.sio.emit(event, data, room=room))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error emitting outbound frame: {result}")
+        self.frames_sent += len(sends)
+
+    async def close(self):
+        """Stop the flush loop after sending what is queued"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
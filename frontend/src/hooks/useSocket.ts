@@ -4,7 +4,11 @@
  */
 
 import { useEffect, useState, useCallback, useRef } from "react";
-import { socketService, SocketEventHandlers } from "../services/socket";
+import {
+  socketService,
+  SocketEventHandlers,
+  CaseChange,
+} from "../services/socket";
 import {
   PatientCase,
   ChatMessage,
@@ -127,6 +131,68 @@ export const useSocket = (handlers?: SocketEventHandlers): UseSocketReturn => {
   };
 };
 
+// Case view from the case stream -> PatientCase (duration derived from arrival)
+const toPatientCase = (view: any): PatientCase => {
+  const timestamp = new Date(view.timestamp);
+  return {
+    ...view,
+    timestamp,
+    duration: Math.max(1, Math.floor((Date.now() - timestamp.getTime()) / 60000)),
+  };
+};
+
+// Same order as the REST case list: priority, then arrival, then id
+const compareCases = (a: PatientCase, b: PatientCase): number =>
+  a.priority - b.priority ||
+  new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime() ||
+  (a.id < b.id ? -1 : a.id > b.id ? 1 : 0);
+
+// Insert a case into an already sorted list
+const insertSorted = (cases: PatientCase[], patientCase: PatientCase): PatientCase[] => {
+  let lo = 0;
+  let hi = cases.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (compareCases(cases[mid], patientCase) <= 0) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  return [...cases.slice(0, lo), patientCase, ...cases.slice(lo)];
+};
+
+// Apply one sequenced case change to the current case list
+const applyCaseChange = (cases: PatientCase[], change: CaseChange): PatientCase[] => {
+  if (change.op === "remove") {
+    return cases.filter((patientCase) => patientCase.id !== change.case_id);
+  }
+  const changes = change.changes || {};
+  const index = cases.findIndex((patientCase) => patientCase.id === change.case_id);
+  if (index === -1) {
+    return insertSorted(cases, toPatientCase(changes));
+  }
+  const current: any = cases[index];
+  const updated: any = { ...current, ...changes };
+  if (changes.vitals) {
+    updated.vitals = { ...current.vitals, ...changes.vitals };
+  }
+  if (changes.timestamp) {
+    updated.timestamp = new Date(changes.timestamp);
+  }
+  if (changes.priority !== undefined || changes.timestamp) {
+    // Sort key changed: move the case to its new position
+    return insertSorted([...cases.slice(0, index), ...cases.slice(index + 1)], updated);
+  }
+  const next = [...cases];
+  next[index] = updated;
+  return next;
+};
+
+// Metrics (critical count, wait times, beds) are not part of the case
+// stream; refetch them at most this often while cases are changing
+const METRICS_REFRESH_DEBOUNCE_MS = 1000;
+
 /**
  * Hook for real-time dashboard updates
  */
@@ -135,6 +201,11 @@ export const useRealTimeDashboard = () => {
   const [cases, setCases] = useState<PatientCase[]>([]);
   const [activities, setActivities] = useState<ActivityEntry[]>([]);
   const [lastUpdate, setLastUpdate] = useState<Date>(new Date());
+  const caseStreamRef = useRef<{ streamId: string | null; seq: number | null }>({
+    streamId: null,
+    seq: null,
+  });
+  const metricsTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
 
   // Function to fetch fresh data from API
   const fetchDashboardData = async () => {
@@ -172,11 +243,61 @@ export const useRealTimeDashboard = () => {
     }
   };
 
+  // Fetch fresh metrics once things settle, instead of once per event
+  const scheduleMetricsRefresh = () => {
+    if (metricsTimerRef.current !== null) {
+      return;
+    }
+    metricsTimerRef.current = setTimeout(async () => {
+      metricsTimerRef.current = null;
+      try {
+        const { api } = await import("../services/api");
+        const metricsResponse = await api.getDashboardMetrics();
+        if (metricsResponse) {
+          setMetrics(metricsResponse);
+        }
+      } catch (error) {
+        console.error("❌ Error refreshing dashboard metrics:", error);
+      }
+    }, METRICS_REFRESH_DEBOUNCE_MS);
+  };
+
   const handlers: SocketEventHandlers = {
+    onConnectionStatus: (connected) => {
+      // (Re)join the case stream where we left off
+      if (connected) {
+        const { seq, streamId } = caseStreamRef.current;
+        socketService.resumeCases(seq, streamId);
+      }
+    },
+
+    onCaseSnapshot: (snapshot) => {
+      caseStreamRef.current = { streamId: snapshot.stream_id, seq: snapshot.seq };
+      setCases(snapshot.cases.map(toPatientCase));
+      setLastUpdate(new Date());
+    },
+
+    onCaseDelta: (change) => {
+      const stream = caseStreamRef.current;
+      if (stream.seq === null || change.seq <= stream.seq) {
+        return; // before our snapshot, or already applied
+      }
+      if (change.seq !== stream.seq + 1) {
+        // Missed a change: catch up from the last one applied
+        socketService.resumeCases(stream.seq, stream.streamId);
+        return;
+      }
+      stream.seq = change.seq;
+      setCases((prev) => applyCaseChange(prev, change));
+      scheduleMetricsRefresh();
+      setLastUpdate(new Date());
+    },
+
     onPatientArrival: (data) => {
       console.log("📥 New patient arrival:", data);
-      // Trigger fresh data fetch
-      fetchDashboardData();
+      // The case itself arrives through the case stream
+      scheduleMetricsRefresh();
+      setLastUpdate(new Date());
     },
 
     onProtocolActivation: (data) => {
@@ -196,14 +317,19 @@ export const useRealTimeDashboard = () => {
 
     onCaseUpdate: (data) => {
       console.log("📋 Case updated:", data);
-      // Trigger fresh data fetch for case updates
-      fetchDashboardData();
+      // Case changes are applied from the case stream
+      scheduleMetricsRefresh();
     },
 
     onDashboardUpdate: (data) => {
       console.log("📊 Dashboard updated:", data);
-      // Trigger fresh data fetch
-      fetchDashboardData();
+      if (data?.active_cases_count !== undefined) {
+        setMetrics((prev) =>
+          prev ? { ...prev, active_cases: data.active_cases_count } : prev
+        );
+      }
+      scheduleMetricsRefresh();
+      setLastUpdate(new Date());
     },
 
     onDashboardRefresh: (data) => {
@@ -233,6 +359,15 @@ export const useRealTimeDashboard = () => {
   // Initial data fetch on mount
   useEffect(() => {
     fetchDashboardData();
+    // Already connected (shared socket): join the case stream now
+    if (socketService.isConnected()) {
+      socketService.resumeCases(null, null);
+    }
+    return () => {
+      if (metricsTimerRef.current !== null) {
+        clearTimeout(metricsTimerRef.current);
+      }
+    };
   }, []);
 
   return {
@@ -17,6 +17,20 @@ import {
 
 const WS_URL = import.meta.env.VITE_WS_URL || "http://localhost:8080";
 
+// Versioned case stream: sequenced field-level changes to the active cases
+export interface CaseChange {
+  seq: number;
+  op: "upsert" | "remove";
+  case_id: string;
+  changes?: Record<string, any>;
+}
+
+export interface CaseSnapshot {
+  stream_id: string;
+  seq: number;
+  cases: any[];
+}
+
 export interface SocketEventHandlers {
   onPatientArrival?: (data: PatientArrivalEvent["data"]) => void;
   onProtocolActivation?: (data: ProtocolActivationEvent["data"]) => void;
@@ -26,6 +40,9 @@ export interface SocketEventHandlers {
   onDashboardUpdate?: (data: any) => void;
   onDashboardRefresh?: (data: any) => void;
   onAgentActivity?: (data: any) => void;
+  onAgentEvents?: (events: any[], room: string) => void;
+  onCaseSnapshot?: (snapshot: CaseSnapshot) => void;
+  onCaseDelta?: (change: CaseChange) => void;
   onConnectionStatus?: (connected: boolean) => void;
   onError?: (error: string) => void;
 }
@@ -141,6 +158,32 @@ class SocketService {
       this.handlers.onAgentActivity?.(data.data);
     });
 
+    // Several events flushed together by the server's outbound scheduler:
+    // replay each through the listener registered for its own event name
+    this.socket.on("batch", (frame: any) => {
+      (frame.events || []).forEach((entry: any) => {
+        this.socket?.listeners(entry.event).forEach((listener) => listener(entry.data));
+      });
+    });
+
+    this.socket.on("case_snapshot", (snapshot: CaseSnapshot) => {
+      this.handlers.onCaseSnapshot?.(snapshot);
+    });
+
+    this.socket.on("case_delta", (change: CaseChange) => {
+      this.handlers.onCaseDelta?.(change);
+    });
+
+    this.socket.on("case_deltas", (data: { changes: CaseChange[] }) => {
+      (data.changes || []).forEach((change) => this.handlers.onCaseDelta?.(change));
+    });
+
+    // Batched real agent events for the rooms joined via joinRoom
+    // ("agent_events", "patient:<id>", "protocol:<name>")
+    this.socket.on("agent_events", (data: any) => {
+      this.handlers.onAgentEvents?.(data.events || [], data.room);
+    });
+
     this.socket.on("message_history", (data: any) => {
       console.log("📜 Message history received:", data);
       if (data.messages && this.handlers.onChatMessage) {
@@ -204,6 +247,13 @@ class SocketService {
     }
   }
 
+  // Ask for case changes after `since` (or a snapshot when that is not possible)
+  resumeCases(since?: number | null, streamId?: string | null): void {
+    if (this.socket?.connected) {
+      this.socket.emit("resume_cases", { since, stream_id: streamId });
+    }
+  }
+
   joinRoom(room: string): void {
     if (this.socket?.connected) {
       this.socket.emit("join_room", { room });
@@ -9,7 +9,13 @@ __author__ = "EDFlow AI Team"
 # Make modules available at package level
 from . import models
 from . import utils
+from . import triage
 from . import ai
+from . import case_store
+from . import case_journal
+from . import case_index
+from . import protocol_insights
+from . import bed_allocator
 from . import agents
 
-__all__ = ["models", "utils", "ai", "agents"]
\ No newline at end of file
+__all__ = ["models", "utils", "triage", "ai", "case_store", "case_journal", "case_index", "protocol_insights", "bed_allocator", "agents"]
\ No newline at end of file
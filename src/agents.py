@@ -2,6 +2,8 @@
 All EDFlow AI Agents - Consolidated Implementation
 """
 
+import asyncio
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from uagents import Agent, Context, Protocol, Model
@@ -27,10 +29,14 @@ from .models import (
     BedRequest,
     BedAssignment,
     ProtocolActivation,
+    ProtocolAmendment,
     StatusUpdate,
     Alert,
 )
 from .ai import ClaudeEngine
+from .triage import get_triage_engine
+from .case_store import CaseStore
+from .bed_allocator import BedAllocator, Allocation
 from .utils import get_config, get_logger
 from .visualization.event_tracker import get_event_tracker, AgentEvent, EventType
 from .letta_integration import get_memory_agent
@@ -40,6 +46,9 @@ config = get_config()
 event_tracker = get_event_tracker()
 memory_agent = get_memory_agent()
 
+# Protocols that trigger an activation broadcast
+ACTIVATABLE_PROTOCOLS = ("stemi", "stroke", "trauma", "pediatric")
+
 
 # ============================================================================
 # BASE AGENT CLASS
@@ -92,6 +101,7 @@ class BaseEDFlowAgent:
         @self.chat_proto.on_message(ChatAcknowledgement)
         async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
             logger.debug(f"Ack received: {msg.acknowledged_msg_id}")
+            event_tracker.record_reply(str(msg.acknowledged_msg_id))
     
     async def on_message(self, ctx: Context, sender: str, text: str):
         """Override this to handle messages"""
@@ -100,10 +110,11 @@ class BaseEDFlowAgent:
     async def send_message(self, ctx: Context, recipient: str, text: str, message_type: str = "ChatMessage"):
         """Send a chat message"""
         start_time = datetime.utcnow()
+        msg_id = uuid4()
         
         await ctx.send(recipient, ChatMessage(
             timestamp=start_time,
-            msg_id=uuid4(),
+            msg_id=msg_id,
             content=[TextContent(type="text", text=text)]
         ))
         
@@ -116,9 +127,52 @@ class BaseEDFlowAgent:
             from_agent=self.name,
             to_agent=recipient_name,
             message_type=message_type,
-            description=text[:100]  # Truncate long messages
+            description=text[:100],  # Truncate long messages
+            correlation_id=str(msg_id)  # Round trip closes on the recipient's ChatAcknowledgement
         ))
     
+    async def broadcast(
+        self,
+        ctx: Context,
+        recipients: Dict[str, str],
+        text: str,
+        message_type: str = "ChatMessage",
+        timeout: Optional[float] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Send the same message to several agents concurrently
+        
+        Each recipient gets its own timeout (Config.AGENT_COMM_TIMEOUT_SECONDS
+        by default), so one slow or unreachable agent neither delays nor fails
+        the others.
+        
+        Returns:
+            Per-recipient result: {"delivered": bool, "latency_ms": float, "error": Optional[str]}
+        """
+        timeout = config.AGENT_COMM_TIMEOUT_SECONDS if timeout is None else timeout
+        
+        async def deliver(address: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    self.send_message(ctx, address, text, message_type=message_type),
+                    timeout
+                )
+                error = None
+            except asyncio.TimeoutError:
+                error = f"timed out after {timeout}s"
+            except Exception as e:
+                error = str(e)
+            return {
+                "delivered": error is None,
+                "latency_ms": (time.perf_counter() - started) * 1000,
+                "error": error
+            }
+        
+        targets = {name: addr for name, addr in recipients.items() if addr}
+        results = await asyncio.gather(*(deliver(addr) for addr in targets.values()))
+        return dict(zip(targets, results))
+    
     def _get_agent_name_from_address(self, address: str) -> str:
         """Extract agent name from address"""
         # Try to match address to known agents
@@ -143,12 +197,16 @@ class EDCoordinatorAgent(BaseEDFlowAgent):
         super().__init__("ed_coordinator", config.ED_COORDINATOR_SEED, config.ED_COORDINATOR_PORT)
         self.ai_engine = ClaudeEngine()
         self.memory_agent = memory_agent
-        self.active_patients = {}
+        self.active_patients = CaseStore()
         self.agents = {}
+        self.activations: Dict[str, Dict[str, Any]] = {}  # patient_id -> live protocol activation
+        self.active_patients.add_listener(self._on_case_change)
+        self._refinements = set()
         
         @self.agent.on_event("startup")
         async def startup(ctx: Context):
             logger.info(f"ED Coordinator started: {ctx.agent.address}")
+            self.memory_agent.start()
         
         @self.agent.on_message(model=PatientArrivalNotification)
         async def handle_arrival(ctx: Context, sender: str, msg: PatientArrivalNotification):
@@ -156,6 +214,10 @@ class EDCoordinatorAgent(BaseEDFlowAgent):
     
     async def _process_arrival(self, ctx: Context, msg: PatientArrivalNotification):
         logger.info(f"Patient {msg.patient_id} arriving")
+        arrived = time.perf_counter()
+        
+        # Letta recall runs off-loop while the rest of the arrival is handled
+        recall = asyncio.create_task(self._recall_context(msg))
         
         # Track patient arrival
         event_tracker.track_event(AgentEvent(
@@ -167,29 +229,163 @@ class EDCoordinatorAgent(BaseEDFlowAgent):
             details={"priority": msg.priority, "vitals": msg.vitals}
         ))
         
-        # LETTA INTEGRATION: Retrieve patient history and context
-        patient_context = None
-        if self.memory_agent.is_available():
+        if not config.SPECULATIVE_TRIAGE_ENABLED:
+            analysis = await self._analyze_arrival(msg, recall)
+            self._record_triage(msg.patient_id, analysis, source=analysis.get("source", "ai"))
+            protocol = analysis.get("protocol")
+            if protocol in ACTIVATABLE_PROTOCOLS:
+                await self._protocol_insights(msg.patient_id, protocol)
+                await self._activate_protocol(ctx, msg.patient_id, protocol)
+                self.memory_agent.run_in_background(self._remember_case(msg, protocol, analysis))
+            return
+        
+        # Phase 1: rule engine decides now, so downstream agents start preparing
+        speculative = get_triage_engine().classify(msg.chief_complaint, msg.vitals).to_analysis()
+        self._record_triage(msg.patient_id, speculative, source="rules")
+        protocol = speculative["protocol"]
+        
+        event_tracker.track_event(AgentEvent(
+            timestamp=datetime.utcnow(),
+            event_type=EventType.PROTOCOL_STEP,
+            agent_name=self.name,
+            description=f"Rule-based triage: {protocol.upper()} protocol (pending AI confirmation)",
+            patient_id=msg.patient_id,
+            details=speculative
+        ))
+        
+        if protocol in ACTIVATABLE_PROTOCOLS:
+            await self._activate_protocol(ctx, msg.patient_id, protocol, speculative=True)
+            logger.info(
+                f"{protocol.upper()} activated for {msg.patient_id} "
+                f"{(time.perf_counter() - arrived) * 1000:.1f}ms after arrival"
+            )
+        
+        # Phase 2: Letta + Claude confirm or amend in the background
+        task = asyncio.create_task(self._refine_triage(ctx, msg, speculative, recall))
+        self._refinements.add(task)
+        task.add_done_callback(self._refinements.discard)
+    
+    async def _refine_triage(
+        self,
+        ctx: Context,
+        msg: PatientArrivalNotification,
+        speculative: Dict[str, Any],
+        recall: "asyncio.Task[Optional[str]]"
+    ):
+        """Run the AI analysis and confirm, amend or cancel the speculative activation"""
+        try:
+            analysis = await self._analyze_arrival(msg, recall)
+        except Exception as e:
+            logger.error(f"AI refinement failed for {msg.patient_id}: {str(e)}")
+            event_tracker.track_event(AgentEvent(
+                timestamp=datetime.utcnow(),
+                event_type=EventType.ERROR,
+                agent_name=self.name,
+                description="AI refinement failed; keeping rule-based triage",
+                patient_id=msg.patient_id,
+                details={"error": str(e)}
+            ))
+            return
+        
+        if msg.patient_id not in self.active_patients:
+            return  # Case closed before the AI answered
+        
+        original = speculative["protocol"]
+        protocol = analysis.get("protocol")
+        activation = self.activations.get(msg.patient_id)
+        
+        if analysis.get("source") == "rules":
+            # No model ran (disabled, circuit open, timeout): the rule-based triage stands as is
             event_tracker.track_event(AgentEvent(
                 timestamp=datetime.utcnow(),
                 event_type=EventType.PROTOCOL_STEP,
                 agent_name=self.name,
-                description="📚 Querying Letta for patient history...",
+                description="AI analysis unavailable; keeping rule-based triage",
                 patient_id=msg.patient_id
             ))
-            
-            patient_context = await self.memory_agent.recall_patient_context(
-                msg.patient_id,
-                msg.chief_complaint
+            protocol = original
+        else:
+            self._refine_record(msg.patient_id, analysis)
+            await self._reconcile_activation(ctx, msg.patient_id, original, protocol, activation, analysis)
+        
+        if protocol in ACTIVATABLE_PROTOCOLS:
+            await self._protocol_insights(msg.patient_id, protocol)
+            self.memory_agent.run_in_background(
+                self._remember_case(msg, protocol, analysis, speculative_protocol=original)
             )
-            
+    
+    async def _reconcile_activation(
+        self,
+        ctx: Context,
+        patient_id: str,
+        original: str,
+        protocol: Optional[str],
+        activation: Optional[Dict[str, Any]],
+        analysis: Dict[str, Any]
+    ):
+        """Confirm, amend or cancel the speculative activation to match the AI protocol"""
+        if protocol == original:
+            if activation:
+                activation["speculative"] = False
             event_tracker.track_event(AgentEvent(
                 timestamp=datetime.utcnow(),
                 event_type=EventType.PROTOCOL_STEP,
                 agent_name=self.name,
-                description=f"📚 Letta context retrieved: {patient_context[:80]}...",
-                patient_id=msg.patient_id
+                description=f"AI confirmed {protocol.upper()} protocol",
+                patient_id=patient_id,
+                protocol=protocol,
+                details=analysis
             ))
+        elif activation and protocol in ACTIVATABLE_PROTOCOLS:
+            await self._amend_protocol(
+                ctx, patient_id, "amend", protocol,
+                reason=f"AI analysis recommends {protocol.upper()} over {original.upper()}"
+            )
+        elif activation:
+            await self._amend_protocol(
+                ctx, patient_id, "cancel",
+                reason=f"AI analysis does not support {original.upper()} protocol"
+            )
+        elif protocol in ACTIVATABLE_PROTOCOLS:
+            await self._activate_protocol(ctx, patient_id, protocol)
+    
+    async def _recall_context(self, msg: PatientArrivalNotification) -> Optional[str]:
+        """LETTA INTEGRATION: Retrieve patient history and context (local similar cases when offline)"""
+        if not self.memory_agent.is_available():
+            return await self.memory_agent.recall_patient_context(
+                msg.patient_id, msg.chief_complaint, vitals=msg.vitals
+            )
+        
+        event_tracker.track_event(AgentEvent(
+            timestamp=datetime.utcnow(),
+            event_type=EventType.PROTOCOL_STEP,
+            agent_name=self.name,
+            description="📚 Querying Letta for patient history...",
+            patient_id=msg.patient_id
+        ))
+        
+        patient_context = await self.memory_agent.recall_patient_context(
+            msg.patient_id,
+            msg.chief_complaint,
+            vitals=msg.vitals
+        )
+        
+        event_tracker.track_event(AgentEvent(
+            timestamp=datetime.utcnow(),
+            event_type=EventType.PROTOCOL_STEP,
+            agent_name=self.name,
+            description=f"📚 Letta context retrieved: {patient_context[:80]}...",
+            patient_id=msg.patient_id
+        ))
+        return patient_context
+    
+    async def _analyze_arrival(
+        self,
+        msg: PatientArrivalNotification,
+        recall: "asyncio.Task[Optional[str]]"
+    ) -> Dict[str, Any]:
+        """Claude acuity analysis enriched with the Letta recall"""
+        patient_context = await recall
         
         # AI analysis (now with context from Letta)
         event_tracker.track_event(AgentEvent(
@@ -204,64 +400,106 @@ class EDCoordinatorAgent(BaseEDFlowAgent):
             msg.vitals, msg.chief_complaint, context=patient_context
         )
         
-        self.active_patients[msg.patient_id] = {
+        # Track analysis complete
+        event_tracker.track_event(AgentEvent(
+            timestamp=datetime.utcnow(),
+            event_type=EventType.PROTOCOL_STEP,
+            agent_name=self.name,
+            description=(
+                f"{'Rule-based' if analysis.get('source') == 'rules' else 'AI'} analysis complete: "
+                f"{analysis.get('protocol', 'general').upper()} protocol recommended"
+            ),
+            patient_id=msg.patient_id,
+            details=analysis
+        ))
+        return analysis
+    
+    def _record_triage(self, patient_id: str, analysis: Dict[str, Any], source: str):
+        self.active_patients[patient_id] = {
+            **self.active_patients.get(patient_id, {}),
             "acuity": analysis.get("acuity_level"),
             "protocol": analysis.get("protocol"),
-            "status": "triaged"
+            "status": "triaged",
+            "triage_source": source
+        }
+    
+    def _refine_record(self, patient_id: str, analysis: Dict[str, Any]):
+        """Apply the AI triage to a case already in progress, keeping its current status"""
+        self.active_patients.update(
+            patient_id,
+            acuity=analysis.get("acuity_level"),
+            protocol=analysis.get("protocol"),
+            triage_source="ai"
+        )
+    
+    def _on_case_change(self, op: str, case_id: str):
+        # A discharged / removed case has no live activation left to amend
+        if op == "remove":
+            self.activations.pop(case_id, None)
+    
+    async def _protocol_insights(self, patient_id: str, protocol: str):
+        # LETTA INTEGRATION: Get protocol insights
+        if self.memory_agent.is_available():
+            protocol_insights = await self.memory_agent.get_protocol_insights(protocol)
+            event_tracker.track_event(AgentEvent(
+                timestamp=datetime.utcnow(),
+                event_type=EventType.PROTOCOL_STEP,
+                agent_name=self.name,
+                description=f"📚 Letta protocol insights: {protocol_insights[:80]}...",
+                patient_id=patient_id,
+                protocol=protocol
+            ))
+    
+    async def _remember_case(
+        self,
+        msg: PatientArrivalNotification,
+        protocol: str,
+        analysis: Dict[str, Any],
+        speculative_protocol: Optional[str] = None
+    ):
+        # LETTA INTEGRATION: Store case in memory for future learning
+        # (the fallback store keeps it locally for similar-case recall)
+        outcome = {
+            "protocol_activated": protocol,
+            "activation_time": datetime.utcnow().isoformat(),
+            "acuity_level": analysis.get("acuity_level"),
+            "confidence": analysis.get("confidence")
         }
+        if speculative_protocol is not None:
+            outcome["speculative_protocol"] = speculative_protocol
+        await self.memory_agent.remember_patient_case(
+            patient_id=msg.patient_id,
+            protocol=protocol,
+            vitals=msg.vitals,
+            outcome=outcome,
+            chief_complaint=msg.chief_complaint
+        )
+        if not self.memory_agent.is_available():
+            return
         
-        # Track analysis complete
         event_tracker.track_event(AgentEvent(
             timestamp=datetime.utcnow(),
             event_type=EventType.PROTOCOL_STEP,
             agent_name=self.name,
-            description=f"AI Analysis complete: {analysis.get('protocol', 'general').upper()} protocol recommended",
+            description="💾 Case stored in Letta memory for future learning",
             patient_id=msg.patient_id,
-            details=analysis
+            protocol=protocol
         ))
-        
-        # Activate protocol if needed
-        protocol = analysis.get("protocol")
-        if protocol in ["stemi", "stroke", "trauma", "pediatric"]:
-            # LETTA INTEGRATION: Get protocol insights before activation
-            if self.memory_agent.is_available():
-                protocol_insights = await self.memory_agent.get_protocol_insights(protocol)
-                event_tracker.track_event(AgentEvent(
-                    timestamp=datetime.utcnow(),
-                    event_type=EventType.PROTOCOL_STEP,
-                    agent_name=self.name,
-                    description=f"📚 Letta protocol insights: {protocol_insights[:80]}...",
-                    patient_id=msg.patient_id,
-                    protocol=protocol
-                ))
-            
-            await self._activate_protocol(ctx, msg.patient_id, protocol)
-            
-            # LETTA INTEGRATION: Store case in memory for future learning
-            if self.memory_agent.is_available():
-                await self.memory_agent.remember_patient_case(
-                    patient_id=msg.patient_id,
-                    protocol=protocol,
-                    vitals=msg.vitals,
-                    outcome={
-                        "protocol_activated": protocol,
-                        "activation_time": datetime.utcnow().isoformat(),
-                        "acuity_level": analysis.get("acuity_level"),
-                        "confidence": analysis.get("confidence")
-                    }
-                )
-                
-                event_tracker.track_event(AgentEvent(
-                    timestamp=datetime.utcnow(),
-                    event_type=EventType.PROTOCOL_STEP,
-                    agent_name=self.name,
-                    description="💾 Case stored in Letta memory for future learning",
-                    patient_id=msg.patient_id,
-                    protocol=protocol
-                ))
     
-    async def _activate_protocol(self, ctx: Context, patient_id: str, protocol: str):
+    async def _activate_protocol(
+        self,
+        ctx: Context,
+        patient_id: str,
+        protocol: str,
+        speculative: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
         logger.info(f"Activating {protocol.upper()} protocol for {patient_id}")
+        activation_id = f"ACT-{uuid4().hex[:12]}"
+        self.activations[patient_id] = {
+            "activation_id": activation_id,
+            "protocol": protocol,
+            "speculative": speculative
+        }
         
         # Track protocol activation
         event_tracker.track_event(AgentEvent(
@@ -270,23 +508,102 @@ class EDCoordinatorAgent(BaseEDFlowAgent):
             agent_name=self.name,
             description=f"Activating emergency protocol for patient {patient_id}",
             patient_id=patient_id,
+            protocol=protocol,
+            details={"activation_id": activation_id, "speculative": speculative}
+        ))
+        
+        # Notify all agents in one concurrent fan-out
+        recipients = {name: addr for name, addr in self.agents.items() if addr}
+        if not recipients:
+            return {}
+        
+        event_tracker.track_event(AgentEvent(
+            timestamp=datetime.utcnow(),
+            event_type=EventType.PROTOCOL_STEP,
+            agent_name=self.name,
+            description=f"Notifying {', '.join(recipients)}",
+            patient_id=patient_id,
             protocol=protocol
         ))
         
-        # Notify all agents
-        for agent_name, agent_addr in self.agents.items():
-            if agent_addr:
-                event_tracker.track_event(AgentEvent(
-                    timestamp=datetime.utcnow(),
-                    event_type=EventType.PROTOCOL_STEP,
-                    agent_name=self.name,
-                    description=f"Notifying {agent_name}",
-                    patient_id=patient_id,
-                    protocol=protocol
-                ))
-                await self.send_message(ctx, agent_addr,
-                    f"PROTOCOL: {protocol.upper()} - Patient {patient_id}",
-                    message_type="ProtocolActivation")
+        text = f"PROTOCOL: {protocol.upper()} - Patient {patient_id} (activation {activation_id})"
+        if speculative:
+            text += " [preliminary, pending AI confirmation]"
+        results = await self.broadcast(ctx, recipients, text, message_type="ProtocolActivation")
+        self._report_undelivered(results, patient_id, protocol, "notification")
+        return results
+    
+    async def _amend_protocol(
+        self,
+        ctx: Context,
+        patient_id: str,
+        action: str,
+        amended_protocol: Optional[str] = None,
+        reason: str = ""
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Correct an activation that is already out
+        
+        Args:
+            action: "amend" (switch to amended_protocol) or "cancel"
+        """
+        activation = self.activations.pop(patient_id)
+        amendment = ProtocolAmendment(
+            amendment_id=f"AMD-{uuid4().hex[:12]}",
+            activation_id=activation["activation_id"],
+            patient_id=patient_id,
+            action=action,
+            original_protocol=activation["protocol"],
+            amended_protocol=amended_protocol if action == "amend" else None,
+            reason=reason,
+            amended_by=self.name,
+            amendment_time=datetime.utcnow()
+        )
+        if action == "amend":
+            self.activations[patient_id] = {**activation, "protocol": amended_protocol, "speculative": False}
+        
+        original = activation["protocol"].upper()
+        logger.info(f"{action.title()} {original} protocol for {patient_id}: {reason}")
+        event_tracker.track_event(AgentEvent(
+            timestamp=datetime.utcnow(),
+            event_type=EventType.PROTOCOL_AMENDED,
+            agent_name=self.name,
+            description=(
+                f"Protocol amended {original} → {amended_protocol.upper()} for patient {patient_id}"
+                if action == "amend" else
+                f"Protocol {original} cancelled for patient {patient_id}"
+            ),
+            patient_id=patient_id,
+            protocol=amended_protocol or activation["protocol"],
+            details=amendment.dict()
+        ))
+        
+        recipients = {name: addr for name, addr in self.agents.items() if addr}
+        if not recipients:
+            return {}
+        
+        if action == "amend":
+            text = f"PROTOCOL AMENDED: {original} → {amended_protocol.upper()} - Patient {patient_id}"
+        else:
+            text = f"PROTOCOL CANCELLED: {original} - Patient {patient_id}"
+        text += f" (activation {amendment.activation_id}) - {reason}"
+        results = await self.broadcast(ctx, recipients, text, message_type="ProtocolAmendment")
+        self._report_undelivered(results, patient_id, amended_protocol or activation["protocol"], "amendment")
+        return results
+    
+    def _report_undelivered(self, results: Dict[str, Dict[str, Any]], patient_id: str, protocol: str, kind: str):
+        failed = {name: result["error"] for name, result in results.items() if not result["delivered"]}
+        if failed:
+            logger.warning(f"{protocol.upper()} {kind} not delivered to: {failed}")
+            event_tracker.track_event(AgentEvent(
+                timestamp=datetime.utcnow(),
+                event_type=EventType.ERROR,
+                agent_name=self.name,
+                description=f"Protocol {kind} failed for {', '.join(failed)}",
+                patient_id=patient_id,
+                protocol=protocol,
+                details=failed
+            ))
 
 
 # ============================================================================
@@ -415,25 +732,90 @@ class BedManagementAgent(BaseEDFlowAgent):
     
     def __init__(self):
         super().__init__("bed_management", config.BED_MANAGEMENT_SEED, config.BED_MANAGEMENT_PORT)
-        self.available_beds = ["Bed1", "Bed2", "Bed3", "Bed4", "Bed5"]
+        self.allocator = BedAllocator.from_hospital_data(
+            config.HOSPITAL_DATA_PATH,
+            max_wait=config.BED_REQUEST_TIMEOUT_SECONDS or None
+        )
         
         @self.agent.on_message(model=BedRequest)
         async def handle_request(ctx: Context, sender: str, msg: BedRequest):
             await self._assign_bed(ctx, sender, msg)
+        
+        @self.agent.on_interval(period=30.0)
+        async def expire_requests(ctx: Context):
+            await self._expire_requests(ctx)
+        
+        @self.agent.on_message(model=StatusUpdate)
+        async def handle_status(ctx: Context, sender: str, msg: StatusUpdate):
+            await self._update_bed_status(ctx, msg)
     
     async def _assign_bed(self, ctx: Context, sender: str, msg: BedRequest):
-        logger.info(f"Bed request for patient {msg.patient_id}")
+        logger.info(f"Bed request for patient {msg.patient_id} ({msg.bed_type}, priority {msg.priority})")
         
-        bed_id = self.available_beds.pop(0) if self.available_beds else None
+        try:
+            allocation = self.allocator.request(
+                msg.request_id,
+                msg.patient_id,
+                msg.bed_type,
+                priority=msg.priority,
+                isolation_needed=msg.isolation_needed,
+                requester=sender
+            )
+        except ValueError as e:
+            # Nothing in the inventory could ever satisfy it: answer now instead of queueing forever
+            logger.warning(f"Bed request {msg.request_id} for {msg.patient_id} rejected: {str(e)}")
+            await ctx.send(sender, BedAssignment(
+                assignment_id=f"assign_{msg.request_id}",
+                request_id=msg.request_id,
+                patient_id=msg.patient_id,
+                assigned=False
+            ))
+            return
         
-        await ctx.send(sender, BedAssignment(
-            assignment_id=f"assign_{msg.request_id}",
-            request_id=msg.request_id,
-            patient_id=msg.patient_id,
-            bed_id=bed_id,
-            bed_location=f"ED-{bed_id}" if bed_id else None,
-            assigned=bed_id is not None,
-            assignment_time=datetime.utcnow() if bed_id else None
+        if allocation:
+            await self._send_assignment(ctx, allocation)
+        else:
+            # Queued by priority; the assignment (or a final refusal on expiry)
+            # follows when a matching bed frees up
+            logger.info(f"No matching bed for {msg.patient_id}; request {msg.request_id} queued")
+            await ctx.send(sender, BedAssignment(
+                assignment_id=f"assign_{msg.request_id}",
+                request_id=msg.request_id,
+                patient_id=msg.patient_id,
+                assigned=False,
+                queued=True
+            ))
+    
+    async def _expire_requests(self, ctx: Context):
+        """Give up on requests that waited longer than BED_REQUEST_TIMEOUT_SECONDS"""
+        for pending in self.allocator.expire():
+            logger.warning(f"Bed request {pending.request_id} for {pending.patient_id} expired unassigned")
+            if pending.requester:
+                await ctx.send(pending.requester, BedAssignment(
+                    assignment_id=f"assign_{pending.request_id}",
+                    request_id=pending.request_id,
+                    patient_id=pending.patient_id,
+                    assigned=False
+                ))
+    
+    async def _update_bed_status(self, ctx: Context, msg: StatusUpdate):
+        """Release / cleaning / available transitions for a bed"""
+        if msg.entity_type != "bed" or msg.entity_id not in self.allocator.beds:
+            return
+        
+        logger.info(f"Bed {msg.entity_id} status update: {msg.status}")
+        for allocation in self.allocator.set_status(msg.entity_id, msg.status):
+            await self._send_assignment(ctx, allocation)
+    
+    async def _send_assignment(self, ctx: Context, allocation: Allocation):
+        await ctx.send(allocation.requester, BedAssignment(
+            assignment_id=f"assign_{allocation.request_id}",
+            request_id=allocation.request_id,
+            patient_id=allocation.patient_id,
+            bed_id=allocation.bed.bed_id,
+            bed_location=allocation.bed.location,
+            assigned=True,
+            assignment_time=datetime.utcnow()
         ))
 
 
@@ -3,15 +3,225 @@ Claude AI Engine - Consolidated
 """
 
 import asyncio
+import bisect
+import copy
+import hashlib
 import json
 import re
-from typing import Dict, Any, List
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from anthropic import AsyncAnthropic
 from .utils import get_config, get_logger
+from .triage import VITAL_ALIASES, get_triage_engine
 
 logger = get_logger(__name__)
 
 
+# ============================================================================
+# TRIAGE RESPONSE CACHE
+# ============================================================================
+
+# Vital sign -> bin edges at clinically meaningful thresholds
+VITAL_BINS = {
+    "hr": (40, 50, 60, 101, 121, 151),
+    "bp_sys": (90, 140, 180),
+    "bp_dia": (60, 90, 120),
+    "spo2": (85, 90, 94),
+    "temp": (35.0, 38.0, 39.5),
+    "rr": (10, 21, 30),
+}
+
+
+def _bin_vitals(vitals: Dict[str, Any]) -> Tuple:
+    """Vitals reduced to their clinical range per sign, so near-identical readings share a key"""
+    binned = {}
+    for name, value in (vitals or {}).items():
+        name = VITAL_ALIASES.get(str(name).lower(), str(name).lower())
+        if name == "bp" and isinstance(value, str) and "/" in value:
+            sys_value, _, dia_value = value.partition("/")
+            for part_name, part in (("bp_sys", sys_value), ("bp_dia", dia_value)):
+                try:
+                    binned[part_name] = bisect.bisect_right(VITAL_BINS[part_name], float(part))
+                except ValueError:
+                    binned[part_name] = part.strip()
+            continue
+        edges = VITAL_BINS.get(name)
+        try:
+            binned[name] = bisect.bisect_right(edges, float(value)) if edges else str(value)
+        except (TypeError, ValueError):
+            binned[name] = str(value)
+    return tuple(sorted(binned.items()))
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+SIMILAR_CASES_HEADER = "similar past cases:"
+TIMESTAMP_PATTERN = re.compile(
+    r"\d{4}-\d{2}-\d{2}(?:[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?"
+    r"|\b\d{1,2}:\d{2}(?::\d{2})?\b"
+)
+
+
+def _patient_context(context: Optional[str]) -> str:
+    """
+    The patient-specific part of a Letta recall
+    
+    Drops the "Similar past cases" block (other patients, changes with every
+    remembered case) and timestamps, keeping prior visits, allergies and
+    conditions.
+    """
+    kept = []
+    in_similar = False
+    for line in (context or "").lower().splitlines():
+        stripped = line.strip()
+        if stripped.startswith(SIMILAR_CASES_HEADER):
+            in_similar = True
+            continue
+        if in_similar and (stripped.startswith("-") or not stripped):
+            continue
+        in_similar = False
+        kept.append(TIMESTAMP_PATTERN.sub(" ", line))
+    return _normalize_text("\n".join(kept))
+
+
+def triage_cache_key(
+    vitals: Dict[str, Any],
+    symptoms: str,
+    history: Optional[str] = None,
+    context: Optional[str] = None
+) -> Tuple:
+    """
+    Canonical key: (binned vitals, normalized complaint, history/context digest)
+    
+    Only the patient-specific part of the Letta context is digested, so a
+    returning patient never gets another patient's cached triage while
+    volatile similar-case lines and timestamps do not defeat the cache.
+    """
+    digest = hashlib.sha1(
+        f"{_normalize_text(history)}\x00{_patient_context(context)}".encode()
+    ).hexdigest()
+    return (_bin_vitals(vitals), _normalize_text(symptoms), digest)
+
+
+class TriageCache:
+    """LRU cache with a per-entry TTL for acuity analyses"""
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(value)
+    
+    def put(self, key: Tuple, value: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key: Optional[Tuple] = None):
+        """Drop one entry, or everything when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class AIQueueTimeout(Exception):
+    """No concurrency slot became free in time; the API was never called"""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after consecutive failures; open -> half-open after a cool-down
+    
+    While open, callers skip the API entirely. In half-open state a single
+    probe call is let through: success closes the circuit, failure re-opens
+    it for another cool-down.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """Whether a call may go to the API now"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.short_circuited += 1
+        return False
+    
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Claude AI circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+    
+    def record_skipped(self):
+        """A permitted call never reached the API (e.g. queued too long): no verdict, free the probe"""
+        self._probe_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Claude AI circuit open after {self.failures} failures; using rule-based triage")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
 class ClaudeEngine:
     """Claude AI reasoning engine for EDFlow AI"""
     
@@ -19,8 +229,19 @@ class ClaudeEngine:
         config = get_config()
         self.api_key = config.ANTHROPIC_API_KEY
         self.timeout = config.AI_RESPONSE_TIMEOUT_SECONDS
+        self.queue_timeout = config.AI_QUEUE_TIMEOUT_SECONDS
         self.client = AsyncAnthropic(api_key=self.api_key) if self.api_key else None
         self.model = "claude-3-5-sonnet-20241022"
+        self.cache = TriageCache(
+            config.AI_CACHE_MAX_ENTRIES, config.AI_CACHE_TTL_SECONDS
+        ) if config.AI_CACHE_ENABLED else None
+        
+        # Upstream protection: bounded concurrency, single-flight, circuit breaker
+        self._semaphore = asyncio.Semaphore(config.AI_MAX_CONCURRENT_REQUESTS)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.breaker = CircuitBreaker(
+            config.AI_BREAKER_FAILURE_THRESHOLD, config.AI_BREAKER_RESET_SECONDS
+        )
         logger.info(f"Claude AI engine initialized")
     
     async def analyze_patient_acuity(
@@ -42,6 +263,17 @@ class ClaudeEngine:
         if not self.client:
             return self._fallback_acuity(vitals, symptoms)
         
+        cache_key = None
+        if self.cache is not None:
+            cache_key = triage_cache_key(vitals, symptoms, history, context)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Upstream known to be failing: degrade immediately instead of waiting out the timeout
+        if not self.breaker.allow():
+            return self._fallback_acuity(vitals, symptoms)
+        
         # Build prompt with context if available
         context_section = ""
         if context:
@@ -72,43 +304,68 @@ JSON format:
 }}"""
         
         try:
-            response = await asyncio.wait_for(
-                self.client.messages.create(
-                    model=self.model,
-                    max_tokens=1024,
-                    messages=[{"role": "user", "content": prompt}]
-                ),
-                timeout=self.timeout
-            )
-            
-            content = response.content[0].text
+            content = await self._complete(prompt)
             json_match = re.search(r'\{.*\}', content, re.DOTALL)
             if json_match:
-                return json.loads(json_match.group())
+                analysis = json.loads(json_match.group())
+                # Only real model answers are cached; fallbacks must not outlive an outage
+                if cache_key is not None:
+                    self.cache.put(cache_key, analysis)
+                return analysis
             return self._fallback_acuity(vitals, symptoms)
         except Exception as e:
             logger.error(f"Claude AI error: {str(e)}")
             return self._fallback_acuity(vitals, symptoms)
     
-    def _fallback_acuity(self, vitals: Dict[str, Any], symptoms: str) -> Dict[str, Any]:
-        """Rule-based fallback"""
-        acuity = "3"
-        protocol = "general"
-        
-        if any(word in symptoms.lower() for word in ["chest pain", "mi", "stemi"]):
-            protocol = "stemi"
-            acuity = "1"
-        elif any(word in symptoms.lower() for word in ["stroke", "cva", "weakness"]):
-            protocol = "stroke"
-            acuity = "1"
-        elif any(word in symptoms.lower() for word in ["trauma", "accident", "injury"]):
-            protocol = "trauma"
-            acuity = "1"
+    async def _complete(self, prompt: str) -> str:
+        """
+        Model completion for a prompt, sharing one in-flight call per identical prompt
         
-        return {
-            "acuity_level": acuity,
-            "protocol": protocol,
-            "risk_factors": [],
-            "confidence": 0.7,
-            "immediate_actions": ["assess", "monitor"]
-        }
\ No newline at end of file
+        Waiting for a concurrency slot is bounded separately (queue_timeout)
+        and never counts against the circuit breaker; only calls that reached
+        the API are timed out with ``timeout`` and recorded, once each however
+        many callers were coalesced onto them.
+        """
+        key = hashlib.sha256(f"{self.model}\x00{prompt}".encode()).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create_message(prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._call_finished(key, done))
+        return await asyncio.shield(task)
+    
+    async def _create_message(self, prompt: str) -> str:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.breaker.record_skipped()
+            raise AIQueueTimeout(f"no AI request slot free within {self.queue_timeout}s")
+        try:
+            try:
+                response = await asyncio.wait_for(
+                    self.client.messages.create(
+                        model=self.model,
+                        max_tokens=1024,
+                        messages=[{"role": "user", "content": prompt}]
+                    ),
+                    timeout=self.timeout
+                )
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+        finally:
+            self._semaphore.release()
+        return response.content[0].text
+    
+    def _call_finished(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            self.breaker.record_skipped()
+    
+    def _fallback_acuity(self, vitals: Dict[str, Any], symptoms: str) -> Dict[str, Any]:
+        """Rule-based fallback, marked ``source: "rules"`` so callers can tell no model ran"""
+        analysis = get_triage_engine().classify(symptoms, vitals).to_analysis()
+        analysis["source"] = "rules"
+        return analysis
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""
+Equipment-aware bed allocator for the Bed Management agent
+Free beds indexed by category and capability set, requests served by priority
+"""
+
+import heapq
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, FrozenSet, Iterable
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+
+# Request bed_type -> (bed category, required equipment)
+BED_PROFILES: Dict[str, Tuple[str, FrozenSet[str]]] = {
+    "stemi": ("icu", frozenset({"cardiac_monitor", "defibrillator"})),
+    "cardiac": ("icu", frozenset({"cardiac_monitor", "defibrillator"})),
+    "stroke": ("icu", frozenset({"neuro_monitor"})),
+    "neuro": ("icu", frozenset({"neuro_monitor"})),
+    "trauma": ("trauma_bays", frozenset({"trauma_cart"})),
+    "icu": ("icu", frozenset()),
+    "regular": ("regular", frozenset()),
+    "general": ("regular", frozenset()),
+    "trauma_bays": ("trauma_bays", frozenset()),
+}
+
+ISOLATION = "isolation"
+
+# Beds used when no hospital inventory file is available
+DEFAULT_BEDS = [
+    {"id": f"Bed{i}", "category": "regular", "location": f"ED-Bed{i}"} for i in range(1, 6)
+]
+
+
+@dataclass
+class Bed:
+    """One physical bed and its lifecycle state"""
+    bed_id: str
+    category: str
+    location: str
+    capabilities: FrozenSet[str]
+    status: str = "available"  # available -> occupied -> cleaning -> available
+    patient_id: Optional[str] = None
+    request_id: Optional[str] = None
+
+
+@dataclass(order=True)
+class PendingRequest:
+    """A bed request waiting for a matching bed"""
+    priority: int
+    seq: int
+    request_id: str = field(compare=False)
+    patient_id: str = field(compare=False)
+    requester: Optional[str] = field(default=None, compare=False)
+    queued_at: float = field(default_factory=time.monotonic, compare=False)
+
+
+@dataclass
+class Allocation:
+    """A bed handed to a request"""
+    request_id: str
+    patient_id: str
+    bed: Bed
+    requester: Optional[str] = None
+
+
+def resolve_profile(bed_type: str, isolation_needed: bool = False) -> Tuple[str, FrozenSet[str]]:
+    """Bed category and required capabilities for a BedRequest (unknown bed types get a regular bed)"""
+    key = (bed_type or "regular").lower()
+    if key not in BED_PROFILES:
+        logger.warning(f"Unknown bed type '{bed_type}'; allocating a regular bed")
+        key = "regular"
+    category, required = BED_PROFILES[key]
+    if isolation_needed:
+        required = required | {ISOLATION}
+    return category, required
+
+
+class BedAllocator:
+    """
+    Priority bed allocator.
+
+    Free beds live in one min-heap per bed class, where a class is
+    (category, capability set) and beds within it are ordered by location.
+    The number of classes depends on the equipment combinations in the
+    hospital, not on the number of beds, so finding the best-fitting class
+    for a request is a short scan of the category's classes and taking a bed
+    is O(log N).
+
+    Requests that cannot be served wait in per-profile heaps keyed on
+    (priority, arrival). When a bed becomes available again (after release
+    and cleaning), the most urgent waiting request it can satisfy gets it.
+    Lower priority numbers are more urgent (1 = critical). A request no bed
+    in the inventory could ever satisfy is rejected instead of queued, and
+    ``expire`` drops requests that have waited longer than ``max_wait``
+    seconds.
+    """
+
+    def __init__(self, beds: Optional[Iterable[Dict[str, Any]]] = None, max_wait: Optional[float] = None):
+        self.max_wait = max_wait
+        self.beds: Dict[str, Bed] = {}
+        self._free: Dict[Tuple[str, FrozenSet[str]], List[Tuple[str, str]]] = {}
+        self._classes_by_category: Dict[str, List[FrozenSet[str]]] = {}
+        self._fit_cache: Dict[Tuple[str, FrozenSet[str]], List[FrozenSet[str]]] = {}
+        self._waiting: Dict[Tuple[str, FrozenSet[str]], List[PendingRequest]] = {}
+        self._seq = itertools.count()
+
+        for bed in beds if beds is not None else DEFAULT_BEDS:
+            self.add_bed(bed)
+
+    @classmethod
+    def from_hospital_data(cls, path: str, max_wait: Optional[float] = None) -> "BedAllocator":
+        """Seed from a hospital_data.json-shaped file (falls back to DEFAULT_BEDS)"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Bed inventory {path} unavailable ({str(e)}); using default beds")
+            return cls(max_wait=max_wait)
+        beds = [
+            {**bed, "category": category}
+            for category, bed_list in data.get("beds", {}).items()
+            for bed in bed_list
+        ]
+        return cls(beds, max_wait=max_wait)
+
+    # ------------------------------------------------------------------
+    # Inventory
+    # ------------------------------------------------------------------
+
+    def add_bed(self, record: Dict[str, Any]) -> Bed:
+        """Add a bed from an inventory record (id, category, location, equipment, status)"""
+        capabilities = set(record.get("equipment") or ())
+        if record.get("isolation"):
+            capabilities.add(ISOLATION)
+        bed = Bed(
+            bed_id=record["id"],
+            category=record.get("category", "regular"),
+            location=record.get("location", record["id"]),
+            capabilities=frozenset(capabilities),
+            status=record.get("status", "available"),
+            patient_id=record.get("patient_id"),
+        )
+        self.beds[bed.bed_id] = bed
+
+        bed_class = (bed.category, bed.capabilities)
+        if bed_class not in self._free:
+            self._free[bed_class] = []
+            self._classes_by_category.setdefault(bed.category, []).append(bed.capabilities)
+            self._fit_cache.clear()
+        if bed.status == "available":
+            heapq.heappush(self._free[bed_class], (bed.location, bed.bed_id))
+        return bed
+
+    def available_count(self, category: Optional[str] = None) -> int:
+        return sum(
+            1 for bed in self.beds.values()
+            if bed.status == "available" and (category is None or bed.category == category)
+        )
+
+    def waiting_count(self) -> int:
+        return sum(len(heap) for heap in self._waiting.values())
+
+    # ------------------------------------------------------------------
+    # Allocation
+    # ------------------------------------------------------------------
+
+    def request(
+        self,
+        request_id: str,
+        patient_id: str,
+        bed_type: str,
+        priority: int = 3,
+        isolation_needed: bool = False,
+        requester: Optional[str] = None
+    ) -> Optional[Allocation]:
+        """
+        Assign the best-fitting free bed, or queue the request
+
+        Returns:
+            Allocation if a bed was assigned now, None if the request is waiting
+
+        Raises:
+            ValueError: No bed in the inventory has the required category and equipment
+        """
+        profile = resolve_profile(bed_type, isolation_needed)
+        if not self._fitting_classes(profile):
+            category, required = profile
+            raise ValueError(
+                f"No {category} bed with {', '.join(sorted(required)) or 'no special equipment'} in the inventory"
+            )
+        pending = PendingRequest(priority, next(self._seq), request_id, patient_id, requester)
+
+        # Serve in priority order: only take a bed now if nobody more urgent
+        # is already waiting for the same kind of bed
+        waiting = self._waiting.get(profile)
+        if not waiting or pending < waiting[0]:
+            bed = self._take(profile)
+            if bed is not None:
+                return self._assign(bed, pending)
+
+        heapq.heappush(self._waiting.setdefault(profile, []), pending)
+        return None
+
+    def cancel(self, request_id: str) -> bool:
+        """Drop a waiting request"""
+        for heap in self._waiting.values():
+            for i, pending in enumerate(heap):
+                if pending.request_id == request_id:
+                    heap[i] = heap[-1]
+                    heap.pop()
+                    heapq.heapify(heap)
+                    return True
+        return False
+
+    def expire(self, now: Optional[float] = None) -> List[PendingRequest]:
+        """
+        Drop requests that have waited longer than max_wait
+
+        Returns:
+            The expired requests, so their requesters can be told
+        """
+        if self.max_wait is None:
+            return []
+        deadline = (time.monotonic() if now is None else now) - self.max_wait
+        expired = []
+        for profile, heap in list(self._waiting.items()):
+            kept = [pending for pending in heap if pending.queued_at > deadline]
+            if len(kept) == len(heap):
+                continue
+            expired.extend(pending for pending in heap if pending.queued_at <= deadline)
+            if kept:
+                heapq.heapify(kept)
+                self._waiting[profile] = kept
+            else:
+                del self._waiting[profile]
+        return expired
+
+    def release(self, bed_id: str, needs_cleaning: bool = True) -> List[Allocation]:
+        """
+        Free an occupied bed
+
+        Returns:
+            Allocations made to waiting requests (empty while the bed is cleaning)
+        """
+        bed = self.beds[bed_id]
+        bed.patient_id = None
+        bed.request_id = None
+        if needs_cleaning:
+            bed.status = "cleaning"
+            return []
+        return self._make_available(bed)
+
+    def mark_clean(self, bed_id: str) -> List[Allocation]:
+        """Cleaning finished; the bed goes to the most urgent matching waiter"""
+        bed = self.beds[bed_id]
+        if bed.status != "cleaning":
+            return []
+        return self._make_available(bed)
+
+    def set_status(self, bed_id: str, status: str) -> List[Allocation]:
+        """Apply a bed status update (released / cleaning / available)"""
+        status = status.lower()
+        if status in ("released", "discharged"):
+            return self.release(bed_id)
+        if status == "cleaning":
+            return self.release(bed_id, needs_cleaning=True)
+        if status in ("available", "clean", "cleaned"):
+            bed = self.beds[bed_id]
+            if bed.status == "cleaning":
+                return self.mark_clean(bed_id)
+            if bed.status != "available":
+                return self.release(bed_id, needs_cleaning=False)
+        return []
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _fitting_classes(self, profile: Tuple[str, FrozenSet[str]]) -> List[FrozenSet[str]]:
+        """Capability sets in the category that satisfy the profile, best fit first"""
+        classes = self._fit_cache.get(profile)
+        if classes is None:
+            category, required = profile
+            classes = sorted(
+                (caps for caps in self._classes_by_category.get(category, []) if required <= caps),
+                key=lambda caps: (len(caps - required), sorted(caps))
+            )
+            self._fit_cache[profile] = classes
+        return classes
+
+    def _take(self, profile: Tuple[str, FrozenSet[str]]) -> Optional[Bed]:
+        category = profile[0]
+        for caps in self._fitting_classes(profile):
+            heap = self._free[(category, caps)]
+            while heap:
+                _, bed_id = heapq.heappop(heap)
+                # Entries are dropped lazily when a free bed is taken out of service
+                if self.beds[bed_id].status == "available":
+                    return self.beds[bed_id]
+        return None
+
+    def _assign(self, bed: Bed, pending: PendingRequest) -> Allocation:
+        bed.status = "occupied"
+        bed.patient_id = pending.patient_id
+        bed.request_id = pending.request_id
+        return Allocation(pending.request_id, pending.patient_id, bed, pending.requester)
+
+    def _make_available(self, bed: Bed) -> List[Allocation]:
+        # Most urgent waiting request this bed can satisfy
+        best_profile = None
+        for profile, heap in self._waiting.items():
+            category, required = profile
+            if heap and category == bed.category and required <= bed.capabilities:
+                if best_profile is None or heap[0] < self._waiting[best_profile][0]:
+                    best_profile = profile
+
+        if best_profile is not None:
+            pending = heapq.heappop(self._waiting[best_profile])
+            return [self._assign(bed, pending)]
+
+        bed.status = "available"
+        heapq.heappush(self._free[(bed.category, bed.capabilities)], (bed.location, bed.bed_id))
+        return []
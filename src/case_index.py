@@ -0,0 +1,262 @@
+"""
+Similar-case index for offline patient memory
+Past cases as normalized vitals vectors plus complaint token sets, queried by k-nearest-neighbour
+"""
+
+import heapq
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, FrozenSet, Set, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from .triage import VITAL_ALIASES
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+
+# Vital -> (typical value, scale): features are (value - typical) / scale, missing -> typical
+VITAL_SCALES: Dict[str, Tuple[float, float]] = {
+    "hr": (80.0, 20.0),
+    "bp_sys": (120.0, 20.0),
+    "bp_dia": (80.0, 15.0),
+    "spo2": (97.0, 3.0),
+    "temp": (37.0, 0.7),
+    "rr": (16.0, 4.0),
+}
+FEATURES = tuple(VITAL_SCALES)
+
+# Distance added for a complaint with no tokens in common (vitals distance is ~1 per typical deviation)
+TOKEN_WEIGHT = 2.0
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "of", "with", "for", "in", "on", "to", "at", "by", "from",
+    "is", "was", "has", "had", "pt", "patient", "yo", "year", "old", "male", "female",
+})
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def complaint_tokens(text: Optional[str]) -> FrozenSet[str]:
+    """Lowercased complaint words without stopwords"""
+    return frozenset(t for t in _TOKEN.findall((text or "").lower()) if t not in STOPWORDS)
+
+
+def vitals_vector(vitals: Optional[Dict[str, Any]]) -> List[float]:
+    """Normalized vitals features in FEATURES order"""
+    values: Dict[str, Any] = {}
+    for name, value in (vitals or {}).items():
+        name = VITAL_ALIASES.get(str(name).lower(), str(name).lower())
+        if name == "bp" and isinstance(value, str) and "/" in value:
+            values["bp_sys"], _, values["bp_dia"] = value.partition("/")
+            continue
+        values[name] = value
+    vector = []
+    for name in FEATURES:
+        typical, scale = VITAL_SCALES[name]
+        try:
+            vector.append((float(values.get(name)) - typical) / scale)
+        except (TypeError, ValueError):
+            vector.append(0.0)
+    return vector
+
+
+@dataclass
+class SimilarCase:
+    """One neighbour returned by CaseSimilarityIndex.query"""
+    distance: float
+    patient_id: str
+    protocol: str
+    complaint: str
+    vitals: Dict[str, Any] = field(default_factory=dict)
+    outcome: Dict[str, Any] = field(default_factory=dict)
+
+
+class CaseSimilarityIndex:
+    """
+    k-nearest-neighbour index over past cases
+
+    Distance is the RMS of the normalized vitals differences plus
+    TOKEN_WEIGHT * (1 - Jaccard similarity of complaint tokens). Vitals live
+    in one feature-major float32 matrix (a row per vital, a column per case)
+    and token overlap is counted from an inverted index, so a query is a
+    handful of vectorized NumPy passes over contiguous arrays followed by an
+    O(N) top-k selection; brute force stays sub-millisecond at tens of
+    thousands of cases. Without NumPy the same distance is
+    computed in pure Python, which is fine for small stores.
+
+    At most ``capacity`` cases are kept: once full, each new case overwrites
+    the oldest one's column (a ring), dropping its postings first.
+    """
+
+    def __init__(self, capacity: int = 10000, initial_capacity: int = 1024):
+        self.capacity = max(1, capacity)
+        self.cases: List[Dict[str, Any]] = []
+        self._tokens: List[FrozenSet[str]] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._posting_arrays: Dict[str, Any] = {}  # token -> np.ndarray cache, dropped on change
+        self._next = 0  # slot the next case is written to once the ring is full
+        self.evicted = 0
+        if NUMPY_AVAILABLE:
+            initial_capacity = min(initial_capacity, self.capacity)
+            self._matrix = np.zeros((len(FEATURES), initial_capacity), dtype=np.float32)
+            self._sq_norms = np.zeros(initial_capacity, dtype=np.float32)
+            self._token_counts = np.zeros(initial_capacity, dtype=np.float32)
+        else:
+            self._rows: List[List[float]] = []
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    def add(
+        self,
+        patient_id: str,
+        protocol: str,
+        complaint: Optional[str],
+        vitals: Optional[Dict[str, Any]],
+        outcome: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Index one case; returns its row (reused once the index is full)"""
+        tokens = complaint_tokens(complaint)
+        vector = vitals_vector(vitals)
+        case = {
+            "patient_id": patient_id,
+            "protocol": protocol,
+            "complaint": complaint or "",
+            "vitals": vitals or {},
+            "outcome": outcome or {},
+        }
+
+        if len(self.cases) < self.capacity:
+            row = len(self.cases)
+            self.cases.append(case)
+            self._tokens.append(tokens)
+            if not NUMPY_AVAILABLE:
+                self._rows.append(vector)
+        else:
+            row = self._next
+            self._next = (row + 1) % self.capacity
+            for token in self._tokens[row]:
+                postings = self._postings[token]
+                postings.discard(row)
+                if not postings:
+                    del self._postings[token]
+                self._posting_arrays.pop(token, None)
+            self.cases[row] = case
+            self._tokens[row] = tokens
+            if not NUMPY_AVAILABLE:
+                self._rows[row] = vector
+            self.evicted += 1
+
+        if NUMPY_AVAILABLE:
+            if row == self._matrix.shape[1]:
+                grow = min(self._matrix.shape[1], self.capacity - row)
+                self._matrix = np.concatenate(
+                    [self._matrix, np.zeros((len(FEATURES), grow), dtype=np.float32)], axis=1
+                )
+                self._sq_norms = np.concatenate([self._sq_norms, np.zeros(grow, dtype=np.float32)])
+                self._token_counts = np.concatenate([self._token_counts, np.zeros(grow, dtype=np.float32)])
+            self._matrix[:, row] = vector
+            self._sq_norms[row] = sum(x * x for x in vector)
+            self._token_counts[row] = len(tokens)
+
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(row)
+            self._posting_arrays.pop(token, None)
+        return row
+
+    def query(
+        self,
+        complaint: Optional[str],
+        vitals: Optional[Dict[str, Any]],
+        k: int = 3,
+        max_distance: Optional[float] = None
+    ) -> List[SimilarCase]:
+        """
+        Nearest past cases to a complaint + vitals, closest first
+
+        Args:
+            complaint: Chief complaint text
+            vitals: Vitals dict (hr, bp or bp_sys/bp_dia, spo2, temp, rr)
+            k: Number of neighbours
+            max_distance: Drop neighbours farther than this
+        """
+        n = len(self.cases)
+        if n == 0 or k <= 0:
+            return []
+        tokens = complaint_tokens(complaint)
+        vector = vitals_vector(vitals)
+
+        if NUMPY_AVAILABLE:
+            distances = self._distances_numpy(tokens, vector, n)
+            k = min(k, n)
+            nearest = np.argpartition(distances, k - 1)[:k] if k < n else np.arange(n)
+            ranked = sorted((float(distances[i]), int(i)) for i in nearest)
+        else:
+            ranked = heapq.nsmallest(k, ((d, i) for i, d in enumerate(self._distances_python(tokens, vector))))
+
+        results = []
+        for distance, row in ranked:
+            if max_distance is not None and distance > max_distance:
+                break
+            results.append(SimilarCase(distance=distance, **self.cases[row]))
+        return results
+
+    def _distances_numpy(self, tokens: FrozenSet[str], vector: List[float], n: int):
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, with |x|^2 kept per row: one mat-vec per query
+        q = np.asarray(vector, dtype=np.float32)
+        squared = (-2.0 * q) @ self._matrix[:, :n]
+        squared += self._sq_norms[:n]
+        squared += float(q @ q)
+        np.maximum(squared, 0.0, out=squared)
+        distances = np.sqrt(squared * (1.0 / len(FEATURES)), out=squared)
+        distances += TOKEN_WEIGHT
+
+        postings = [self._posting_array(t) for t in tokens if t in self._postings]
+        if postings:
+            # Union is at least len(tokens) >= 1 here, so no division by zero
+            overlap = np.bincount(np.concatenate(postings), minlength=n).astype(np.float32)
+            union = self._token_counts[:n] + len(tokens)
+            union -= overlap
+            overlap /= union
+            overlap *= TOKEN_WEIGHT
+            distances -= overlap
+        return distances
+
+    def _posting_array(self, token: str):
+        cached = self._posting_arrays.get(token)
+        if cached is None:
+            cached = self._posting_arrays[token] = np.fromiter(self._postings[token], dtype=np.intp)
+        return cached
+
+    def _distances_python(self, tokens: FrozenSet[str], vector: List[float]) -> List[float]:
+        distances = []
+        for row, case_tokens in zip(self._rows, self._tokens):
+            vitals_distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(row, vector)) / len(FEATURES))
+            union = len(tokens | case_tokens)
+            jaccard = len(tokens & case_tokens) / union if union else 0.0
+            distances.append(vitals_distance + TOKEN_WEIGHT * (1.0 - jaccard))
+        return distances
+
+
+def format_similar_cases(cases: List[SimilarCase]) -> str:
+    """Similar past cases as a short context paragraph for the acuity prompt"""
+    if not cases:
+        return ""
+    lines = []
+    for case in cases:
+        vitals = ", ".join(f"{name} {value}" for name, value in case.vitals.items())
+        line = f"- {case.protocol.upper()}: \"{case.complaint[:60]}\""
+        if vitals:
+            line += f" ({vitals})"
+        acuity = case.outcome.get("acuity_level")
+        if acuity:
+            line += f", acuity {acuity}"
+        lines.append(line)
+    return "Similar past cases:\n" + "\n".join(lines)
@@ -0,0 +1,302 @@
+"""
+Write-ahead journal for the active case set
+Append-only, fsync-batched log of CaseStore mutations plus compact snapshots
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, TextIO, List
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FILE = "cases.snapshot.json"
+LOG_FILE = "cases.log"
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize the non-JSON values found in case records"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(getattr(value, "value", value))
+
+
+class CaseJournal:
+    """
+    Durable journal for a CaseStore.
+
+    Every ``add``/``update``/``remove`` on the attached store is appended to
+    ``cases.log`` as one JSON line and flushed to the OS immediately; fsync is
+    batched (every ``fsync_batch`` records, or by a timer at most
+    ``fsync_interval`` seconds after the first unsynced record), so a
+    mutation costs one small write instead of a disk sync.
+
+    After ``snapshot_every`` records the log is rotated to a
+    ``cases.log.<seq>`` segment and the full case set is written to
+    ``cases.snapshot.json`` (tmp file + atomic rename) on a worker thread,
+    from a per-record copy taken on the loop; segments the snapshot covers
+    are then deleted. This keeps both the log and recovery time bounded by
+    the number of open cases rather than by history. Recovery loads the
+    snapshot and replays the segments and log entries with a higher
+    sequence number.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_batch: int = 32,
+        fsync_interval: float = 1.0,
+        snapshot_every: int = 1000
+    ):
+        self.directory = directory
+        self.fsync_batch = max(fsync_batch, 1)
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = max(snapshot_every, 1)
+
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, LOG_FILE)
+
+        self.seq = 0
+        self._store = None
+        self._log: Optional[TextIO] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._since_snapshot = 0
+        self._sync_timer: Optional[asyncio.TimerHandle] = None
+        self._snapshot_task: Optional[asyncio.Future] = None
+        self._snapshot_lock = threading.Lock()  # Serializes snapshot file writes
+        self._snapshot_seq = 0  # seq of the snapshot on disk
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def attach(self, store) -> int:
+        """
+        Rebuild the store from disk, then journal its future mutations
+
+        Returns:
+            Number of cases recovered
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.monotonic()
+        replayed = self._recover(store)
+
+        self._store = store
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        store.attach_journal(self)
+
+        # Fold a long replayed tail (or segments left by a crash) into a fresh snapshot right away
+        if replayed >= self.snapshot_every or self._segments():
+            self.snapshot()
+
+        logger.info(
+            f"Recovered {len(store)} cases ({replayed} log entries) "
+            f"in {(time.monotonic() - started) * 1000:.1f}ms"
+        )
+        return len(store)
+
+    def close(self):
+        """Snapshot the current state and release the log file"""
+        if self._log is None:
+            return
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        self.snapshot()
+        self._log.close()
+        self._log = None
+        if self._store is not None:
+            self._store.attach_journal(None)
+            self._store = None
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, op: str, case_id: str, data: Optional[Dict[str, Any]] = None):
+        """Record one store mutation (called by CaseStore)"""
+        if self._log is None:
+            return
+        self.seq += 1
+        entry = {"seq": self.seq, "op": op, "id": case_id}
+        if data is not None:
+            entry["data"] = data
+        self._log.write(json.dumps(entry, default=_json_default) + "\n")
+        self._log.flush()
+
+        self._unsynced += 1
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every and self._snapshot_idle():
+            self._snapshot_in_background()
+        elif (self._unsynced >= self.fsync_batch
+              or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+        else:
+            self._schedule_sync()
+
+    def sync(self):
+        """fsync pending log records"""
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._log is None or not self._unsynced:
+            return
+        os.fsync(self._log.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _schedule_sync(self):
+        """Make sure unsynced records reach the disk within fsync_interval, even if no more arrive"""
+        if self._sync_timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (recovery, scripts): the next append or close syncs
+        delay = max(self.fsync_interval - (time.monotonic() - self._last_sync), 0)
+        self._sync_timer = loop.call_later(delay, self._timed_sync)
+
+    def _timed_sync(self):
+        self._sync_timer = None
+        try:
+            self.sync()
+        except OSError as e:
+            logger.error(f"Case journal fsync failed: {str(e)}")
+
+    def snapshot(self):
+        """Write the full case set atomically and truncate the log (synchronously)"""
+        if self._store is None:
+            return
+        self._write_snapshot(self.seq, dict(self._store.items()))
+
+        # Entries up to self.seq are now in the snapshot; if we crash before
+        # the truncate, recovery skips them by sequence number.
+        if self._log is not None:
+            self._log.truncate(0)
+            self._log.seek(0)
+            os.fsync(self._log.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._since_snapshot = 0
+
+    def _snapshot_idle(self) -> bool:
+        return self._snapshot_task is None or self._snapshot_task.done()
+
+    def _snapshot_in_background(self):
+        """Rotate the log, then write the snapshot on a worker thread"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.snapshot()
+            return
+        # Copied synchronously on the loop, where every writer runs (CaseStore.update
+        # and whole-record replacement via __setitem__, e.g. _record_triage), so no
+        # write can land mid-copy; the worker thread then only sees these copies
+        cases = {case_id: dict(record) for case_id, record in self._store.items()}
+        seq = self.seq
+
+        self._log.close()
+        os.replace(self.log_path, f"{self.log_path}.{seq}")
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._since_snapshot = 0
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+        self._snapshot_task = loop.run_in_executor(None, self._write_snapshot, seq, cases)
+        self._snapshot_task.add_done_callback(self._snapshot_done)
+
+    @staticmethod
+    def _snapshot_done(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            # The rotated segment stays on disk, so nothing is lost; the next snapshot retries
+            logger.error(f"Case snapshot failed: {str(task.exception())}")
+
+    def _write_snapshot(self, seq: int, cases: Dict[str, Dict[str, Any]]):
+        """Write a snapshot at seq and delete the log segments it covers"""
+        with self._snapshot_lock:
+            if seq < self._snapshot_seq:
+                return  # A newer snapshot already landed
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"seq": seq, "cases": cases}, f, default=_json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._snapshot_seq = seq
+            for path in self._segments():
+                if int(path.rsplit(".", 1)[1]) <= seq:
+                    os.remove(path)
+
+    def _segments(self) -> List[str]:
+        """Rotated log segments (cases.log.<seq>), oldest first"""
+        prefix = LOG_FILE + "."
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
+        ]
+        names.sort(key=lambda name: int(name[len(prefix):]))
+        return [os.path.join(self.directory, name) for name in names]
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def _recover(self, store) -> int:
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                snapshot_seq = snapshot.get("seq", 0)
+                for case_id, record in snapshot.get("cases", {}).items():
+                    store.add(case_id, record)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load case snapshot: {str(e)}")
+        self.seq = snapshot_seq
+        self._snapshot_seq = snapshot_seq
+
+        replayed = 0
+        for path in self._segments() + [self.log_path]:
+            if not os.path.exists(path):
+                continue
+            good_offset = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn final write from a crash; everything before it is intact
+                        logger.warning("Ignoring truncated case journal entry")
+                        break
+                    good_offset += len(line)
+                    if entry["seq"] <= self.seq:
+                        continue
+                    self._apply(store, entry)
+                    self.seq = entry["seq"]
+                    replayed += 1
+            # Drop the torn tail so new entries are not appended after it
+            if path == self.log_path and good_offset < os.path.getsize(path):
+                os.truncate(path, good_offset)
+        self._since_snapshot = replayed
+        return replayed
+
+    @staticmethod
+    def _apply(store, entry: Dict[str, Any]):
+        op, case_id = entry["op"], entry["id"]
+        if op == "add":
+            store.add(case_id, entry["data"])
+        elif op == "update":
+            if case_id in store:
+                store.update(case_id, **entry["data"])
+        elif op == "remove":
+            if case_id in store:
+                store.remove(case_id)
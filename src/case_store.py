@@ -0,0 +1,377 @@
+"""
+Indexed in-memory store for active ED cases
+Replaces the bare active_patients dict with secondary indexes and a sorted view
+"""
+
+import bisect
+from collections import Counter
+from collections.abc import MutableMapping
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple, Iterator, Callable
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Fields that feed the secondary indexes or the sort key
+_INDEX_SOURCE_FIELDS = ("status", "protocol", "acuity", "arrival_time")
+
+
+# Case record status (API or agent spelling) -> status shown by the API (CaseStatus values)
+CASE_STATUS_NAMES = {
+    name.lower(): name
+    for name in ("Arriving", "Triaged", "In Treatment", "Pending", "Admitted", "Discharged")
+}
+CASE_STATUS_NAMES.update({
+    "protocol_activated": "In Treatment",
+    "in_treatment": "In Treatment",
+})
+DEFAULT_CASE_STATUS = "Pending"
+
+
+def case_status(value: Any) -> str:
+    """API case status for a record status (str or enum); missing or unknown statuses are Pending"""
+    return CASE_STATUS_NAMES.get(_index_value(value), DEFAULT_CASE_STATUS)
+
+
+def case_priority(record: Dict[str, Any]) -> int:
+    """Dashboard priority for a case record (1=critical, 3=everything else)"""
+    return 1 if str(record.get("acuity")) == "1" else 3
+
+
+def to_utc_naive(value: Any) -> datetime:
+    """Coerce a datetime or ISO string to a naive UTC datetime"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if not isinstance(value, datetime):
+        return datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def arrival_epoch(value: Any) -> float:
+    """Seconds since the epoch for an arrival time (naive values are UTC)"""
+    return (to_utc_naive(value) - _EPOCH).total_seconds()
+
+
+def _display_value(value: Any) -> str:
+    """Plain string form of an enum/str field, as reported in statistics"""
+    return str(getattr(value, "value", value))
+
+
+def _index_value(value: Any) -> Optional[str]:
+    """Normalize enum/str values so 'Triaged', 'triaged' and CaseStatus.TRIAGED collide"""
+    if value is None:
+        return None
+    return str(getattr(value, "value", value)).lower()
+
+
+class CaseStore(MutableMapping):
+    """
+    Active case records indexed by status, protocol, priority and arrival time.
+
+    Behaves like the dict it replaces (``store[case_id] = record``, ``get``,
+    ``pop``, ``items``), but field changes must go through ``update`` so the
+    indexes stay consistent. Every index bucket is kept sorted by
+    (priority, arrival, case_id), so filtered, paginated queries cost
+    O(log N + k) instead of a scan of every case.
+
+    Summary statistics (protocol/status counts, critical count and a running
+    sum of arrival epochs) are maintained alongside the indexes, so
+    ``statistics()`` answers in O(1) regardless of how many cases are open.
+    """
+
+    INDEXED_FIELDS = ("status", "protocol", "priority")
+
+    def __init__(self):
+        self._cases: Dict[str, Dict[str, Any]] = {}
+        self._entries: Dict[str, Tuple[Tuple[int, float, str], Dict[str, Any]]] = {}
+        self._ordered: List[Tuple[int, float, str]] = []
+        self._by_arrival: List[Tuple[float, str]] = []
+        self._indexes: Dict[str, Dict[Any, List[Tuple[int, float, str]]]] = {
+            field: {} for field in self.INDEXED_FIELDS
+        }
+        
+        # Cached per-case projections, dropped whenever the case changes
+        self._projections: Dict[str, Any] = {}
+        
+        # Optional write-ahead journal (see case_journal.CaseJournal)
+        self._journal = None
+        
+        # Change listeners, called as listener(op, case_id) after each mutation
+        self._listeners: List[Callable[[str, str], None]] = []
+        
+        # Running aggregates
+        self._stats_keys: Dict[str, Tuple[str, str, bool]] = {}
+        self._protocol_counts: Counter = Counter()
+        self._status_counts: Counter = Counter()
+        self._critical_count = 0
+        self._arrival_sum = 0.0
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, case_id: str) -> Dict[str, Any]:
+        return self._cases[case_id]
+
+    def __setitem__(self, case_id: str, record: Dict[str, Any]):
+        self.add(case_id, record)
+
+    def __delitem__(self, case_id: str):
+        self.remove(case_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._cases)
+
+    def __len__(self) -> int:
+        return len(self._cases)
+
+    def __contains__(self, case_id: object) -> bool:
+        return case_id in self._cases
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(self, case_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or replace a case record"""
+        if case_id in self._cases:
+            self._unindex(case_id)
+        self._projections.pop(case_id, None)
+        record.setdefault("arrival_time", datetime.utcnow())
+        self._cases[case_id] = record
+        self._index(case_id, record)
+        if self._journal is not None:
+            self._journal.append("add", case_id, record)
+        self._notify("add", case_id)
+        return record
+
+    def update(self, case_id: str, **fields) -> Dict[str, Any]:
+        """Update fields of an existing case, re-indexing only when needed"""
+        record = self._cases[case_id]
+        self._projections.pop(case_id, None)
+        reindex = any(
+            field in fields and fields[field] != record.get(field)
+            for field in _INDEX_SOURCE_FIELDS
+        )
+        if reindex:
+            self._unindex(case_id)
+        record.update(fields)
+        if reindex:
+            self._index(case_id, record)
+        if self._journal is not None:
+            self._journal.append("update", case_id, fields)
+        self._notify("update", case_id)
+        return record
+
+    def remove(self, case_id: str) -> Dict[str, Any]:
+        """Remove a case and return its record"""
+        record = self._cases.pop(case_id)
+        self._projections.pop(case_id, None)
+        self._unindex(case_id)
+        if self._journal is not None:
+            self._journal.append("remove", case_id)
+        self._notify("remove", case_id)
+        return record
+
+    def clear(self):
+        for case_id in list(self._cases):
+            self.remove(case_id)
+
+    def attach_journal(self, journal):
+        """Record every subsequent mutation in a write-ahead journal (or None to detach)"""
+        self._journal = journal
+
+    def add_listener(self, listener: Callable[[str, str], None]):
+        """Call listener(op, case_id) after every add / update / remove"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, op: str, case_id: str):
+        for listener in self._listeners:
+            try:
+                listener(op, case_id)
+            except Exception as e:
+                logger.error(f"Case listener failed for {case_id}: {e}")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(
+        self,
+        status: Any = None,
+        protocol: Any = None,
+        priority: Optional[int] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Filtered cases ordered by (priority, arrival time)
+
+        Args:
+            status: Optional case status (str or enum, case-insensitive), matched
+                as the API shows it (see case_status), so "In Treatment" also
+                finds protocol_activated cases
+            protocol: Optional protocol / case type (str or enum, case-insensitive)
+            priority: Optional dashboard priority
+            offset: Number of matching cases to skip
+            limit: Maximum number of cases to return
+
+        Returns:
+            List of (case_id, record) tuples
+        """
+        filters = {
+            field: value for field, value in (
+                ("status", _index_value(case_status(status)) if status is not None else None),
+                ("protocol", _index_value(protocol)),
+                ("priority", priority),
+            ) if value is not None
+        }
+        end = offset + limit if limit is not None else None
+
+        if not filters:
+            keys = self._ordered[offset:end]
+        else:
+            # Walk the smallest bucket, checking the remaining filters
+            buckets = [
+                (self._indexes[field].get(value, []), field)
+                for field, value in filters.items()
+            ]
+            bucket, bucket_field = min(buckets, key=lambda b: len(b[0]))
+            if len(filters) == 1:
+                keys = bucket[offset:end]
+            else:
+                keys = []
+                skipped = 0
+                for key in bucket:
+                    fields = self._entries[key[2]][1]
+                    if any(fields[f] != v for f, v in filters.items() if f != bucket_field):
+                        continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    keys.append(key)
+                    if end is not None and len(keys) >= limit:
+                        break
+
+        return [(key[2], self._cases[key[2]]) for key in keys]
+
+    def count(self, field: str, value: Any) -> int:
+        """Number of cases with an indexed field equal to value"""
+        if field == "status":
+            value = case_status(value)
+        if field != "priority":
+            value = _index_value(value)
+        return len(self._indexes[field].get(value, []))
+
+    def projection(self, case_id: str, builder: Callable[[str, Dict[str, Any]], Any]) -> Any:
+        """
+        Cached projection of a case, built on first use
+
+        The cached value is invalidated by ``add``, ``update`` and ``remove``
+        for that case only, so unchanged cases are never rebuilt.
+
+        Args:
+            case_id: Case to project
+            builder: Called as builder(case_id, record) on a cache miss
+        """
+        view = self._projections.get(case_id)
+        if view is None:
+            view = builder(case_id, self._cases[case_id])
+            self._projections[case_id] = view
+        return view
+
+    def statistics(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Case statistics from the running aggregates
+
+        Returns:
+            Dict with total, critical count, protocol/status breakdowns and
+            the average minutes since arrival
+        """
+        total = len(self._cases)
+        avg_duration = 0.0
+        if total:
+            now_epoch = arrival_epoch(now or datetime.utcnow())
+            avg_duration = (now_epoch - self._arrival_sum / total) / 60
+        return {
+            "total_active_cases": total,
+            "critical_cases": self._critical_count,
+            "average_duration_minutes": avg_duration,
+            "protocol_breakdown": dict(+self._protocol_counts),
+            "status_breakdown": dict(+self._status_counts),
+        }
+
+    def arrived_between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Cases whose arrival time falls in [start, end], oldest first"""
+        lo = bisect.bisect_left(self._by_arrival, (arrival_epoch(start), "")) if start else 0
+        hi = bisect.bisect_right(self._by_arrival, (arrival_epoch(end), "\uffff")) if end else len(self._by_arrival)
+        return [(case_id, self._cases[case_id]) for _, case_id in self._by_arrival[lo:hi]]
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _index(self, case_id: str, record: Dict[str, Any]):
+        priority = case_priority(record)
+        arrival = arrival_epoch(record.get("arrival_time"))
+        key = (priority, arrival, case_id)
+        fields = {
+            "status": _index_value(case_status(record.get("status"))),
+            "protocol": _index_value(record.get("protocol", "general")),
+            "priority": priority,
+        }
+        self._entries[case_id] = (key, fields)
+        bisect.insort(self._ordered, key)
+        bisect.insort(self._by_arrival, (arrival, case_id))
+        for field, value in fields.items():
+            bisect.insort(self._indexes[field].setdefault(value, []), key)
+        
+        stats_key = (
+            _display_value(record.get("protocol", "general")),
+            _display_value(record.get("status", "unknown")),
+            priority == 1,
+        )
+        self._stats_keys[case_id] = stats_key
+        self._protocol_counts[stats_key[0]] += 1
+        self._status_counts[stats_key[1]] += 1
+        self._critical_count += stats_key[2]
+        self._arrival_sum += arrival
+
+    def _unindex(self, case_id: str):
+        key, fields = self._entries.pop(case_id)
+        _remove_sorted(self._ordered, key)
+        _remove_sorted(self._by_arrival, (key[1], case_id))
+        for field, value in fields.items():
+            bucket = self._indexes[field].get(value)
+            if bucket is not None:
+                _remove_sorted(bucket, key)
+                if not bucket:
+                    del self._indexes[field][value]
+        
+        protocol, status, critical = self._stats_keys.pop(case_id)
+        self._protocol_counts[protocol] -= 1
+        self._status_counts[status] -= 1
+        self._critical_count -= critical
+        self._arrival_sum -= key[1]
+        if not self._stats_keys:
+            self._arrival_sum = 0.0  # drop accumulated float drift
+
+
+def _remove_sorted(items: list, item: Any):
+    """Remove an item from a sorted list in O(log N) search time"""
+    i = bisect.bisect_left(items, item)
+    if i < len(items) and items[i] == item:
+        del items[i]
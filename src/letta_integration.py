@@ -3,19 +3,312 @@ Letta Integration Module
 Provides persistent memory and learning capabilities for EDFlow AI agents
 """
 
+import asyncio
+import os
+import time
+import uuid
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from functools import partial
+from typing import Dict, Any, List, Optional, Coroutine, Set, Callable, Awaitable, Deque
 import json
+from .case_index import CaseSimilarityIndex, format_similar_cases
+from .protocol_insights import ProtocolStats, format_protocol_stats
 from .utils import get_config, get_logger
 
 logger = get_logger(__name__)
 config = get_config()
 
 
+# ============================================================================
+# WRITE-BEHIND QUEUE
+# ============================================================================
+
+def _format_patient_case(record: Dict[str, Any]) -> str:
+    vitals = record.get("vitals") or {}
+    return f"""Patient ID: {record['patient_id']}
+Protocol: {record['protocol'].upper()}
+Visit Date: {record['recorded_at']}
+
+Vitals:
+- Heart Rate: {vitals.get('hr', 'N/A')} bpm
+- Blood Pressure: {vitals.get('bp_sys', 'N/A')}/{vitals.get('bp_dia', 'N/A')} mmHg
+- SpO2: {vitals.get('spo2', 'N/A')}%
+- Temperature: {vitals.get('temp', 'N/A')}°C
+
+Outcome:
+{json.dumps(record.get('outcome'), indent=2)}"""
+
+
+def _format_protocol_performance(record: Dict[str, Any]) -> str:
+    seconds = record["response_time_seconds"]
+    text = f"""Protocol: {record['protocol'].upper()}
+Response Time: {seconds:.1f} seconds ({seconds/60:.2f} minutes)
+Success: {'Yes' if record['success'] else 'No'}
+Timestamp: {record['recorded_at']}"""
+    if record.get("notes"):
+        text += f"\nNotes: {record['notes']}"
+    return text
+
+
+def format_memory_batch(records: List[Dict[str, Any]]) -> str:
+    """One memory-ingestion message for a batch of case / performance records"""
+    sections = []
+    for i, record in enumerate(records, 1):
+        kind = "patient case" if record["kind"] == "patient_case" else "protocol performance"
+        body = _format_patient_case(record) if record["kind"] == "patient_case" else _format_protocol_performance(record)
+        sections.append(f"--- Record {i}: {kind} (id {record.get('id', 'n/a')}) ---\n{body}")
+    return (
+        f"Please remember these {len(records)} records for future reference:\n\n"
+        + "\n\n".join(sections)
+        + "\n\nStore these cases and performance data in your memory for future reference "
+        "when patients return or when similar cases occur, and use them to improve future "
+        "protocol activations and identify patterns. Records may be re-sent after a "
+        "delivery timeout: if you already stored a record with the same id, ignore the copy."
+    )
+
+
+class MemoryWriteQueue:
+    """
+    Write-behind batching for Letta memory writes
+    
+    Records are queued in memory and flushed as one message when flush_size
+    records are waiting or every flush_interval seconds, whichever comes
+    first. A batch that cannot be delivered is appended to a local JSONL
+    spill file; spilled records are replayed ahead of new ones on the next
+    successful flush, so nothing is lost while Letta is unreachable or
+    across restarts. ``start()`` replays a spill left by a previous run.
+    
+    After a failed delivery the queue backs off exponentially (flush_interval
+    doubling up to max_backoff) and only appends new records to the spill
+    until the next attempt. Every record carries an ``id`` that is included
+    in the message and remembered once delivered, so a batch that timed out
+    but did reach Letta is recognisable when it is replayed. Spill file I/O
+    runs on a worker thread.
+    
+    Args:
+        send: ``async send(message)`` delivering one ingestion message
+        flush_size: Records per message
+        flush_interval: Seconds between background flushes
+        spill_path: JSONL file for undelivered records
+        max_backoff: Longest wait between delivery attempts while Letta fails
+    """
+    
+    DELIVERED_IDS = 10000  # Recently delivered record ids remembered for replay
+    
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Any]],
+        flush_size: int = 10,
+        flush_interval: float = 5.0,
+        spill_path: Optional[str] = None,
+        max_backoff: float = 300.0
+    ):
+        self.send = send
+        self.flush_size = max(flush_size, 1)
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.max_backoff = max(max_backoff, flush_interval)
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._delivered_ids: "OrderedDict[str, None]" = OrderedDict()
+        
+        self.sent_records = 0
+        self.sent_messages = 0
+        self.spilled_records = 0
+    
+    def put(self, record: Dict[str, Any]):
+        """Queue a record; never waits on Letta"""
+        record.setdefault("id", uuid.uuid4().hex)
+        self.pending.append(record)
+        self._ensure_running()
+        if len(self.pending) >= self.flush_size:
+            self._wakeup.set()
+    
+    def start(self):
+        """Start the background flusher now, replaying any spill from a previous run (call from the running loop)"""
+        self._ensure_running()
+        if self.spill_path:
+            self._wakeup.set()
+    
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+    
+    def _backing_off(self) -> bool:
+        return time.monotonic() < self._retry_at
+    
+    async def _run(self):
+        while True:
+            delay = max(self.flush_interval, self._retry_at - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if self._backing_off():
+                    # Letta is failing: keep new records durable, retry when the backoff expires
+                    await self._spill(self._drain(len(self.pending)))
+                else:
+                    await self.flush()
+            except Exception as e:
+                logger.error(f"Letta memory write queue error: {e}")
+    
+    async def flush(self) -> bool:
+        """
+        Deliver spilled records, then everything pending
+        
+        Returns:
+            True if nothing is left undelivered
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not await self._replay_spill():
+                await self._spill(self._drain(len(self.pending)))
+                return False
+            while self.pending:
+                batch = self._drain(self.flush_size)
+                if not await self._deliver(batch):
+                    await self._spill(batch + self._drain(len(self.pending)))
+                    return False
+            return True
+    
+    async def close(self):
+        """Stop the background flusher after a final flush (undelivered records are spilled)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pending or self._has_spill():
+            await self.flush()
+    
+    def _drain(self, count: int) -> List[Dict[str, Any]]:
+        return [self.pending.popleft() for _ in range(min(count, len(self.pending)))]
+    
+    async def _deliver(self, batch: List[Dict[str, Any]]) -> bool:
+        batch = [record for record in batch if record.get("id") not in self._delivered_ids]
+        if not batch:
+            return True
+        try:
+            await self.send(format_memory_batch(batch))
+        except Exception as e:
+            self._failures += 1
+            backoff = min(self.flush_interval * 2 ** self._failures, self.max_backoff)
+            self._retry_at = time.monotonic() + backoff
+            logger.warning(f"Letta memory write of {len(batch)} records failed: {e} (retrying in {backoff:.0f}s)")
+            return False
+        self._failures = 0
+        self._retry_at = 0.0
+        for record in batch:
+            if record.get("id"):
+                self._delivered_ids[record["id"]] = None
+        while len(self._delivered_ids) > self.DELIVERED_IDS:
+            self._delivered_ids.popitem(last=False)
+        self.sent_records += len(batch)
+        self.sent_messages += 1
+        logger.info(f"Stored {len(batch)} records in Letta memory")
+        return True
+    
+    # ------------------------------------------------------------------
+    # Disk spill
+    # ------------------------------------------------------------------
+    
+    def _has_spill(self) -> bool:
+        return bool(self.spill_path) and os.path.exists(self.spill_path) and os.path.getsize(self.spill_path) > 0
+    
+    async def _spill(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        if not self.spill_path:
+            logger.error(f"Dropping {len(records)} Letta memory records (no spill path configured)")
+            return
+        await asyncio.to_thread(self._append_spill, records)
+        self.spilled_records += len(records)
+        logger.warning(f"Spilled {len(records)} Letta memory records to {self.spill_path}")
+    
+    def _append_spill(self, records: List[Dict[str, Any]]):
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _read_spill(self) -> List[Dict[str, Any]]:
+        if not self._has_spill():
+            return []
+        records = []
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+        return records
+    
+    def _rewrite_spill(self, records: List[Dict[str, Any]]):
+        if not records:
+            os.remove(self.spill_path)
+            return
+        tmp_path = f"{self.spill_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spill_path)
+    
+    async def _replay_spill(self) -> bool:
+        """Send spilled records in order; keep whatever is still undelivered on disk"""
+        if not self.spill_path:
+            return True
+        records = await asyncio.to_thread(self._read_spill)
+        if not records:
+            return True
+        
+        delivered = 0
+        while delivered < len(records):
+            batch = records[delivered:delivered + self.flush_size]
+            if not await self._deliver(batch):
+                break
+            delivered += len(batch)
+        
+        if delivered:
+            # Untouched spill stays as is; only a partly replayed one is rewritten
+            await asyncio.to_thread(self._rewrite_spill, records[delivered:])
+            logger.info(f"Replayed {delivered} spilled Letta memory records")
+        return delivered == len(records)
+
+
+# ============================================================================
+# PATIENT MEMORY AGENT
+# ============================================================================
+
 class PatientMemoryAgent:
     """
     Letta-powered patient history and context manager
     Provides persistent memory across sessions for learning and context-aware decisions
+    
+    The Letta client is synchronous, so every call runs on a small dedicated
+    thread pool with a timeout instead of blocking the event loop shared by
+    all agents in the process. A timed-out call keeps its thread until Letta
+    answers, so background work (memory writes, insight refreshes) has its
+    own pool (Config.LETTA_BACKGROUND_WORKERS) and a hung Letta cannot starve
+    the patient recall pool (Config.LETTA_MAX_WORKERS).
     """
     
     def __init__(self):
@@ -23,6 +316,22 @@ class PatientMemoryAgent:
         self.enabled = config.LETTA_ENABLED
         self.client = None
         self.agent_id = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._background_executor: Optional[ThreadPoolExecutor] = None
+        self._background: Set[asyncio.Task] = set()
+        self.case_index = CaseSimilarityIndex(config.MEMORY_CASE_INDEX_CAPACITY)  # Local similar-case recall
+        
+        # Protocol insights: local statistics plus a Letta answer refreshed in the background
+        self.protocol_stats: Dict[str, ProtocolStats] = {}
+        self._insights: Dict[str, Dict[str, Any]] = {}  # protocol -> {"text", "refreshed_at", "new_records"}
+        self._refreshing_insights: Set[str] = set()
+        self.write_queue = MemoryWriteQueue(
+            partial(self._send, background=True),
+            flush_size=config.LETTA_WRITE_BATCH_SIZE,
+            flush_interval=config.LETTA_WRITE_FLUSH_INTERVAL_SECONDS,
+            spill_path=config.LETTA_SPILL_PATH,
+            max_backoff=config.LETTA_WRITE_MAX_BACKOFF_SECONDS
+        )
         
         # In-memory fallback if Letta is disabled or unavailable
         self.memory_store = {
@@ -109,18 +418,28 @@ Always provide concise, actionable information focused on improving patient outc
             logger.error(f"Failed to create/get Letta agent: {e}")
             raise
     
-    async def recall_patient_context(self, patient_id: str, current_complaint: str) -> str:
+    async def recall_patient_context(
+        self,
+        patient_id: str,
+        current_complaint: str,
+        vitals: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         Retrieve patient history and context from Letta's memory
         Returns a formatted string with relevant historical information
         """
         if not self.enabled or not self.client:
-            # Fallback to in-memory store
+            # Fallback to in-memory store plus the local similar-case index
             patient_data = self.memory_store["patients"].get(patient_id, {})
             if patient_data:
-                return f"Previous visit found: {patient_data.get('last_protocol', 'Unknown')} protocol " \
-                       f"on {patient_data.get('last_visit', 'Unknown date')}"
-            return "No previous history found (new patient)"
+                history = f"Previous visit found: {patient_data.get('last_protocol', 'Unknown')} protocol " \
+                          f"on {patient_data.get('last_visit', 'Unknown date')}"
+            else:
+                history = "No previous history found (new patient)"
+            similar = format_similar_cases(
+                self.case_index.query(current_complaint, vitals, k=config.MEMORY_SIMILAR_CASES)
+            )
+            return f"{history}\n{similar}" if similar else history
         
         try:
             message = f"""
@@ -135,11 +454,7 @@ Please provide:
 Be concise and focus on actionable information.
 """
             
-            response = self.client.send_message(
-                agent_id=self.agent_id,
-                message=message,
-                role="user"
-            )
+            response = await self._send(message)
             
             # Extract text from response
             context_text = response.messages[-1].text if response.messages else "No context available"
@@ -152,17 +467,38 @@ Be concise and focus on actionable information.
     
     async def get_protocol_insights(self, protocol: str) -> str:
         """
-        Get insights on protocol effectiveness from Letta's memory
+        Get insights on protocol effectiveness
         Returns historical performance data and recommendations
+        
+        Served from cache: the Letta answer is refreshed in the background when
+        older than PROTOCOL_INSIGHT_REFRESH_SECONDS or after
+        PROTOCOL_INSIGHT_REFRESH_RECORDS new performance records. Until the
+        first answer arrives (or without Letta) local statistics are returned.
         """
+        protocol = protocol.lower()
+        local = format_protocol_stats(protocol, self.protocol_stats.get(protocol))
         if not self.enabled or not self.client:
-            # Fallback to in-memory store
-            protocol_data = self.memory_store["protocols"].get(protocol, {})
-            if protocol_data:
-                avg_time = protocol_data.get('avg_response_time', 'Unknown')
-                return f"Historical average response time: {avg_time} minutes"
-            return "No historical protocol data available"
+            return local
         
+        entry = self._insights.get(protocol)
+        if entry is None or self._insight_stale(entry):
+            self._schedule_insight_refresh(protocol)
+        return entry["text"] if entry else local
+    
+    def _insight_stale(self, entry: Dict[str, Any]) -> bool:
+        return (
+            time.monotonic() - entry["refreshed_at"] >= config.PROTOCOL_INSIGHT_REFRESH_SECONDS
+            or entry["new_records"] >= config.PROTOCOL_INSIGHT_REFRESH_RECORDS
+        )
+    
+    def _schedule_insight_refresh(self, protocol: str):
+        if protocol in self._refreshing_insights:
+            return
+        self._refreshing_insights.add(protocol)
+        self.run_in_background(self._refresh_protocol_insights(protocol))
+    
+    async def _refresh_protocol_insights(self, protocol: str):
+        """Ask Letta for fresh insights and cache the answer"""
         try:
             message = f"""
 We're about to activate the {protocol.upper()} protocol.
@@ -176,30 +512,36 @@ Based on your memory of past {protocol.upper()} cases, please provide:
 Be brief and actionable.
 """
             
-            response = self.client.send_message(
-                agent_id=self.agent_id,
-                message=message,
-                role="user"
-            )
+            response = await self._send(message, background=True)
             
             insights = response.messages[-1].text if response.messages else "No insights available"
-            logger.info(f"Retrieved protocol insights for {protocol}")
-            return insights
+            self._insights[protocol] = {
+                "text": insights,
+                "refreshed_at": time.monotonic(),
+                "new_records": 0
+            }
+            logger.info(f"Refreshed protocol insights for {protocol}")
             
         except Exception as e:
+            # Keep serving the previous answer; the next read retries
             logger.error(f"Error retrieving protocol insights: {e}")
-            return "Insights unavailable"
+        finally:
+            self._refreshing_insights.discard(protocol)
     
     async def remember_patient_case(
         self,
         patient_id: str,
         protocol: str,
         vitals: Dict[str, Any],
-        outcome: Dict[str, Any]
+        outcome: Dict[str, Any],
+        chief_complaint: Optional[str] = None
     ):
         """
         Store patient case in Letta's persistent memory for future learning
+        (queued; returns without waiting for Letta)
         """
+        self.case_index.add(patient_id, protocol, chief_complaint, vitals, outcome)
+        
         if not self.enabled or not self.client:
             # Store in fallback memory
             self.memory_store["patients"][patient_id] = {
@@ -211,36 +553,15 @@ Be brief and actionable.
             logger.info(f"Stored case in fallback memory: {patient_id}")
             return
         
-        try:
-            message = f"""
-Please remember this patient case for future reference:
-
-Patient ID: {patient_id}
-Protocol: {protocol.upper()}
-Visit Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
-
-Vitals:
-- Heart Rate: {vitals.get('hr', 'N/A')} bpm
-- Blood Pressure: {vitals.get('bp_sys', 'N/A')}/{vitals.get('bp_dia', 'N/A')} mmHg
-- SpO2: {vitals.get('spo2', 'N/A')}%
-- Temperature: {vitals.get('temp', 'N/A')}°C
-
-Outcome:
-{json.dumps(outcome, indent=2)}
-
-Store this case in your memory for future reference when this patient returns or when similar cases occur.
-"""
-            
-            self.client.send_message(
-                agent_id=self.agent_id,
-                message=message,
-                role="user"
-            )
-            
-            logger.info(f"Stored patient case in Letta memory: {patient_id}")
-            
-        except Exception as e:
-            logger.error(f"Error storing patient case: {e}")
+        # Write-behind: batched into one Letta message by the write queue
+        self.write_queue.put({
+            "kind": "patient_case",
+            "patient_id": patient_id,
+            "protocol": protocol,
+            "vitals": vitals,
+            "outcome": outcome,
+            "recorded_at": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        })
     
     async def get_resource_recommendations(self, resource_type: str, patient_priority: int) -> str:
         """
@@ -261,11 +582,7 @@ Based on your memory:
 Keep it brief and actionable.
 """
             
-            response = self.client.send_message(
-                agent_id=self.agent_id,
-                message=message,
-                role="user"
-            )
+            response = await self._send(message)
             
             recommendations = response.messages[-1].text if response.messages else "No recommendations"
             return recommendations
@@ -283,7 +600,15 @@ Keep it brief and actionable.
     ):
         """
         Store protocol performance metrics for learning
+        (queued; returns without waiting for Letta)
         """
+        key = protocol.lower()
+        if key not in self.protocol_stats:
+            self.protocol_stats[key] = ProtocolStats(
+                half_life_seconds=config.PROTOCOL_STATS_HALF_LIFE_HOURS * 3600
+            )
+        self.protocol_stats[key].add(response_time_seconds, success)
+        
         if not self.enabled or not self.client:
             # Update fallback memory
             if protocol not in self.memory_store["protocols"]:
@@ -302,33 +627,76 @@ Keep it brief and actionable.
             
             return
         
-        try:
-            message = f"""
-Protocol performance data to remember:
-
-Protocol: {protocol.upper()}
-Response Time: {response_time_seconds:.1f} seconds ({response_time_seconds/60:.2f} minutes)
-Success: {'Yes' if success else 'No'}
-Timestamp: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
-{f'Notes: {notes}' if notes else ''}
-
-Use this to improve future protocol activations and identify patterns.
-"""
-            
-            self.client.send_message(
-                agent_id=self.agent_id,
-                message=message,
-                role="user"
-            )
-            
-            logger.info(f"Stored protocol performance: {protocol}")
-            
-        except Exception as e:
-            logger.error(f"Error storing protocol performance: {e}")
+        self.write_queue.put({
+            "kind": "protocol_performance",
+            "protocol": protocol,
+            "response_time_seconds": response_time_seconds,
+            "success": success,
+            "notes": notes,
+            "recorded_at": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        
+        entry = self._insights.get(key)
+        if entry is not None:
+            entry["new_records"] += 1
+            if entry["new_records"] >= config.PROTOCOL_INSIGHT_REFRESH_RECORDS:
+                self._schedule_insight_refresh(key)
     
     def is_available(self) -> bool:
         """Check if Letta is available and working"""
         return self.enabled and self.client is not None
+    
+    def start(self):
+        """Begin background memory writes, replaying records spilled by a previous run (call from the running loop)"""
+        if self.is_available():
+            self.write_queue.start()
+    
+    async def _send(self, message: str, background: bool = False):
+        """Run a blocking client.send_message on the Letta thread pool (the background pool for writes / refreshes)"""
+        if background:
+            if self._background_executor is None:
+                self._background_executor = ThreadPoolExecutor(
+                    max_workers=max(config.LETTA_BACKGROUND_WORKERS, 1),
+                    thread_name_prefix="letta-bg"
+                )
+            executor = self._background_executor
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(config.LETTA_MAX_WORKERS, 1),
+                    thread_name_prefix="letta"
+                )
+            executor = self._executor
+        call = partial(self.client.send_message, agent_id=self.agent_id, message=message, role="user")
+        # On timeout the worker thread still finishes the call; only the caller stops waiting
+        return await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(executor, call),
+            config.LETTA_TIMEOUT_SECONDS
+        )
+    
+    def run_in_background(self, coro: Coroutine) -> asyncio.Task:
+        """Schedule a memory write without waiting for it (e.g. remember_patient_case)"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+    
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background memory write failed: {task.exception()}")
+    
+    async def close(self, timeout: float = 5.0):
+        """Wait briefly for pending background writes, flush the write queue, then stop the thread pools"""
+        if self._background:
+            await asyncio.wait(set(self._background), timeout=timeout)
+        if self.is_available():
+            await self.write_queue.close()
+        for executor in (self._executor, self._background_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._background_executor = None
 
 
 # Global instance
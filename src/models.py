@@ -154,6 +154,19 @@ class ProtocolActivation(Model):
     metadata: Optional[Dict[str, Any]] = None
 
 
+class ProtocolAmendment(Model):
+    amendment_id: str
+    activation_id: str
+    patient_id: str
+    action: str  # "amend" | "cancel"
+    original_protocol: str
+    amended_protocol: Optional[str] = None
+    reason: str
+    amended_by: str
+    amendment_time: datetime
+    metadata: Optional[Dict[str, Any]] = None
+
+
 class LabOrder(Model):
     order_id: str
     patient_id: str
@@ -215,6 +228,7 @@ class BedAssignment(Model):
     bed_location: Optional[str] = None
     assigned: bool
     assignment_time: Optional[datetime] = None
+    queued: bool = False  # Not assigned yet but waiting; a final assigned=True/False follows
 
 
 class StatusUpdate(Model):
@@ -0,0 +1,88 @@
+"""
+Locally computed protocol performance statistics
+Time-decayed mean, percentiles and success rate per protocol, readable in constant time
+"""
+
+import bisect
+import math
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Deque, List
+
+
+class ProtocolStats:
+    """
+    Running response-time statistics for one protocol
+
+    The mean and success rate are exponentially time-decayed (a record's
+    weight halves every ``half_life_seconds``), so they track recent
+    performance. p50/p90 come from a sorted window of the most recent
+    ``window`` response times, kept sorted on insert so reads are O(1).
+    """
+
+    def __init__(self, half_life_seconds: float = 7 * 24 * 3600, window: int = 500):
+        self.decay_rate = math.log(2) / half_life_seconds if half_life_seconds > 0 else 0.0
+        self.count = 0
+        self._weight = 0.0
+        self._weighted_time = 0.0
+        self._weighted_successes = 0.0
+        self._updated_at: Optional[float] = None
+        self._recent: Deque[float] = deque(maxlen=max(window, 1))
+        self._sorted: List[float] = []
+
+    def add(self, response_time_seconds: float, success: bool, now: Optional[float] = None):
+        """Record one protocol activation"""
+        now = time.time() if now is None else now
+        if self._updated_at is not None:
+            factor = math.exp(-self.decay_rate * max(now - self._updated_at, 0.0))
+            self._weight *= factor
+            self._weighted_time *= factor
+            self._weighted_successes *= factor
+        self._updated_at = now
+        self._weight += 1.0
+        self._weighted_time += response_time_seconds
+        self._weighted_successes += 1.0 if success else 0.0
+        self.count += 1
+
+        if len(self._recent) == self._recent.maxlen:
+            oldest = self._recent[0]
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+        self._recent.append(response_time_seconds)
+        bisect.insort(self._sorted, response_time_seconds)
+
+    @property
+    def decayed_mean(self) -> Optional[float]:
+        # Decaying to "now" scales numerator and denominator alike, so the ratio is current
+        return self._weighted_time / self._weight if self._weight else None
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        return self._weighted_successes / self._weight if self._weight else None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile (0-100) over the recent window"""
+        if not self._sorted:
+            return None
+        rank = max(math.ceil(p / 100.0 * len(self._sorted)) - 1, 0)
+        return self._sorted[min(rank, len(self._sorted) - 1)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "cases": self.count,
+            "decayed_mean_seconds": self.decayed_mean,
+            "p50_seconds": self.percentile(50),
+            "p90_seconds": self.percentile(90),
+            "success_rate": self.success_rate,
+        }
+
+
+def format_protocol_stats(protocol: str, stats: Optional[ProtocolStats]) -> str:
+    """Insight text from local statistics"""
+    if stats is None or stats.count == 0:
+        return "No historical protocol data available"
+    return (
+        f"{protocol.upper()} history ({stats.count} cases): "
+        f"recent mean response {stats.decayed_mean / 60:.1f} min, "
+        f"p50 {stats.percentile(50) / 60:.1f} min, p90 {stats.percentile(90) / 60:.1f} min, "
+        f"success rate {stats.success_rate:.0%}"
+    )
@@ -0,0 +1,209 @@
+"""
+Rule-based triage engine
+One compiled word-boundary matcher for protocol keywords plus vectorized vitals thresholds
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Sequence, FrozenSet
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+
+# Protocols in precedence order (first match wins when several are mentioned)
+# (the chat arrival parser's and the rule-based fallback's keyword lists, merged)
+PROTOCOL_TERMS: Dict[str, Tuple[str, ...]] = {
+    "stemi": ("stemi", "chest pain", "mi", "heart attack", "myocardial"),
+    "stroke": ("stroke", "cva", "cerebrovascular", "weakness"),
+    "trauma": ("trauma", "accident", "injury", "mva"),
+    "pediatric": ("pediatric", "child", "kid", "infant"),
+}
+
+# Non-protocol vocabulary matched in the same pass
+SIGNAL_TERMS: Dict[str, Tuple[str, ...]] = {
+    "arrival": ("arriving", "patient", "coming", "admission", "case", "emergency"),
+}
+
+PROTOCOL_ACUITY = {"stemi": "1", "stroke": "1", "trauma": "1", "pediatric": "2", "general": "3"}
+
+# (vital, low, high): outside [low, high] is critical / abnormal
+CRITICAL_VITALS = (("hr", 40, 130), ("bp_sys", 90, 220), ("spo2", 90, 101), ("rr", 8, 30), ("temp", 35.0, 40.0))
+ABNORMAL_VITALS = (("hr", 50, 110), ("bp_sys", 100, 180), ("spo2", 94, 101), ("rr", 10, 24), ("temp", 36.0, 38.5))
+VITAL_NAMES = ("hr", "bp_sys", "spo2", "rr", "temp")
+VITAL_ALIASES = {
+    "heart_rate": "hr",
+    "pulse": "hr",
+    "systolic": "bp_sys",
+    "diastolic": "bp_dia",
+    "o2_sat": "spo2",
+    "oxygen_saturation": "spo2",
+    "temperature": "temp",
+    "respiratory_rate": "rr",
+    "resp_rate": "rr",
+}
+
+
+@dataclass(frozen=True)
+class TriageResult:
+    """Outcome of one rule-based triage"""
+    protocol: str
+    acuity: str
+    matched_terms: Tuple[str, ...] = ()
+    categories: FrozenSet[str] = field(default_factory=frozenset)
+    vitals_flag: Optional[str] = None  # "critical" | "abnormal" | None
+
+    def to_analysis(self) -> Dict[str, Any]:
+        """Same shape as a ClaudeEngine acuity analysis"""
+        risk_factors = list(self.matched_terms)
+        if self.vitals_flag:
+            risk_factors.append(f"{self.vitals_flag} vitals")
+        return {
+            "acuity_level": self.acuity,
+            "protocol": self.protocol,
+            "risk_factors": risk_factors,
+            "confidence": 0.7,
+            "immediate_actions": ["assess", "monitor"]
+        }
+
+
+def _vital_row(vitals: Optional[Dict[str, Any]]) -> List[float]:
+    """Vitals as floats in VITAL_NAMES order (NaN when missing or unparseable)"""
+    values: Dict[str, Any] = {}
+    for name, value in (vitals or {}).items():
+        name = VITAL_ALIASES.get(str(name).lower(), str(name).lower())
+        if name == "bp" and isinstance(value, str) and "/" in value:
+            values.setdefault("bp_sys", value.partition("/")[0])
+            continue
+        values[name] = value
+    row = []
+    for name in VITAL_NAMES:
+        try:
+            row.append(float(values.get(name)))
+        except (TypeError, ValueError):
+            row.append(math.nan)
+    return row
+
+
+def _vitals_flag(row: List[float]) -> Optional[str]:
+    """"critical", "abnormal" or None for one vitals row (NaN never flags)"""
+    values = dict(zip(VITAL_NAMES, row))
+    for flag, bounds in (("critical", CRITICAL_VITALS), ("abnormal", ABNORMAL_VITALS)):
+        if any(values[name] < low or values[name] > high for name, low, high in bounds):
+            return flag
+    return None
+
+
+class TriageEngine:
+    """
+    Single-pass protocol and acuity matcher
+
+    All terms are compiled into one case-insensitive regex with word
+    boundaries (longest alternatives first, optional plural "s"), so "mi"
+    no longer matches "admission" and the text is scanned once instead of
+    once per keyword list. ``classify_batch`` scores many reports at once, evaluating vitals
+    thresholds with NumPy when it is installed.
+    """
+
+    def __init__(
+        self,
+        protocol_terms: Dict[str, Sequence[str]] = PROTOCOL_TERMS,
+        signal_terms: Dict[str, Sequence[str]] = SIGNAL_TERMS
+    ):
+        self.protocol_order = list(protocol_terms)
+        self._category_of: Dict[str, str] = {}
+        for category, terms in list(protocol_terms.items()) + list(signal_terms.items()):
+            for term in terms:
+                self._category_of.setdefault(term.lower(), category)
+
+        alternatives = sorted(self._category_of, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in alternatives) + r")s?\b",
+            re.IGNORECASE
+        )
+
+    def match(self, text: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+        """Matched terms (in order, de-duplicated) and the categories they belong to"""
+        terms: Dict[str, None] = {}
+        for found in self._pattern.findall(text or ""):
+            term = " ".join(found.lower().split())
+            if term not in self._category_of:
+                term = term[:-1]
+            terms[term] = None
+        matched = tuple(terms)
+        return matched, frozenset(self._category_of[term] for term in matched)
+
+    def classify(self, text: str, vitals: Optional[Dict[str, Any]] = None) -> TriageResult:
+        """Protocol, acuity and matched terms for one report"""
+        matched, categories = self.match(text)
+        return self._result(matched, categories, _vitals_flag(_vital_row(vitals)) if vitals else None)
+
+    def classify_batch(
+        self,
+        texts: Sequence[str],
+        vitals: Optional[Sequence[Optional[Dict[str, Any]]]] = None
+    ) -> List[TriageResult]:
+        """
+        Triage many reports at once (e.g. replaying historical logs)
+
+        Args:
+            texts: Report / complaint texts
+            vitals: Optional vitals dicts aligned with texts
+
+        Returns:
+            One TriageResult per text
+        """
+        flags = self._vitals_flags(vitals, len(texts)) if vitals is not None else [None] * len(texts)
+        return [self._result(*self.match(text), flag) for text, flag in zip(texts, flags)]
+
+    def _vitals_flags(self, vitals: Sequence[Optional[Dict[str, Any]]], count: int) -> List[Optional[str]]:
+        rows = [_vital_row(v) for v in vitals]
+        if not NUMPY_AVAILABLE:
+            return [_vitals_flag(row) for row in rows]
+
+        # (rows, vitals) matrix; NaN comparisons are False, so missing values never flag
+        matrix = np.array(rows, dtype=float).reshape(count, len(VITAL_NAMES))
+        column = {name: i for i, name in enumerate(VITAL_NAMES)}
+
+        def outside(bounds: Iterable[Tuple[str, float, float]]):
+            mask = np.zeros(count, dtype=bool)
+            for name, low, high in bounds:
+                values = matrix[:, column[name]]
+                mask |= (values < low) | (values > high)
+            return mask
+
+        critical = outside(CRITICAL_VITALS)
+        abnormal = outside(ABNORMAL_VITALS)
+        return [
+            "critical" if c else "abnormal" if a else None
+            for c, a in zip(critical.tolist(), abnormal.tolist())
+        ]
+
+    def _result(self, matched: Tuple[str, ...], categories: FrozenSet[str], flag: Optional[str]) -> TriageResult:
+        protocol = next((p for p in self.protocol_order if p in categories), "general")
+        acuity = PROTOCOL_ACUITY.get(protocol, "3")
+        if flag == "critical":
+            acuity = "1"
+        elif flag == "abnormal" and acuity == "3":
+            acuity = "2"
+        return TriageResult(protocol, acuity, matched, categories, flag)
+
+
+_triage_engine: Optional[TriageEngine] = None
+
+
+def get_triage_engine() -> TriageEngine:
+    """Get global triage engine instance"""
+    global _triage_engine
+    if _triage_engine is None:
+        _triage_engine = TriageEngine()
+    return _triage_engine
@@ -25,6 +25,19 @@ class Config:
     
     # Letta Configuration
     LETTA_ENABLED: bool = os.getenv("LETTA_ENABLED", "true").lower() == "true"
+    LETTA_MAX_WORKERS: int = int(os.getenv("LETTA_MAX_WORKERS", "4"))
+    LETTA_BACKGROUND_WORKERS: int = int(os.getenv("LETTA_BACKGROUND_WORKERS", "2"))
+    LETTA_TIMEOUT_SECONDS: float = float(os.getenv("LETTA_TIMEOUT_SECONDS", "30"))
+    LETTA_WRITE_BATCH_SIZE: int = int(os.getenv("LETTA_WRITE_BATCH_SIZE", "10"))
+    LETTA_WRITE_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("LETTA_WRITE_FLUSH_INTERVAL_SECONDS", "5"))
+    LETTA_SPILL_PATH: str = os.getenv("LETTA_SPILL_PATH", "data/letta_spill.jsonl")
+    LETTA_WRITE_MAX_BACKOFF_SECONDS: float = float(os.getenv("LETTA_WRITE_MAX_BACKOFF_SECONDS", "300"))
+    MEMORY_SIMILAR_CASES: int = int(os.getenv("MEMORY_SIMILAR_CASES", "3"))
+    # Past cases kept in the local similar-case index; the oldest is overwritten once full
+    MEMORY_CASE_INDEX_CAPACITY: int = int(os.getenv("MEMORY_CASE_INDEX_CAPACITY", "10000"))
+    PROTOCOL_INSIGHT_REFRESH_SECONDS: float = float(os.getenv("PROTOCOL_INSIGHT_REFRESH_SECONDS", "600"))
+    PROTOCOL_INSIGHT_REFRESH_RECORDS: int = int(os.getenv("PROTOCOL_INSIGHT_REFRESH_RECORDS", "20"))
+    PROTOCOL_STATS_HALF_LIFE_HOURS: float = float(os.getenv("PROTOCOL_STATS_HALF_LIFE_HOURS", "168"))
     
     # Agent Seeds
     ED_COORDINATOR_SEED: str = os.getenv("ED_COORDINATOR_SEED", "ed_coordinator_seed")
@@ -48,9 +61,56 @@ class Config:
     
     # Performance
     AI_RESPONSE_TIMEOUT_SECONDS: int = int(os.getenv("AI_RESPONSE_TIMEOUT_SECONDS", "2"))
-    AGENT_COMM_TIMEOUT_SECONDS: int = int(os.getenv("AGENT_COMM_TIMEOUT_SECONDS", "1"))
+    AGENT_COMM_TIMEOUT_SECONDS: float = float(os.getenv("AGENT_COMM_TIMEOUT_SECONDS", "1"))
     MAX_CONCURRENT_PATIENTS: int = int(os.getenv("MAX_CONCURRENT_PATIENTS", "50"))
     
+    # AI triage response cache
+    AI_CACHE_ENABLED: bool = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    AI_CACHE_TTL_SECONDS: float = float(os.getenv("AI_CACHE_TTL_SECONDS", "300"))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+    
+    # AI upstream protection
+    AI_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("AI_MAX_CONCURRENT_REQUESTS", "4"))
+    # Bounded wait for a free request slot; queue timeouts fall back without tripping the breaker
+    AI_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", "1"))
+    AI_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "3"))
+    AI_BREAKER_RESET_SECONDS: float = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+    
+    # Speculative triage: activate on the rule engine, let the AI confirm or amend
+    SPECULATIVE_TRIAGE_ENABLED: bool = os.getenv("SPECULATIVE_TRIAGE_ENABLED", "true").lower() == "true"
+    
+    # Bed inventory used to seed the Bed Management agent's allocator
+    HOSPITAL_DATA_PATH: str = os.getenv("HOSPITAL_DATA_PATH", "hospital_data.json")
+    # Waiting bed requests are dropped (assigned=False) after this long; 0 = wait indefinitely
+    BED_REQUEST_TIMEOUT_SECONDS: float = float(os.getenv("BED_REQUEST_TIMEOUT_SECONDS", "900"))
+    
+    # Case Journal (write-ahead log + snapshots for active cases)
+    CASE_JOURNAL_ENABLED: bool = os.getenv("CASE_JOURNAL_ENABLED", "true").lower() == "true"
+    CASE_JOURNAL_DIR: str = os.getenv("CASE_JOURNAL_DIR", "data/case_journal")
+    CASE_JOURNAL_FSYNC_BATCH: int = int(os.getenv("CASE_JOURNAL_FSYNC_BATCH", "32"))
+    CASE_JOURNAL_FSYNC_INTERVAL_SECONDS: float = float(os.getenv("CASE_JOURNAL_FSYNC_INTERVAL_SECONDS", "1.0"))
+    CASE_JOURNAL_SNAPSHOT_EVERY: int = int(os.getenv("CASE_JOURNAL_SNAPSHOT_EVERY", "1000"))
+    
+    # Event tracker: bounded in-memory ring, optional rotating spill of evicted events (empty dir = off)
+    EVENT_BUFFER_CAPACITY: int = int(os.getenv("EVENT_BUFFER_CAPACITY", "10000"))
+    EVENT_SPILL_DIR: str = os.getenv("EVENT_SPILL_DIR", "")
+    EVENT_SPILL_SEGMENT_BYTES: int = int(os.getenv("EVENT_SPILL_SEGMENT_BYTES", str(10 * 1024 * 1024)))
+    EVENT_SPILL_SEGMENTS: int = int(os.getenv("EVENT_SPILL_SEGMENTS", "5"))
+    # Sliding window for the latency percentiles (p50/p90/p99/max)
+    LATENCY_WINDOW_SECONDS: float = float(os.getenv("LATENCY_WINDOW_SECONDS", "900"))
+    # Per-subscriber event queue (UI, WebSocket bridge); overflow drops per subscriber policy
+    EVENT_SUBSCRIBER_QUEUE_SIZE: int = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "1000"))
+    
+    # WebSocket bridge: agent events are sent as one frame per room every N ms or K events
+    WS_EVENT_FLUSH_MS: float = float(os.getenv("WS_EVENT_FLUSH_MS", "100"))
+    WS_EVENT_BATCH_SIZE: int = int(os.getenv("WS_EVENT_BATCH_SIZE", "50"))
+    # Outbound broadcasts are merged per target and flushed every N ms (0 = next loop iteration)
+    WS_OUTBOUND_FLUSH_MS: float = float(os.getenv("WS_OUTBOUND_FLUSH_MS", "25"))
+    # Case changes kept for clients resuming the case stream from a seq number
+    CASE_STREAM_HISTORY: int = int(os.getenv("CASE_STREAM_HISTORY", "1000"))
+    # Chat messages kept by the API (oldest evicted first)
+    MESSAGE_HISTORY_CAPACITY: int = int(os.getenv("MESSAGE_HISTORY_CAPACITY", "1000"))
+    
     @classmethod
     def is_local_mode(cls) -> bool:
         return cls.DEPLOYMENT_MODE.lower() == "local"
@@ -3,6 +3,7 @@ Enhanced visualization system for EDFlow AI agent communication
 """
 
 from .event_tracker import EventTracker, AgentEvent
+from .latency import LatencyHistogram
 from .terminal_logger import TerminalLogger
 
-__all__ = ["EventTracker", "AgentEvent", "TerminalLogger"]
\ No newline at end of file
+__all__ = ["EventTracker", "AgentEvent", "LatencyHistogram", "TerminalLogger"]
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Publish/subscribe bus for agent events
+Producers enqueue in O(1); a consumer task fans events out to subscribers through per-subscriber bounded queues
+"""
+
+import asyncio
+import threading
+from collections import deque, OrderedDict
+from typing import Any, Callable, Deque, Hashable, List, Optional
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+
+# Overflow policies for a subscriber queue
+DROP_OLDEST = "drop_oldest"    # keep the newest ``maxsize`` events (default)
+DROP_NEWEST = "drop_newest"    # keep what is queued, reject new events while full
+COALESCE = "coalesce"          # keep only the latest event per ``key(event)``
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+
+class Subscription:
+    """
+    One subscriber: a callback (sync or async) fed from its own bounded queue
+
+    Each subscription is drained by its own task, so a slow callback only
+    backs up (and eventually drops from) its own queue.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Any], Any],
+        maxsize: int = 1000,
+        policy: str = DROP_OLDEST,
+        key: Optional[Callable[[Any], Hashable]] = None,
+        name: Optional[str] = None
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        if policy == COALESCE and key is None:
+            raise ValueError("COALESCE policy requires a key function")
+        self.callback = callback
+        self.maxsize = max(maxsize, 1)
+        self.policy = policy
+        self.key = key
+        self.name = name or getattr(callback, "__qualname__", repr(callback))
+        self.is_async = asyncio.iscoroutinefunction(callback)
+        self.dropped = 0
+        self.delivered = 0
+        self._queue: Deque[Any] = deque()
+        self._latest: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._latest) if self.policy == COALESCE else len(self._queue)
+
+    def offer(self, event: Any):
+        """Queue an event according to the overflow policy (called on the bus loop)"""
+        if self.policy == COALESCE:
+            key = self.key(event)
+            if key in self._latest:
+                self._latest.move_to_end(key)
+                self.dropped += 1
+            elif len(self._latest) >= self.maxsize:
+                self._latest.popitem(last=False)
+                self.dropped += 1
+            self._latest[key] = event
+        elif len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return
+            self._queue.popleft()
+            self._queue.append(event)
+        else:
+            self._queue.append(event)
+        if self._ready is not None:
+            self._ready.set()
+
+    def _take(self) -> List[Any]:
+        if self.policy == COALESCE:
+            events = list(self._latest.values())
+            self._latest.clear()
+        else:
+            events = list(self._queue)
+            self._queue.clear()
+        return events
+
+    async def _run(self):
+        self._ready = asyncio.Event()
+        if len(self):
+            self._ready.set()
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            for event in self._take():
+                try:
+                    if self.is_async:
+                        await self.callback(event)
+                    else:
+                        self.callback(event)
+                    self.delivered += 1
+                except Exception as e:
+                    logger.error(f"Event subscriber {self.name} failed: {e}")
+
+
+class EventBus:
+    """
+    Non-blocking event fan-out
+
+    ``publish`` only appends to an ingress deque and wakes the dispatcher,
+    so it is O(1) and safe from any thread. The dispatcher task (started on
+    the first publish or subscribe inside a running event loop) moves events
+    into each subscription's queue; subscriber tasks deliver them. Events
+    published before a loop is running are buffered (up to ``ingress_size``)
+    and delivered once it starts.
+    """
+
+    def __init__(self, ingress_size: int = 10000):
+        self._ingress: Deque[Any] = deque(maxlen=ingress_size)
+        self._subscriptions: List[Subscription] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriptions(self) -> List[Subscription]:
+        return list(self._subscriptions)
+
+    def subscribe(
+        self,
+        callback: Callable[[Any], Any],
+        maxsize: int = 1000,
+        policy: str = DROP_OLDEST,
+        key: Optional[Callable[[Any], Hashable]] = None,
+        name: Optional[str] = None
+    ) -> Subscription:
+        """Register a subscriber; returns its Subscription (pass to unsubscribe)"""
+        subscription = Subscription(callback, maxsize=maxsize, policy=policy, key=key, name=name)
+        self._subscriptions.append(subscription)
+        if self._ensure_started():
+            if self._loop_thread == threading.get_ident():
+                self._start_subscription(subscription)
+            else:
+                self._loop.call_soon_threadsafe(self._start_subscription, subscription)
+        return subscription
+
+    def _start_subscription(self, subscription: Subscription):
+        if subscription._task is None and subscription in self._subscriptions:
+            subscription._task = self._loop.create_task(subscription._run())
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+        if subscription._task is not None:
+            subscription._task.cancel()
+            subscription._task = None
+
+    def publish(self, event: Any):
+        """Enqueue an event for all subscribers; never blocks"""
+        if not self._subscriptions:
+            return
+        self._ingress.append(event)
+        if not self._ensure_started():
+            return
+        if self._loop_thread == threading.get_ident():
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _ensure_started(self) -> bool:
+        """Bind to the running loop and start the dispatcher if needed"""
+        if self._loop is not None and not self._loop.is_closed() and self._task is not None and not self._task.done():
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._wake = asyncio.Event()
+        self._task = loop.create_task(self._dispatch())
+        for subscription in self._subscriptions:
+            subscription._task = None
+            self._start_subscription(subscription)
+        return True
+
+    async def _dispatch(self):
+        self._wake.set()  # deliver anything buffered before the loop started
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._ingress:
+                event = self._ingress.popleft()
+                for subscription in self._subscriptions:
+                    subscription.offer(event)
+
+    async def close(self):
+        """Stop the dispatcher and subscriber tasks (queued events are discarded)"""
+        tasks = [self._task] + [s._task for s in self._subscriptions]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in tasks if t is not None), return_exceptions=True)
+        self._task = None
+        for subscription in self._subscriptions:
+            subscription._task = None
@@ -3,12 +3,21 @@ Event tracking system for agent communication
 Captures all messages and events for visualization
 """
 
+from array import array
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from enum import Enum
-import asyncio
-from collections import defaultdict
+import bisect
+import json
+import os
+from collections import defaultdict, deque, OrderedDict
+
+from .event_bus import EventBus, Subscription, DROP_OLDEST
+from .latency import LatencyHistogram
+from ..utils import get_config
+
+config = get_config()
 
 
 class EventType(str, Enum):
@@ -18,6 +27,7 @@ class EventType(str, Enum):
     MESSAGE_SENT = "message_sent"
     MESSAGE_RECEIVED = "message_received"
     PROTOCOL_ACTIVATED = "protocol_activated"
+    PROTOCOL_AMENDED = "protocol_amended"
     PROTOCOL_STEP = "protocol_step"
     RESOURCE_ALLOCATED = "resource_allocated"
     TEAM_ACTIVATED = "team_activated"
@@ -29,7 +39,7 @@ class EventType(str, Enum):
     METRIC = "metric"
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentEvent:
     """Represents a single event in the system"""
     timestamp: datetime
@@ -43,6 +53,117 @@ class AgentEvent:
     latency_ms: Optional[float] = None
     patient_id: Optional[str] = None
     protocol: Optional[str] = None
+    correlation_id: Optional[str] = None  # Pairs a MESSAGE_SENT with its reply
+
+
+class EventRing:
+    """
+    Fixed-capacity ring buffer of events in arrival order
+    
+    Events sit in a preallocated slot list with their timestamps in a
+    parallel array of floats, so memory stays flat once full, the newest N
+    are read without touching the rest, and time-range queries are a binary
+    search. Timestamps are indexed clamped to be non-decreasing (events can
+    be created slightly before they are tracked).
+    """
+    
+    __slots__ = ("capacity", "_events", "_times", "_start", "_size", "_last_time")
+    
+    def __init__(self, capacity: int):
+        self.capacity = max(int(capacity), 1)
+        self._events: List[Optional[AgentEvent]] = [None] * self.capacity
+        self._times = array("d", bytes(8 * self.capacity))
+        self._start = 0
+        self._size = 0
+        self._last_time = float("-inf")
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __getitem__(self, i: int) -> float:
+        # Sequence of indexed timestamps (oldest first), for bisect
+        return self._times[(self._start + i) % self.capacity]
+    
+    def append(self, event: AgentEvent) -> Optional[AgentEvent]:
+        """Add an event; returns the evicted oldest event once full"""
+        self._last_time = max(self._last_time, event.timestamp.timestamp())
+        evicted = None
+        if self._size == self.capacity:
+            evicted = self._events[self._start]
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            slot = (self._start + self._size) % self.capacity
+            self._size += 1
+        self._events[slot] = event
+        self._times[slot] = self._last_time
+        return evicted
+    
+    def latest(self, limit: int) -> List[AgentEvent]:
+        """Newest ``limit`` events, oldest first"""
+        count = min(max(limit, 0), self._size)
+        first = self._size - count
+        return [self._events[(self._start + i) % self.capacity] for i in range(first, self._size)]
+    
+    def between(self, start: datetime, end: Optional[datetime] = None) -> List[AgentEvent]:
+        """Events with start <= timestamp <= end (no upper bound without end), oldest first"""
+        lo = bisect.bisect_left(self, start.timestamp())
+        hi = bisect.bisect_right(self, end.timestamp()) if end is not None else self._size
+        return [
+            event for event in (self._events[(self._start + i) % self.capacity] for i in range(lo, hi))
+            if event.timestamp >= start and (end is None or event.timestamp <= end)
+        ]
+    
+    def all(self) -> List[AgentEvent]:
+        return self.latest(self._size)
+    
+    def clear(self):
+        self._events = [None] * self.capacity
+        self._start = 0
+        self._size = 0
+        self._last_time = float("-inf")
+
+
+class EventSpill:
+    """
+    Rotating on-disk JSONL segments for events evicted from the ring
+    
+    Writes go to ``events.log``; when it exceeds ``segment_bytes`` it is
+    rotated to ``events.1.log`` (older segments shift up) and at most
+    ``segments`` files are kept.
+    """
+    
+    def __init__(self, directory: str, segment_bytes: int = 10 * 1024 * 1024, segments: int = 5):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segments = max(segments, 1)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "events.log")
+        self._file = open(self.path, "a", encoding="utf-8")
+    
+    def write(self, event: AgentEvent):
+        record = asdict(event)
+        self._file.write(json.dumps(record, default=str) + "\n")
+        if self._file.tell() >= self.segment_bytes:
+            self._rotate()
+    
+    def _rotate(self):
+        self._file.close()
+        if self.segments == 1:
+            os.remove(self.path)
+        else:
+            oldest = os.path.join(self.directory, f"events.{self.segments - 1}.log")
+            if os.path.exists(oldest):
+                os.remove(oldest)
+            for i in range(self.segments - 2, 0, -1):
+                src = os.path.join(self.directory, f"events.{i}.log")
+                if os.path.exists(src):
+                    os.replace(src, os.path.join(self.directory, f"events.{i + 1}.log"))
+            os.replace(self.path, os.path.join(self.directory, "events.1.log"))
+        self._file = open(self.path, "a", encoding="utf-8")
+    
+    def close(self):
+        self._file.close()
 
 
 class EventTracker:
@@ -68,8 +189,29 @@ class EventTracker:
         "bed_management": "red"
     }
     
-    def __init__(self):
-        self.events: List[AgentEvent] = []
+    # Bounds for per-protocol step history
+    MAX_PROTOCOL_TIMINGS = 1000
+    MAX_PROTOCOL_STEPS = 100
+    
+    # Sent messages awaiting a reply, oldest dropped first
+    MAX_PENDING_REPLIES = 10000
+    
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        spill_dir: Optional[str] = None
+    ):
+        capacity = config.EVENT_BUFFER_CAPACITY if capacity is None else capacity
+        spill_dir = config.EVENT_SPILL_DIR if spill_dir is None else spill_dir
+        self._ring = EventRing(capacity)
+        self._spill: Optional[EventSpill] = None
+        if spill_dir:
+            self._spill = EventSpill(
+                spill_dir,
+                segment_bytes=config.EVENT_SPILL_SEGMENT_BYTES,
+                segments=config.EVENT_SPILL_SEGMENTS
+            )
+        self.evicted_count = 0
         self.agent_stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
             "messages_sent": 0,
             "messages_received": 0,
@@ -79,28 +221,64 @@ class EventTracker:
             "status": "idle",
             "last_activity": None
         })
-        self.protocol_timings: Dict[str, Dict[str, Any]] = {}
+        self.protocol_timings: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.latency_by_agent: Dict[str, LatencyHistogram] = {}
+        self.latency_by_message_type: Dict[str, LatencyHistogram] = {}
+        self._pending_replies: "OrderedDict[str, AgentEvent]" = OrderedDict()
         self.start_time = datetime.utcnow()
-        self._callbacks: List[callable] = []
-    
-    def register_callback(self, callback: callable):
-        """Register a callback to be called when events occur"""
-        self._callbacks.append(callback)
-    
-    async def _notify_callbacks(self, event: AgentEvent):
-        """Notify all registered callbacks of a new event"""
-        for callback in self._callbacks:
-            try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(event)
-                else:
-                    callback(event)
-            except Exception as e:
-                print(f"Error in event callback: {e}")
+        self.bus = EventBus()
+    
+    def register_callback(self, callback: callable) -> Subscription:
+        """Register a callback to be called when events occur (delivered off the producer's path)"""
+        return self.subscribe(callback)
+    
+    def subscribe(
+        self,
+        callback: callable,
+        maxsize: Optional[int] = None,
+        policy: str = DROP_OLDEST,
+        key=None,
+        name: Optional[str] = None
+    ) -> Subscription:
+        """
+        Subscribe to tracked events through the event bus
+        
+        The callback (sync or async) runs in its own task with its own
+        bounded queue; see event_bus for the overflow policies.
+        """
+        maxsize = config.EVENT_SUBSCRIBER_QUEUE_SIZE if maxsize is None else maxsize
+        return self.bus.subscribe(callback, maxsize=maxsize, policy=policy, key=key, name=name)
+    
+    def unsubscribe(self, subscription: Subscription):
+        self.bus.unsubscribe(subscription)
+    
+    @property
+    def events(self) -> List[AgentEvent]:
+        """Events still in the buffer, oldest first (a copy; prefer get_recent_events / get_events_between)"""
+        return self._ring.all()
     
     def track_event(self, event: AgentEvent):
         """Track a new event"""
-        self.events.append(event)
+        evicted = self._ring.append(event)
+        if evicted is not None:
+            self.evicted_count += 1
+            if self._spill is not None:
+                try:
+                    self._spill.write(evicted)
+                except OSError as e:
+                    print(f"Error spilling event: {e}")
+        
+        # Correlate send -> reply
+        if event.correlation_id:
+            if event.event_type == EventType.MESSAGE_SENT:
+                self._pending_replies[event.correlation_id] = event
+                if len(self._pending_replies) > self.MAX_PENDING_REPLIES:
+                    self._pending_replies.popitem(last=False)
+            elif event.latency_ms is None:
+                sent = self._pending_replies.pop(event.correlation_id, None)
+                if sent is not None:
+                    event.latency_ms = max((event.timestamp - sent.timestamp).total_seconds() * 1000, 0.0)
+                    event.message_type = event.message_type or sent.message_type
         
         # Update agent stats
         if event.agent_name:
@@ -117,6 +295,7 @@ class EventTracker:
                 stats["total_latency_ms"] += event.latency_ms
                 stats["latency_count"] += 1
                 stats["avg_latency_ms"] = stats["total_latency_ms"] / stats["latency_count"]
+                self._record_latency(event)
         
         # Track protocol timings
         if event.protocol and event.patient_id:
@@ -126,9 +305,11 @@ class EventTracker:
                     "patient_id": event.patient_id,
                     "protocol": event.protocol,
                     "start_time": event.timestamp,
-                    "steps": [],
+                    "steps": deque(maxlen=self.MAX_PROTOCOL_STEPS),
                     "completed": False
                 }
+                if len(self.protocol_timings) > self.MAX_PROTOCOL_TIMINGS:
+                    self.protocol_timings.popitem(last=False)
             
             if event.event_type == EventType.PROTOCOL_STEP:
                 self.protocol_timings[key]["steps"].append({
@@ -136,11 +317,57 @@ class EventTracker:
                     "timestamp": event.timestamp,
                     "details": event.details
                 })
+        
+        # Subscribers are notified by the bus, never inline
+        self.bus.publish(event)
+    
+    def record_reply(self, correlation_id: str, timestamp: Optional[datetime] = None) -> Optional[float]:
+        """
+        Close a sent message's round trip without storing a reply event
+        (e.g. on a chat acknowledgement); returns the latency in ms
+        """
+        sent = self._pending_replies.pop(correlation_id, None)
+        if sent is None:
+            return None
+        latency_ms = max(((timestamp or datetime.utcnow()) - sent.timestamp).total_seconds() * 1000, 0.0)
+        stats = self.agent_stats[sent.agent_name]
+        stats["total_latency_ms"] += latency_ms
+        stats["latency_count"] += 1
+        stats["avg_latency_ms"] = stats["total_latency_ms"] / stats["latency_count"]
+        self._record_latency(sent, latency_ms)
+        return latency_ms
+    
+    def _record_latency(self, event: AgentEvent, latency_ms: Optional[float] = None):
+        latency_ms = event.latency_ms if latency_ms is None else latency_ms
+        message_type = event.message_type or event.event_type.value
+        for histograms, key in (
+            (self.latency_by_agent, event.agent_name),
+            (self.latency_by_message_type, message_type)
+        ):
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LatencyHistogram(horizon_seconds=config.LATENCY_WINDOW_SECONDS)
+            histogram.record(latency_ms)
+    
+    def get_latency_percentiles(
+        self,
+        agent_name: Optional[str] = None,
+        message_type: Optional[str] = None,
+        window_seconds: Optional[float] = None
+    ) -> Optional[Dict[str, Optional[float]]]:
+        """
+        p50/p90/p99/max latency (ms) for an agent or a message type over the
+        last ``window_seconds`` (LATENCY_WINDOW_SECONDS by default)
+        """
+        if agent_name is not None:
+            histogram = self.latency_by_agent.get(agent_name)
+        else:
+            histogram = self.latency_by_message_type.get(message_type)
+        return histogram.percentiles(window_seconds=window_seconds) if histogram else None
     
     async def track_event_async(self, event: AgentEvent):
-        """Track event and notify callbacks asynchronously"""
+        """Track event (subscribers are notified by the bus; kept for async callers)"""
         self.track_event(event)
-        await self._notify_callbacks(event)
     
     def get_agent_emoji(self, agent_name: str) -> str:
         """Get emoji for agent"""
@@ -167,11 +394,27 @@ class EventTracker:
     
     def get_recent_events(self, limit: int = 10) -> List[AgentEvent]:
         """Get most recent events"""
-        return self.events[-limit:] if self.events else []
+        return self._ring.latest(limit)
+    
+    def get_events_between(self, start: datetime, end: Optional[datetime] = None) -> List[AgentEvent]:
+        """Get buffered events with start <= timestamp <= end (UTC)"""
+        return self._ring.between(start, end)
     
     def get_agent_stats(self, agent_name: str) -> Dict[str, Any]:
         """Get statistics for a specific agent"""
-        return self.agent_stats.get(agent_name, {})
+        stats = self.agent_stats.get(agent_name)
+        if stats is None:
+            return {}
+        latency = self.get_latency_percentiles(agent_name=agent_name)
+        if latency:
+            stats = {
+                **stats,
+                "p50_latency_ms": latency["p50"],
+                "p90_latency_ms": latency["p90"],
+                "p99_latency_ms": latency["p99"],
+                "max_latency_ms": latency["max"],
+            }
+        return stats
     
     def get_all_agent_stats(self) -> Dict[str, Dict[str, Any]]:
         """Get statistics for all agents"""
@@ -180,7 +423,8 @@ class EventTracker:
     def get_protocol_status(self, patient_id: str, protocol: str) -> Optional[Dict[str, Any]]:
         """Get status of a specific protocol"""
         key = f"{patient_id}_{protocol}"
-        return self.protocol_timings.get(key)
+        timing = self.protocol_timings.get(key)
+        return {**timing, "steps": list(timing["steps"])} if timing else None
     
     def format_message_flow(self, event: AgentEvent) -> str:
         """Format a message flow for display"""
@@ -193,9 +437,13 @@ class EventTracker:
     
     def clear_events(self):
         """Clear all tracked events (useful for testing)"""
-        self.events.clear()
+        self._ring.clear()
+        self.evicted_count = 0
         self.agent_stats.clear()
         self.protocol_timings.clear()
+        self.latency_by_agent.clear()
+        self.latency_by_message_type.clear()
+        self._pending_replies.clear()
         self.start_time = datetime.utcnow()
 
 
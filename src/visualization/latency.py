@@ -0,0 +1,108 @@
+"""
+Streaming latency histograms
+Log-bucketed counts over a ring of time slots: O(1) record, percentiles over any recent window
+"""
+
+import math
+import time
+from array import array
+from typing import Dict, List, Optional
+
+
+class LatencyHistogram:
+    """
+    Sliding-window latency histogram with logarithmic buckets
+
+    Bucket i covers [min_ms * growth^i, min_ms * growth^(i+1)), so every
+    reported percentile is within ``growth - 1`` (5% by default) of the true
+    value. Counts are kept per time slot of ``slot_seconds``; a ring of
+    slots covers ``horizon_seconds`` and stale slots are cleared as time
+    moves on. Recording touches one counter; a percentile query sums the
+    slots inside the requested window.
+    """
+
+    def __init__(
+        self,
+        horizon_seconds: float = 900.0,
+        slot_seconds: float = 30.0,
+        min_ms: float = 0.01,
+        max_ms: float = 600_000.0,
+        growth: float = 1.05
+    ):
+        self.slot_seconds = slot_seconds
+        self.slots = max(int(math.ceil(horizon_seconds / slot_seconds)), 1)
+        self.min_ms = min_ms
+        self._log_growth = math.log(growth)
+        self.buckets = int(math.ceil(math.log(max_ms / min_ms) / self._log_growth)) + 1
+        self._counts: List[array] = [array("q", bytes(8 * self.buckets)) for _ in range(self.slots)]
+        self._slot_max: List[float] = [0.0] * self.slots
+        self._slot_epoch: List[int] = [-1] * self.slots
+        self.total_count = 0
+        self.max_ms = 0.0
+
+    def _bucket(self, value_ms: float) -> int:
+        if value_ms <= self.min_ms:
+            return 0
+        return min(int(math.log(value_ms / self.min_ms) / self._log_growth), self.buckets - 1)
+
+    def _bucket_value(self, bucket: int) -> float:
+        # Geometric midpoint of the bucket
+        return self.min_ms * math.exp((bucket + 0.5) * self._log_growth)
+
+    def record(self, value_ms: float, now: Optional[float] = None):
+        """Add one latency sample"""
+        now = time.time() if now is None else now
+        epoch = int(now // self.slot_seconds)
+        slot = epoch % self.slots
+        if self._slot_epoch[slot] != epoch:
+            self._counts[slot] = array("q", bytes(8 * self.buckets))
+            self._slot_max[slot] = 0.0
+            self._slot_epoch[slot] = epoch
+        self._counts[slot][self._bucket(value_ms)] += 1
+        if value_ms > self._slot_max[slot]:
+            self._slot_max[slot] = value_ms
+        self.total_count += 1
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def _window_slots(self, window_seconds: Optional[float], now: float) -> List[int]:
+        epoch = int(now // self.slot_seconds)
+        span = self.slots if window_seconds is None else min(max(int(math.ceil(window_seconds / self.slot_seconds)), 1), self.slots)
+        return [
+            slot for slot in range(self.slots)
+            if epoch - span < self._slot_epoch[slot] <= epoch
+        ]
+
+    def percentiles(
+        self,
+        quantiles: tuple = (50, 90, 99),
+        window_seconds: Optional[float] = None,
+        now: Optional[float] = None
+    ) -> Dict[str, Optional[float]]:
+        """
+        Percentiles and max over the last ``window_seconds`` (whole horizon by default)
+
+        Returns:
+            {"count": int, "p50": ms, "p90": ms, "p99": ms, "max": ms}; None values when empty
+        """
+        now = time.time() if now is None else now
+        slots = self._window_slots(window_seconds, now)
+        merged = [sum(column) for column in zip(*(self._counts[slot] for slot in slots))] if slots else []
+        window_max = max((self._slot_max[slot] for slot in slots), default=0.0)
+        count = sum(merged)
+
+        result: Dict[str, Optional[float]] = {"count": count}
+        targets = sorted((max(math.ceil(q / 100.0 * count), 1), f"p{q:g}") for q in quantiles)
+        seen = 0
+        bucket = 0
+        for rank, name in targets:
+            if count == 0:
+                result[name] = None
+                continue
+            while seen + merged[bucket] < rank:
+                seen += merged[bucket]
+                bucket += 1
+            # Never report more than the largest sample actually seen
+            result[name] = min(self._bucket_value(bucket), window_max)
+        result["max"] = window_max if count else None
+        return result
@@ -77,7 +77,7 @@ class TerminalLogger:
         table.add_column("Agent", style="cyan", no_wrap=True, width=25)
         table.add_column("Status", justify="center", width=10)
         table.add_column("Msgs", justify="right", width=8)
-        table.add_column("Latency", justify="right", width=10)
+        table.add_column("Latency", justify="right", width=18)
         
         # Add all 6 agents
         agent_order = [
@@ -120,11 +120,16 @@ class TerminalLogger:
             
             # Latency
             avg_latency = stats.get("avg_latency_ms", 0)
+            p90_latency = stats.get("p90_latency_ms")
             if avg_latency > 0:
                 latency_text = f"{avg_latency:.0f}ms"
-                if avg_latency < 50:
+                if p90_latency is not None:
+                    latency_text += f" (p90 {p90_latency:.0f})"
+                # Color by the tail when known; averages hide the slow cases
+                worst = p90_latency if p90_latency is not None else avg_latency
+                if worst < 50:
                     latency_style = "green"
-                elif avg_latency < 100:
+                elif worst < 100:
                     latency_style = "yellow"
                 else:
                     latency_style = "red"